@@ -13,6 +13,18 @@ LOG = logging.getLogger(__name__)
 @with_initialize
 def main(conf):
     from casauth.common import wsgi as wsgi_service
+    from casauth.db import config_cache
+    from casauth.db import token_revocation
+
+    # Workers start with the configurations and revoked tokens loaded
+    try:
+        LOG.info('Loaded %d configurations', config_cache.get_cache().load())
+    except Exception as e:
+        LOG.warning('Failed to load configurations: %s', e)
+    try:
+        LOG.info('Loaded %d revoked tokens', token_revocation.get_index().load())
+    except Exception as e:
+        LOG.warning('Failed to load revoked tokens: %s', e)
 
     workers = conf.wsgi.workers or processutils.get_worker_count()
     launcher = wsgi_service.launch(conf.bind_port, host=conf.bind_host, workers=workers)
@@ -1,4 +1,7 @@
 import inspect
+import json
+import math
+import os
 import sys
 
 from oslo_log import log as logging
@@ -30,6 +33,79 @@ class Commands(object):
         md_api.configure_db(CONF)
         sample_data.init_sample_data()
 
+    def users_import(self, file, format=None, send_mail=None, dry_run=None):
+        from casauth.wsgi.base import context
+        from casauth.wsgi.managers import user_mgr
+        md_api.configure_db(CONF)
+
+        format = format or ('csv' if file.lower().endswith('.csv') else 'json')
+        with open(file, encoding='utf-8') as f:
+            content = f.read()
+        data = {'csv': content} if format == 'csv' else {'users': json.loads(content)}
+        data.update(send_mail=bool(send_mail), dry_run=bool(dry_run))
+
+        ctx = context.create_admin_context(task='import users', data=data)
+        uow = md_api.begin()
+        try:
+            user_mgr.import_users(ctx)
+        except BaseException:
+            uow.rollback()
+            raise
+        if ctx.failed:
+            uow.rollback()
+        else:
+            _, error = md_api.commit(uow)
+            if error:
+                ctx.set_error(error, status=500)
+
+        if ctx.failed:
+            print(json.dumps(ctx.error_json(), indent=2))
+            sys.exit(1)
+        print(json.dumps(ctx.response, indent=2))
+        if ctx.warning:
+            print(json.dumps(ctx.warning_json(), indent=2))
+
+    def password_calibrate(self, algorithm=None, duration=None, target_ms=None):
+        from casauth.common import password_utils
+
+        algorithm = algorithm or CONF.password.algorithm
+        duration = duration or 2.0
+        result = password_utils.calibrate(password_utils.create_hasher(algorithm), duration)
+        result['cpu_count'] = os.cpu_count()
+        result['hashes_per_sec_all_cores'] = round(result['hashes_per_sec'] * os.cpu_count(), 2)
+        print(json.dumps(result, indent=2))
+        if not target_ms:
+            return
+
+        # Cost grows linearly with iterations, scrypt n must be a power of 2
+        scale = target_ms / result['ms_per_hash']
+        params = result['params']
+        if algorithm == 'pbkdf2':
+            params = {'iterations': max(1000, int(round(params['iterations'] * scale, -3)))}
+        elif algorithm == 'scrypt':
+            params = {'n': 2 ** max(10, int(round(math.log2(params['n'] * scale))))}
+        else:
+            params = {'time_cost': max(1, int(round(params['time_cost'] * scale)))}
+        hasher = password_utils.create_hasher(algorithm, **params)
+        result = password_utils.calibrate(hasher, duration)
+        result['hashes_per_sec_all_cores'] = round(result['hashes_per_sec'] * os.cpu_count(), 2)
+        print(_("Suggested costs for %s ms per hash:") % target_ms)
+        print(json.dumps(result, indent=2))
+
+    def limiter_stats(self, windows=None):
+        from casauth.common import limiter_utils
+
+        print(json.dumps({
+            'storage': CONF.wsgi.limiter_storage_url,
+            'window_seconds': limiter_utils.METRICS_WINDOW,
+            'rejected': limiter_utils.rejected_stats(windows or 24),
+        }, indent=2))
+
+    def revoked_token_purge(self):
+        from casauth.db import token_revocation
+
+        print(_("Deleted %d revocations of expired tokens.") % token_revocation.purge())
+
     def execute(self):
         exec_method = getattr(self, CONF.action.name)
         args = inspect.getargspec(exec_method)
@@ -64,6 +140,43 @@ def main():
         parser.add_argument('--type', help=repo_path_help)
         parser.add_argument('--sample-file', help=repo_path_help)
 
+        parser = subparser.add_parser(
+            'users_import', description='Create users from a JSON or CSV '
+                                        'file.')
+        parser.add_argument('file', help='JSON list of users or CSV file '
+                                         'with a header line.')
+        parser.add_argument('--format', choices=['json', 'csv'],
+                            help='File format. Defaults to the file '
+                                 'extension.')
+        parser.add_argument('--send-mail', action='store_true',
+                            help='Send activation e-mails to deactivated '
+                                 'users.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only validate the users.')
+
+        parser = subparser.add_parser(
+            'password_calibrate', description='Measure password hashes per '
+                                              'second on one core with the '
+                                              'configured costs.')
+        parser.add_argument('--algorithm', choices=['pbkdf2', 'scrypt', 'argon2'],
+                            help='Defaults to [password] algorithm.')
+        parser.add_argument('--duration', type=float,
+                            help='Seconds to measure for. Defaults to 2.')
+        parser.add_argument('--target-ms', type=float,
+                            help='Also suggest costs taking this time per '
+                                 'hash.')
+
+        parser = subparser.add_parser(
+            'limiter_stats', description='Show requests rejected by the rate '
+                                         'limits per hour, the current hour '
+                                         'first.')
+        parser.add_argument('--windows', type=int, choices=range(1, 25),
+                            metavar='[1-24]', help='Hours to show. Defaults to 24.')
+
+        parser = subparser.add_parser(
+            'revoked_token_purge', description='Delete revocations of expired '
+                                               'tokens.')
+
     cfg.custom_parser('action', actions)
 
     cfg.parse_args(sys.argv)
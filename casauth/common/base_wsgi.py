@@ -114,7 +114,11 @@ class Service(service.Service):
         :returns: None
 
         """
+        from casauth.common import password_utils
+        from casauth import grpc
+        LOG.info("Password hashing stats: %s", password_utils.get_executor().stats())
         super(Service, self).stop()
+        grpc.close_channels()
 
     def _run(self, application, socket):
         """Start a WSGI server in a new green thread."""
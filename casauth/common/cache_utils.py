@@ -0,0 +1,118 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    A bounded in-process LRU cache with per-entry expiration.
+
+    Entries can be tagged (e.g. with a user id) so that every entry
+    derived from the same object can be invalidated at once.
+    """
+
+    def __init__(self, maxsize=1000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, expires_at, tag)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        """
+        Get a cached value, None if missing or expired.
+        :param key:
+        :param default:
+        :return:
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = item
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at=None, tag=None):
+        """
+        Put a value to cache.
+        :param key:
+        :param value:
+        :param expires_at: epoch seconds, capped by the cache TTL
+        :param tag: group key used by invalidate_tag()
+        :return:
+        """
+        if self.maxsize <= 0:
+            return
+        max_expires_at = time.time() + self.ttl if self.ttl else None
+        if expires_at is None or (max_expires_at is not None and expires_at > max_expires_at):
+            expires_at = max_expires_at
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, key):
+        """
+        Remove a key from cache.
+        :param key:
+        :return:
+        """
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate_tag(self, tag):
+        """
+        Remove all keys having the tag.
+        :param tag:
+        :return:
+        """
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _remove(self, key):
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
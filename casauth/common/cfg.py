@@ -27,6 +27,10 @@ _common_opts = [
     cfg.StrOpt('taskmanager_rpc_encr_key',
                default='bzH6y0SGmjuoY0FNSTptrhgieGXNDX6PIhvz',
                help='Key (OpenSSL aes_cbc) for taskmanager RPC encryption.'),
+    cfg.IntOpt('rpc_secure_serializer_version', default=1, choices=[1, 2],
+               help='Format of encrypted RPC messages: 1 for AES-CBC, 2 for '
+                    'AES-GCM. Both formats are read, set it to 2 once all '
+                    'the peers can read it.'),
     cfg.PortOpt('bind_grpc_port', default=50051,
                 help='Port the gRPC will listen on.'),
     cfg.BoolOpt('enable_secure_grpc_messaging', default=False,
@@ -88,6 +92,63 @@ _wsgi_opts = [
     cfg.IntOpt('default_user_group_id', default=1,
                help=''),
     cfg.IntOpt('workers', default=4, help=''),
+    cfg.IntOpt('token_cache_size', default=10000,
+               help='Max number of verified access tokens cached in each '
+                    'process. Set to 0 to disable the cache.'),
+    cfg.IntOpt('token_cache_ttl', default=60,
+               help='Max seconds a verified access token is kept in cache, '
+                    'tokens expiring earlier are dropped at their own exp. '
+                    'Changes of a user, its profile or group drop its cached '
+                    'tokens at once in the process writing the change, and '
+                    'within token_revocation_check_interval seconds in the '
+                    'others.'),
+    cfg.BoolOpt('token_claims', default=False,
+                help='Put user role/status/type claims into access tokens, '
+                     'so that services can verify tokens without database '
+                     'lookup. No personal data, e.g. name or e-mail, is put. '
+                     'Changes of role/status only apply to tokens issued '
+                     'after the change.'),
+    cfg.IntOpt('count_cache_size', default=1000,
+               help='Max number of list total counts cached in each process. '
+                    'Set to 0 to disable the cache.'),
+    cfg.IntOpt('count_cache_ttl', default=10,
+               help='Seconds a list total count is reused for the same '
+                    'listing condition.'),
+    cfg.IntOpt('user_import_max_rows', default=10000,
+               help='Max number of users created by one import.'),
+    cfg.IntOpt('user_import_chunk_size', default=500,
+               help='Number of users inserted by one statement during '
+                    'imports.'),
+    cfg.StrOpt('limiter_storage_url', default='memory://',
+               deprecated_name='login_limit_storage_url',
+               help='Storage of rate limit and failed login counters, e.g. '
+                    'memory:// (per process), mmap:///var/lib/cas/limiter.mmap '
+                    '(shared by the workers of a host), redis://host:6379/0 or '
+                    'memcached://host:11211 (shared by nodes).'),
+    cfg.IntOpt('login_limit_window', default=900,
+               help='Seconds of the sliding window failed logins are '
+                    'counted in.'),
+    cfg.IntOpt('login_user_max_failures', default=10,
+               help='Max failed logins of a user name per window. Set to 0 '
+                    'for no limit.'),
+    cfg.IntOpt('login_ip_max_failures', default=100,
+               help='Max failed logins from a client address per window. '
+                    'Set to 0 for no limit.'),
+    cfg.IntOpt('config_cache_check_interval', default=30,
+               help='Seconds between two checks of the configuration table '
+                    'for changes. Cached configurations are served without '
+                    'querying in between.'),
+    cfg.IntOpt('token_revocation_check_interval', default=5,
+               help='Max seconds between two polls of the revoked_token '
+                    'table. A token revoked by another process is accepted '
+                    'for up to this time.'),
+    cfg.IntOpt('lock_lease_time', default=300,
+               help='Default seconds a lock is held if its owner does not '
+                    'release it, e.g. after a crash.'),
+    cfg.FloatOpt('lock_poll_interval', default=1,
+                 help='Max seconds between two tries of a waiting lock. '
+                      'Only used on databases without named locks, or '
+                      'while the lease of a crashed owner expires.'),
 ]
 
 _ldap_opts = [
@@ -97,6 +158,53 @@ _ldap_opts = [
     cfg.StrOpt('url', default='ldap://172.16.1.56'),
     cfg.StrOpt('os_cn', default='OSuser'),
     cfg.StrOpt('user_ou', default='Users'),
+    cfg.IntOpt('pool_size', default=4,
+               help='Max number of bound LDAP connections kept per account '
+                    'by a worker process.'),
+    cfg.IntOpt('pool_max_lifetime', default=3600,
+               help='Seconds after which a pooled LDAP connection is '
+                    're-opened. Set to 0 for no limit.'),
+    cfg.IntOpt('pool_idle_timeout', default=300,
+               help='Idle seconds after which a pooled LDAP connection is '
+                    're-opened instead of reused. Keep it below the idle '
+                    'timeout of the directory server.'),
+    cfg.IntOpt('pool_acquire_timeout', default=10,
+               help='Seconds to wait for a free pooled LDAP connection.'),
+]
+
+_password_opts = [
+    cfg.StrOpt('algorithm', default='pbkdf2', choices=['pbkdf2', 'scrypt', 'argon2'],
+               help='Hash algorithm of new user passwords. Hashes of other '
+                    'algorithms or costs are still verified, and replaced on '
+                    'the next login of their user. argon2 requires the '
+                    'argon2-cffi package.'),
+    cfg.IntOpt('pbkdf2_iterations', default=150000,
+               help='PBKDF2 iteration count.'),
+    cfg.StrOpt('pbkdf2_digest', default='sha256',
+               help='PBKDF2 hash function.'),
+    cfg.IntOpt('scrypt_n', default=32768,
+               help='scrypt CPU/memory cost, a power of 2.'),
+    cfg.IntOpt('scrypt_r', default=8,
+               help='scrypt block size.'),
+    cfg.IntOpt('scrypt_p', default=1,
+               help='scrypt parallelization.'),
+    cfg.IntOpt('argon2_time_cost', default=3,
+               help='argon2 number of iterations.'),
+    cfg.IntOpt('argon2_memory_cost', default=65536,
+               help='argon2 memory use in KiB.'),
+    cfg.IntOpt('argon2_parallelism', default=4,
+               help='argon2 number of lanes.'),
+    cfg.IntOpt('hash_workers', default=0,
+               help='Max number of passwords hashed at once by a worker '
+                    'process, on native threads. Defaults to the number of '
+                    'CPUs. Bounded by the eventlet thread pool size '
+                    '(EVENTLET_THREADPOOL_SIZE, 20 by default).'),
+    cfg.IntOpt('hash_queue_size', default=100,
+               help='Max number of requests waiting to hash a password. '
+                    'Further logins are rejected with HTTP 503.'),
+    cfg.IntOpt('hash_queue_timeout', default=10,
+               help='Seconds a request waits to hash a password before it '
+                    'is rejected with HTTP 503.'),
 ]
 
 _database_opts = [
@@ -183,6 +291,14 @@ ldap_group = cfg.OptGroup(
 CONF.register_opts(_ldap_opts)
 CONF.register_opts(_ldap_opts, ldap_group)
 
+password_group = cfg.OptGroup(
+    'password',
+    title='Password options',
+    help="Options related to user password hashing."
+)
+CONF.register_group(password_group)
+CONF.register_opts(_password_opts, password_group)
+
 CONF.register_opts(_database_opts, 'database')
 
 CONF.register_opts(rpcapi_cap_opts, upgrade_levels)
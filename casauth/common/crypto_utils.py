@@ -16,6 +16,7 @@
 
 # Encryption/decryption handling
 
+import base64
 import hashlib
 import os
 from oslo_utils import encodeutils
@@ -24,13 +25,17 @@ import six
 import string
 
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers import aead
 from cryptography.hazmat.primitives.ciphers import algorithms
 from cryptography.hazmat.primitives.ciphers import Cipher
 from cryptography.hazmat.primitives.ciphers import modes
+from cryptography.hazmat.primitives.kdf import hkdf
 from casauth.common import stream_codecs
 
 
 IV_BYTE_COUNT = 16
+NONCE_BYTE_COUNT = 12
 _CRYPT_BACKEND = None
 
 
@@ -75,10 +80,18 @@ def unpad_after_decryption(data):
     return data[:len(data) - six.indexbytes(data, -1)]
 
 
-def encrypt_data(data, key, iv_byte_count=IV_BYTE_COUNT):
+def derive_cbc_key(key):
+    """
+    Derive the AES-CBC key used by encrypt_data() from a secret.
+    :param key:
+    :return:
+    """
+    return encodeutils.safe_encode(hashlib.md5(encodeutils.to_utf8(key)).hexdigest())
+
+
+def encrypt_data(data, key, iv_byte_count=IV_BYTE_COUNT, derived_key=None):
     data = encodeutils.to_utf8(data)
-    key = encodeutils.to_utf8(key)
-    md5_key = encodeutils.safe_encode(hashlib.md5(key).hexdigest())
+    md5_key = derived_key or derive_cbc_key(key)
     iv = os.urandom(iv_byte_count)
     iv = iv[:iv_byte_count]
     data = pad_for_encryption(data, iv_byte_count)
@@ -86,14 +99,66 @@ def encrypt_data(data, key, iv_byte_count=IV_BYTE_COUNT):
     return iv + encrypted
 
 
-def decrypt_data(data, key, iv_byte_count=IV_BYTE_COUNT):
-    key = encodeutils.to_utf8(key)
-    md5_key = encodeutils.safe_encode(hashlib.md5(key).hexdigest())
+def decrypt_data(data, key, iv_byte_count=IV_BYTE_COUNT, derived_key=None):
+    md5_key = derived_key or derive_cbc_key(key)
     iv = data[:iv_byte_count]
     decrypted = _decrypt(md5_key, bytes(iv), bytes(data[iv_byte_count:]))
     return unpad_after_decryption(decrypted)
 
 
+def derive_aead_key(key, info=b'cas-aead'):
+    """
+    Derive a 256-bit AES-GCM key from a secret, derive it once and keep
+    the result as this is not cheap.
+    :param key:
+    :param info: context of the key use, different uses get different keys
+    :return:
+    """
+    global _CRYPT_BACKEND
+    if not _CRYPT_BACKEND:
+        _CRYPT_BACKEND = default_backend()
+
+    kdf = hkdf.HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info,
+                    backend=_CRYPT_BACKEND)
+    return kdf.derive(encodeutils.to_utf8(key))
+
+
+class AeadCipher(object):
+    """
+    AES-GCM encryption with a derived key. Ciphertexts are authenticated,
+    decryption of a modified message raises InvalidTag.
+    """
+
+    def __init__(self, key, info=b'cas-aead'):
+        self._aead = aead.AESGCM(derive_aead_key(key, info=info))
+
+    def encrypt(self, data, associated_data=None):
+        """
+        Encrypt bytes.
+        :param data:
+        :param associated_data: bytes authenticated but not encrypted
+        :return: nonce + ciphertext + tag
+        """
+        nonce = os.urandom(NONCE_BYTE_COUNT)
+        return nonce + self._aead.encrypt(nonce, data, associated_data)
+
+    def decrypt(self, data, associated_data=None):
+        return self._aead.decrypt(data[:NONCE_BYTE_COUNT], data[NONCE_BYTE_COUNT:],
+                                  associated_data)
+
+    def encrypt_text(self, data, associated_data=None):
+        """
+        Encrypt bytes to base64 text.
+        :param data:
+        :param associated_data:
+        :return:
+        """
+        return base64.b64encode(self.encrypt(data, associated_data)).decode('ascii')
+
+    def decrypt_text(self, data, associated_data=None):
+        return self.decrypt(base64.b64decode(data), associated_data)
+
+
 def generate_random_key(length=32, chars=None):
     chars = chars if chars else (string.ascii_uppercase +
                                  string.ascii_lowercase + string.digits)
@@ -2,15 +2,28 @@
 # Copyright (c) 2020 FTI-CAS
 #
 
+import datetime
+from decimal import Decimal
 import enum
 import inspect
 import re
 from marshmallow import ValidationError, validate
 
 from functools import wraps
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty
 
+from casauth.common import cache_utils
 from casauth.db import models as md
 
+# Compiled dumpers, keyed by (model class, fields, extra_fields, is_admin)
+DUMPER_CACHE_SIZE = 1024
+_DUMPERS = cache_utils.TTLCache(maxsize=DUMPER_CACHE_SIZE, ttl=0)
+_MISSING = object()
+# Column value types dumped as is
+_PLAIN_TYPES = (int, float, str, bool, bytes, Decimal,
+                datetime.datetime, datetime.date, datetime.time)
+
 
 def merge_dicts(source, *args, create_new=True, deep=False):
     """
@@ -100,22 +113,8 @@ def dump_value(value, fields=None, extra_fields=None, is_admin=False):
     dump_types = (db_model, dict, list, tuple)
     if isinstance(value, dump_types):
         if isinstance(value, db_model):
-            dump_data = {}
-            if fields is None:
-                fields = value.__class__.__admin_fields__ if is_admin else value.__class__.__user_fields__
-            if extra_fields is None:
-                extra_fields = []
-
-            for attr in fields:
-                attr_value = value.get_attr(attr, None)
-                ex_fields = extra_fields
-                dump_data[attr] = dump_value(attr_value, extra_fields=ex_fields, is_admin=is_admin)
-
-            for attr in extra_fields:
-                if hasattr(value, attr):
-                    attr_value = value.get_attr(attr)
-                    ex_fields = [f for f in extra_fields if f != attr]
-                    dump_data[attr] = dump_value(attr_value, extra_fields=ex_fields, is_admin=is_admin)
+            dump_data = get_dumper(value.__class__, fields=fields, extra_fields=extra_fields,
+                                   is_admin=is_admin)(value)
 
         elif isinstance(value, dict):
             dump_data = {}
@@ -145,6 +144,102 @@ def dump_value(value, fields=None, extra_fields=None, is_admin=False):
     return dump_data
 
 
+def get_dumper(model_class, fields=None, extra_fields=None, is_admin=False):
+    """
+    Get the compiled dumper of a model class, the dumper is a function
+    converting a model object to dict the same way dump_value() does.
+    :param model_class:
+    :param fields:
+    :param extra_fields:
+    :param is_admin:
+    :return:
+    """
+    key = (model_class,
+           tuple(fields) if fields is not None else None,
+           tuple(extra_fields) if extra_fields else (),
+           bool(is_admin))
+    dumper = _DUMPERS.get(key)
+    if dumper is None:
+        dumper = _compile_dumper(*key)
+        _DUMPERS.set(key, dumper)
+    return dumper
+
+
+def _compile_dumper(model_class, fields, extra_fields, is_admin):
+    """
+    Create the dumper of a model class. The kind of every attribute is
+    found once from the mapper, so plain columns are read directly and
+    enums are converted inline, only other values go through dump_value().
+    :param model_class:
+    :param fields:
+    :param extra_fields:
+    :param is_admin:
+    :return:
+    """
+    if fields is None:
+        fields = model_class.__admin_fields__ if is_admin else model_class.__user_fields__
+    extra_fields = list(extra_fields)
+
+    field_dumpers = [(attr, _compile_attr_dumper(model_class, attr, extra_fields, is_admin))
+                     for attr in fields]
+    extra_dumpers = [(attr, _compile_attr_dumper(model_class, attr,
+                                                 [f for f in extra_fields if f != attr], is_admin))
+                     for attr in extra_fields]
+
+    def dump(obj):
+        data = {}
+        for attr, dump_attr in field_dumpers:
+            value = getattr(obj, attr, None)
+            data[attr] = dump_attr(value) if dump_attr and value else value
+        for attr, dump_attr in extra_dumpers:
+            value = getattr(obj, attr, _MISSING)
+            if value is not _MISSING:
+                data[attr] = dump_attr(value) if dump_attr and value else value
+        return data
+    return dump
+
+
+def _compile_attr_dumper(model_class, attr, extra_fields, is_admin):
+    """
+    Create the function dumping a non-empty attribute value.
+    :return: None if the value is dumped as is
+    """
+    mapper = sa_inspect(model_class, raiseerr=False)
+    prop = mapper.attrs.get(attr) if mapper is not None else None
+
+    if isinstance(prop, ColumnProperty) and len(prop.columns) == 1:
+        try:
+            python_type = prop.columns[0].type.python_type
+        except NotImplementedError:
+            python_type = None
+        if python_type is not None:
+            if issubclass(python_type, enum.Enum):
+                return _dump_enum
+            if issubclass(python_type, _PLAIN_TYPES):
+                return None
+
+    if isinstance(prop, RelationshipProperty):
+        target = prop.mapper.class_
+        nested = []
+
+        def dump_related(value):
+            # Resolved on first use as related models may refer back
+            if not nested:
+                nested.append(get_dumper(target, extra_fields=extra_fields, is_admin=is_admin))
+            if prop.uselist:
+                return [nested[0](item) if item else item for item in value]
+            return nested[0](value)
+        return dump_related
+
+    def dump_other(value):
+        return dump_value(value, extra_fields=extra_fields, is_admin=is_admin)
+    return dump_other
+
+
+def _dump_enum(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
 def assign_model_object(model_object, data):
     """
     Copy data from a dict to model object.
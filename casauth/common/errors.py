@@ -13,6 +13,8 @@ _('Failed to release lock in database')
 
 OBJECT_LIST_CONDITION_INVALID = 'Object listing condition invalid'
 _('Object listing condition invalid')
+OBJECT_LIST_CURSOR_INVALID = 'Object listing cursor invalid'
+_('Object listing cursor invalid')
 REQUEST_PARAM_INVALID = 'Request param invalid'
 _('Request param invalid')
 
@@ -37,18 +39,28 @@ USER_ALREADY_EXISTS = 'User already exists'
 _('User already exists')
 USER_TOKEN_INVALID = 'User token invalid'
 _('User token invalid')
+USER_TOKEN_REFRESH_FAILED = 'Failed to refresh user token'
+_('Failed to refresh user token')
+USER_LOGOUT_FAILED = 'Failed to log out user'
+_('Failed to log out user')
 USER_NAME_INVALID = 'User name invalid'
 _('User name invalid')
 USER_EMAIL_INVALID = 'User e-mail invalid'
 _('User e-mail invalid')
 USER_PASSWORD_INVALID = 'User password invalid'
 _('User password invalid')
+USER_LOGIN_TOO_MANY_ATTEMPTS = 'Too many failed login attempts, please try again later'
+_('Too many failed login attempts, please try again later')
 USER_PASSWORD_REQUIREMENT_NOT_MET = 'User password does not meet requirement'
 _('User password does not meet requirement')
 USER_ROLE_INVALID = 'User role invalid'
 _('User role invalid')
 USER_STATUS_INVALID = 'User status invalid'
 _('User status invalid')
+USER_FIELD_INVALID = 'User field invalid'
+_('User field invalid')
+USER_FIELD_TOO_LONG = 'User field too long'
+_('User field too long')
 USER_CREATE_FAILED = 'Failed to create user'
 _('Failed to create user')
 USER_UPDATE_FAILED = 'Failed to update user'
@@ -72,6 +84,8 @@ _('Failed to send order complete e-mail')
 
 UNKNOWN_ERROR = 'Unknown error'
 _('Unknown error')
+SERVER_BUSY = 'Server busy, please try again later'
+_('Server busy, please try again later')
 
 METHOD_NOT_SUPPORTED = 'Method is not supported'
 _('Method is not supported')
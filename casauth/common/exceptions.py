@@ -109,3 +109,11 @@ class GRCPError(CasError):
 
 class GRCPTimeoutError(CasError):
     message = _("Error connecting to gRPC server")
+
+
+class LdapPoolTimeoutError(CasError):
+    message = _("Timed out waiting for a LDAP connection")
+
+
+class HashExecutorBusyError(CasError):
+    message = _("Too many password checks in progress")
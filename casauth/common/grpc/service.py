@@ -84,3 +84,4 @@ class GRPCService(service.Service):
             pass
 
         super(GRPCService, self).stop()
+        _grpc.close_channels()
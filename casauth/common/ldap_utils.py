@@ -0,0 +1,197 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import collections
+import contextlib
+import threading
+import time
+
+from foxcloud import client as fox_client
+from oslo_log import log as logging
+
+from casauth.common import cfg
+from casauth.common import exceptions as cas_exc
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+_POOLS = {}
+_LOCK = threading.Lock()
+
+
+class _PooledClient(object):
+    __slots__ = ('client', 'created_at', 'used_at')
+
+    def __init__(self, client):
+        self.client = client
+        self.created_at = self.used_at = time.time()
+
+
+class LdapPool(object):
+    """
+    Bound LDAP clients of an account, reused across operations.
+
+    At most max_size clients exist at once, callers wait up to
+    acquire_timeout for a free one. Before reuse a client is checked:
+    it is re-created when it is older than max_lifetime or was idle
+    longer than idle_timeout (directory servers drop idle connections).
+    A client released after an error is closed instead of reused.
+    """
+
+    def __init__(self, endpoint, dn, password, max_size=4, max_lifetime=3600,
+                 idle_timeout=300, acquire_timeout=10):
+        self.endpoint = endpoint
+        self.dn = dn
+        self._password = password
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle = collections.deque()
+        self._in_use = {}  # id(client) -> _PooledClient
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        return fox_client.Client('1', engine='console', services='ldap',
+                                 ldap_endpoint=self.endpoint, dn=self.dn,
+                                 password=self._password).ldap
+
+    def _is_healthy(self, item, now):
+        if self.max_lifetime and now - item.created_at >= self.max_lifetime:
+            return False
+        if self.idle_timeout and now - item.used_at >= self.idle_timeout:
+            return False
+        return True
+
+    def acquire(self):
+        """
+        Get a bound client, it must be given back by release().
+        :return:
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise cas_exc.LdapPoolTimeoutError(
+                message='Timed out waiting for a LDAP connection to {}'.format(self.endpoint))
+        try:
+            now = time.time()
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    item = _PooledClient(self._connect())
+                    break
+                if self._is_healthy(item, now):
+                    break
+                self._close(item)
+
+            item.used_at = now
+            with self._lock:
+                self._in_use[id(item.client)] = item
+            return item.client
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, client, discard=False):
+        """
+        Give back a client got by acquire().
+        :param client:
+        :param discard: close the client, e.g. after an error
+        :return:
+        """
+        with self._lock:
+            item = self._in_use.pop(id(client), None)
+        if item is None:
+            return
+        try:
+            if discard or self._closed or not self._is_healthy(item, time.time()):
+                self._close(item)
+            else:
+                item.used_at = time.time()
+                with self._lock:
+                    self._idle.append(item)
+        finally:
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Use a client within a `with` block, the client is closed if the
+        block raises.
+        """
+        client = self.acquire()
+        try:
+            yield client
+        except BaseException:
+            self.release(client, discard=True)
+            raise
+        self.release(client)
+
+    def close(self):
+        """
+        Close the idle clients, clients in use are closed on release.
+        :return:
+        """
+        self._closed = True
+        with self._lock:
+            items = list(self._idle)
+            self._idle.clear()
+        for item in items:
+            self._close(item)
+
+    def _close(self, item):
+        try:
+            item.client.unbind()
+        except Exception as e:
+            LOG.warning('Failed to close LDAP session: %s', e)
+
+
+def get_pool(endpoint, dn, password):
+    """
+    Get the client pool of a LDAP account, shared by the process.
+    The pool of a previous password of the account is closed.
+    :param endpoint:
+    :param dn:
+    :param password:
+    :return:
+    """
+    key = (endpoint, dn, password)
+    pool = _POOLS.get(key)
+    if pool is not None:
+        return pool
+
+    with _LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            for old_key in [k for k in _POOLS if k[:2] == key[:2]]:
+                _POOLS.pop(old_key).close()
+            pool = _POOLS[key] = LdapPool(
+                endpoint, dn, password,
+                max_size=CONF.ldap.pool_size,
+                max_lifetime=CONF.ldap.pool_max_lifetime,
+                idle_timeout=CONF.ldap.pool_idle_timeout,
+                acquire_timeout=CONF.ldap.pool_acquire_timeout)
+    return pool
+
+
+def get_admin_pool():
+    """
+    Get the client pool of the LDAP admin account of the config file.
+    :return:
+    """
+    return get_pool(CONF.ldap.url, 'cn={},{}'.format(CONF.ldap.cn, CONF.ldap.dc),
+                    CONF.ldap.password)
+
+
+def close_pools():
+    """
+    Close all the pools of the process.
+    :return:
+    """
+    with _LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,216 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import hashlib
+import math
+import threading
+import time
+
+from limits import storage as limits_storage
+from oslo_log import log as logging
+
+from casauth.common import cfg
+from casauth.common import mmap_storage  # noqa: registers mmap://
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+# Rejected requests are counted per scope and per window of this length
+REJECTED_SCOPES = ('login', 'api')
+METRICS_WINDOW = 3600
+
+_STORAGE = None
+_LOGIN_LIMITER = None
+_LOCK = threading.Lock()
+
+
+class SlidingWindowLimiter(object):
+    """
+    Limit of hits per sliding window of time.
+
+    The count of the last `window` seconds is estimated from the counts
+    of the current and the previous fixed windows:
+        current + previous * (time left of the current window / window)
+    so only two counters are kept per key. Counters are kept in a `limits`
+    storage (memory://, redis://, memcached://, ...) which only needs
+    incr() and get(), so one storage can be shared by all the workers
+    and nodes.
+    """
+
+    def __init__(self, storage, limit, window, prefix='sw'):
+        self.storage = storage
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+
+    def _window_keys(self, key, now):
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+        return ('{}/{}/{}'.format(self.prefix, key, index),
+                '{}/{}/{}'.format(self.prefix, key, index - 1),
+                elapsed)
+
+    def _counts(self, key, now):
+        current_key, previous_key, elapsed = self._window_keys(key, now)
+        return self.storage.get(current_key), self.storage.get(previous_key), elapsed
+
+    def count(self, key, now=None):
+        """
+        Get the estimated number of hits in the last window.
+        :param key:
+        :param now:
+        :return:
+        """
+        current, previous, elapsed = self._counts(key, now or time.time())
+        return current + previous * (self.window - elapsed) / self.window
+
+    def retry_after(self, key, now=None):
+        """
+        Get seconds until a hit is allowed.
+        :param key:
+        :param now:
+        :return: 0 if a hit is allowed now
+        """
+        current, previous, elapsed = self._counts(key, now or time.time())
+        left = self.window - elapsed
+        if current + previous * left / self.window < self.limit:
+            return 0
+        if current >= self.limit:
+            # Wait for the current window to become the previous one and decay
+            wait = left + self.window * (1 - self.limit / current)
+        else:
+            wait = left - self.window * (self.limit - current) / previous
+        return max(1, int(math.ceil(wait)))
+
+    def hit(self, key, now=None):
+        """
+        Count a hit.
+        :param key:
+        :param now:
+        :return:
+        """
+        current_key, _, _ = self._window_keys(key, now or time.time())
+        self.storage.incr(current_key, self.window * 2)
+
+    def reset(self, key, now=None):
+        current_key, previous_key, _ = self._window_keys(key, now or time.time())
+        self.storage.clear(current_key)
+        self.storage.clear(previous_key)
+
+
+class LoginLimiter(object):
+    """
+    Limit of failed logins per user name and per client address.
+
+    Logins are checked before any database lookup or password hashing,
+    so blocked attempts of a credential stuffing wave cost no more than
+    two counter reads. A successful login resets the counter of its user
+    name. Limits set to 0 are disabled. On storage errors logins are
+    allowed.
+    """
+
+    def __init__(self, storage, window, user_limit, ip_limit):
+        self.user_limiter = SlidingWindowLimiter(storage, user_limit, window, prefix='login-user')
+        self.ip_limiter = SlidingWindowLimiter(storage, ip_limit, window, prefix='login-ip')
+
+    def _keys(self, user_name, ip):
+        keys = []
+        if self.user_limiter.limit and user_name:
+            user_key = hashlib.sha1(user_name.strip().lower().encode('utf-8')).hexdigest()
+            keys.append((self.user_limiter, user_key))
+        if self.ip_limiter.limit and ip:
+            keys.append((self.ip_limiter, ip))
+        return keys
+
+    def check(self, user_name, ip):
+        """
+        Check if a login is allowed.
+        :param user_name:
+        :param ip:
+        :return: seconds to wait before retrying, 0 if allowed
+        """
+        try:
+            return max([limiter.retry_after(key) for limiter, key in self._keys(user_name, ip)] or [0])
+        except Exception as e:
+            LOG.warning('Failed to check login limits: %s', e)
+            return 0
+
+    def failed(self, user_name, ip):
+        """
+        Count a failed login.
+        :param user_name:
+        :param ip:
+        :return:
+        """
+        try:
+            for limiter, key in self._keys(user_name, ip):
+                limiter.hit(key)
+        except Exception as e:
+            LOG.warning('Failed to count failed login: %s', e)
+
+    def succeeded(self, user_name, ip):
+        try:
+            for limiter, key in self._keys(user_name, None):
+                limiter.reset(key)
+        except Exception as e:
+            LOG.warning('Failed to reset login limits: %s', e)
+
+
+def get_storage():
+    """
+    Get the counter storage of the process.
+    :return:
+    """
+    global _STORAGE
+    if _STORAGE is None:
+        with _LOCK:
+            if _STORAGE is None:
+                _STORAGE = limits_storage.storage_from_string(CONF.wsgi.limiter_storage_url)
+    return _STORAGE
+
+
+def get_login_limiter():
+    """
+    Get the login limiter of the process.
+    :return:
+    """
+    global _LOGIN_LIMITER
+    if _LOGIN_LIMITER is None:
+        with _LOCK:
+            if _LOGIN_LIMITER is None:
+                _LOGIN_LIMITER = LoginLimiter(get_storage(), CONF.wsgi.login_limit_window,
+                                              user_limit=CONF.wsgi.login_user_max_failures,
+                                              ip_limit=CONF.wsgi.login_ip_max_failures)
+    return _LOGIN_LIMITER
+
+
+def record_rejected(scope, now=None):
+    """
+    Count a rejected request in the counter storage, so that counts of
+    all the workers sharing the storage add up.
+    :param scope: one of REJECTED_SCOPES
+    :param now:
+    :return:
+    """
+    index = int((now or time.time()) // METRICS_WINDOW)
+    try:
+        get_storage().incr('limiter-rejected/{}/{}'.format(scope, index), METRICS_WINDOW * 25)
+    except Exception as e:
+        LOG.warning('Failed to count rejected request: %s', e)
+
+
+def rejected_stats(windows=24, now=None):
+    """
+    Get counts of rejected requests.
+    :param windows: number of past windows, at most 24
+    :param now:
+    :return: dict of scope -> counts by window, the current window first
+    """
+    index = int((now or time.time()) // METRICS_WINDOW)
+    storage = get_storage()
+    return {
+        scope: [storage.get('limiter-rejected/{}/{}'.format(scope, index - i))
+                for i in range(windows)]
+        for scope in REJECTED_SCOPES
+    }
@@ -102,6 +102,26 @@ def send_mail_user_activation(user, **kw):
     return response.status
 
 
+def send_mail_users_activation(users, **kw):
+    """
+    Queue account activation e-mails of many users by one call.
+    :param users: list of dicts with user_name, email, full_name
+    :return: message ids of the queued e-mails
+    """
+    stub = grpc.get_client(CONF.service_mail.mail_host, CONF.service_mail.mail_grpc_port,
+                           mail_service, 'MailServiceStub')
+
+    def _requests():
+        for user in users:
+            token = str_utils.jwt_encode_token(data=user['user_name'])
+            user = mail_message.User(user_name=user['user_name'], email=user['email'],
+                                     full_name=user.get('full_name') or '')
+            yield mail_message.ActiveUserRequest(user=user, token=token)
+
+    response = stub.active_users(_requests())
+    return [reply.message_id for reply in response.replies]
+
+
 def send_mail_password_reset(user, **kw):
     """
     Send password reset e-mail to user with token.
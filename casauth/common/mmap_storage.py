@@ -0,0 +1,192 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from urllib import parse
+
+from limits import storage as limits_storage
+
+# File header: magic, version, slot count
+_HEADER = struct.Struct('<8sII')
+_HEADER_SIZE = 64
+_MAGIC = b'CASLIMIT'
+_VERSION = 1
+# Slot: key fingerprint (0 if empty), counter, expiry epoch
+_SLOT = struct.Struct('<Qqd8x')
+_SLOT_SIZE = _SLOT.size
+# Max slots probed for a key, past that the entry expiring first is evicted
+_MAX_PROBES = 32
+
+DEFAULT_SLOTS = 65536
+
+
+class MmapStorage(limits_storage.Storage):
+    """
+    Rate limit counters in a memory mapped file, shared by the worker
+    processes of a host. E.g.
+        mmap:///var/lib/cas/limiter.mmap?slots=65536
+
+    The file is a fixed array of 32-byte slots, so memory use does not
+    grow with the number of keys: a key is found by its 64-bit hash with
+    linear probing, an expired slot is reused, and when all the probed
+    slots are in use the one expiring first is evicted. Updates take a
+    lock of the process then a flock() of the file, a counter update is
+    a few microseconds.
+
+    Counters survive restarts as long as the file is kept. Only the fixed
+    window strategies are supported (incr/get), not the moving window.
+    """
+
+    STORAGE_SCHEME = ['mmap']
+
+    def __init__(self, uri, **options):
+        parsed = parse.urlparse(uri)
+        query = parse.parse_qs(parsed.query)
+        self.path = parsed.path
+        self.slots = int(query.get('slots', [DEFAULT_SLOTS])[0])
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+        super(MmapStorage, self).__init__(uri, **options)
+
+    def _open(self):
+        """
+        Map the file, once per process as maps are not shared on fork.
+        """
+        if self._pid == os.getpid():
+            return
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(fd).st_size
+            if size >= _HEADER_SIZE:
+                magic, version, slots = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+                if magic != _MAGIC or version != _VERSION:
+                    raise ValueError('{} is not a limiter file'.format(self.path))
+                self.slots = slots
+            else:
+                os.ftruncate(fd, _HEADER_SIZE + self.slots * _SLOT_SIZE)
+                os.pwrite(fd, _HEADER.pack(_MAGIC, _VERSION, self.slots), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, _HEADER_SIZE + self.slots * _SLOT_SIZE)
+        self._pid = os.getpid()
+
+    def _locked(self, func, *args):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                return func(*args)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _fingerprint(key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def _offset(self, index):
+        return _HEADER_SIZE + index * _SLOT_SIZE
+
+    def _read(self, index):
+        return _SLOT.unpack_from(self._map, self._offset(index))
+
+    def _write(self, index, fingerprint, value, expires_at):
+        _SLOT.pack_into(self._map, self._offset(index), fingerprint, value, expires_at)
+
+    def _find(self, key, now, create=False):
+        """
+        Find the slot of a key.
+        :return: (index, value, expires_at), index is None if not found
+            and not created
+        """
+        fingerprint = self._fingerprint(key)
+        home = fingerprint % self.slots
+        free = None
+        oldest = None
+        for probe in range(min(_MAX_PROBES, self.slots)):
+            index = (home + probe) % self.slots
+            slot_fingerprint, value, expires_at = self._read(index)
+            if slot_fingerprint == fingerprint:
+                if expires_at > now:
+                    return index, value, expires_at
+                return index, 0, 0.0
+            if slot_fingerprint == 0:
+                # Keys are never placed after an empty slot
+                if free is None:
+                    free = index
+                break
+            if expires_at <= now:
+                if free is None:
+                    free = index
+            elif oldest is None or expires_at < oldest[1]:
+                oldest = (index, expires_at)
+
+        if not create:
+            return None, 0, 0.0
+        index = free if free is not None else oldest[0]
+        self._write(index, fingerprint, 0, 0.0)
+        return index, 0, 0.0
+
+    def _incr(self, key, expiry, elastic_expiry):
+        now = time.time()
+        index, value, expires_at = self._find(key, now, create=True)
+        if value == 0 or elastic_expiry:
+            expires_at = now + expiry
+        value += 1
+        self._write(index, self._fingerprint(key), value, expires_at)
+        return value
+
+    def incr(self, key, expiry, elastic_expiry=False):
+        return self._locked(self._incr, key, expiry, elastic_expiry)
+
+    def get(self, key):
+        return self._locked(lambda: self._find(key, time.time())[1])
+
+    def get_expiry(self, key):
+        now = time.time()
+        expires_at = self._locked(lambda: self._find(key, now)[2])
+        return expires_at or now
+
+    def _clear(self, key):
+        index, _, _ = self._find(key, time.time())
+        if index is not None:
+            self._write(index, self._fingerprint(key), 0, 0.0)
+
+    def clear(self, key):
+        self._locked(self._clear, key)
+
+    def check(self):
+        try:
+            self._locked(lambda: None)
+            return True
+        except OSError:
+            return False
+
+    def _reset(self):
+        now = time.time()
+        count = sum(1 for index in range(self.slots) if self._read(index)[2] > now)
+        self._map[_HEADER_SIZE:] = bytes(self.slots * _SLOT_SIZE)
+        return count
+
+    def reset(self):
+        return self._locked(self._reset)
+
+    def acquire_entry(self, key, limit, expiry, no_add=False):
+        raise NotImplementedError('The moving window strategy is not supported by mmap storage.')
+
+    def get_moving_window(self, key, limit, expiry):
+        raise NotImplementedError('The moving window strategy is not supported by mmap storage.')
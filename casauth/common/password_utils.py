@@ -0,0 +1,410 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+from eventlet import greenpool
+from eventlet import patcher
+from eventlet import tpool
+from oslo_log import log as logging
+from oslo_utils import importutils
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from casauth.common import cfg
+from casauth.common import exceptions as cas_exc
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+argon2 = importutils.try_import('argon2')
+
+SALT_BYTE_COUNT = 16
+# Werkzeug hashes without iteration count use its default
+WERKZEUG_PBKDF2_ITERATIONS = 150000
+
+
+class PasswordHasher(object):
+    """
+    Hash algorithm of user passwords. A hash keeps its algorithm and cost
+    parameters, so hashes of old parameters are still verified and can be
+    found by needs_update().
+    """
+    name = None
+
+    def identify(self, password_hash):
+        """
+        Check if a hash is made by this algorithm.
+        :param password_hash:
+        :return:
+        """
+        raise NotImplementedError()
+
+    def hash(self, password):
+        raise NotImplementedError()
+
+    def verify(self, password_hash, password):
+        raise NotImplementedError()
+
+    def needs_update(self, password_hash):
+        """
+        Check if a hash of this algorithm has other cost parameters than
+        the hasher.
+        :param password_hash:
+        :return:
+        """
+        raise NotImplementedError()
+
+    def params(self):
+        """
+        Get the cost parameters.
+        :return:
+        """
+        raise NotImplementedError()
+
+
+class Pbkdf2Hasher(PasswordHasher):
+    """
+    PBKDF2 in werkzeug format, e.g. pbkdf2:sha256:150000$<salt>$<hex>.
+    Other werkzeug formats are verified too.
+    """
+    name = 'pbkdf2'
+
+    def __init__(self, iterations=WERKZEUG_PBKDF2_ITERATIONS, digest='sha256'):
+        self.iterations = iterations
+        self.digest = digest
+
+    def identify(self, password_hash):
+        return '$' in password_hash and not password_hash.startswith(('$', 'scrypt:'))
+
+    def hash(self, password):
+        return generate_password_hash(
+            password, method='pbkdf2:{}:{}'.format(self.digest, self.iterations),
+            salt_length=SALT_BYTE_COUNT)
+
+    def verify(self, password_hash, password):
+        return check_password_hash(password_hash, password)
+
+    def needs_update(self, password_hash):
+        method = password_hash.split('$', 1)[0].split(':')
+        if method[0] != 'pbkdf2' or len(method) < 2 or method[1] != self.digest:
+            return True
+        iterations = int(method[2]) if len(method) > 2 else WERKZEUG_PBKDF2_ITERATIONS
+        return iterations < self.iterations
+
+    def params(self):
+        return {'iterations': self.iterations, 'digest': self.digest}
+
+
+class ScryptHasher(PasswordHasher):
+    """
+    scrypt in werkzeug 2.3 format, e.g. scrypt:32768:8:1$<salt>$<hex>.
+    """
+    name = 'scrypt'
+
+    def __init__(self, n=32768, r=8, p=1):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    def identify(self, password_hash):
+        return password_hash.startswith('scrypt:')
+
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'),
+                              n=n, r=r, p=p, maxmem=132 * n * r * p, dklen=64).hex()
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTE_COUNT).hex()
+        return 'scrypt:{}:{}:{}${}${}'.format(self.n, self.r, self.p, salt,
+                                              self._derive(password, salt, self.n, self.r, self.p))
+
+    def _parse(self, password_hash):
+        method, salt, value = password_hash.split('$', 2)
+        _, n, r, p = method.split(':')
+        return int(n), int(r), int(p), salt, value
+
+    def verify(self, password_hash, password):
+        try:
+            n, r, p, salt, value = self._parse(password_hash)
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._derive(password, salt, n, r, p), value)
+
+    def needs_update(self, password_hash):
+        try:
+            n, r, p, _, _ = self._parse(password_hash)
+        except ValueError:
+            return True
+        return (n, r, p) != (self.n, self.r, self.p)
+
+    def params(self):
+        return {'n': self.n, 'r': self.r, 'p': self.p}
+
+
+class Argon2Hasher(PasswordHasher):
+    """
+    argon2id in PHC format, e.g. $argon2id$v=19$m=65536,t=3,p=4$<salt>$<hash>.
+    Requires the argon2-cffi package.
+    """
+    name = 'argon2'
+
+    def __init__(self, time_cost=3, memory_cost=65536, parallelism=4):
+        if argon2 is None:
+            raise ValueError('Password algorithm argon2 requires the argon2-cffi package.')
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        self.parallelism = parallelism
+        self._hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost,
+                                             parallelism=parallelism)
+
+    def identify(self, password_hash):
+        return password_hash.startswith('$argon2')
+
+    def hash(self, password):
+        return self._hasher.hash(password)
+
+    def verify(self, password_hash, password):
+        try:
+            return self._hasher.verify(password_hash, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHash):
+            return False
+
+    def needs_update(self, password_hash):
+        return self._hasher.check_needs_rehash(password_hash)
+
+    def params(self):
+        return {'time_cost': self.time_cost, 'memory_cost': self.memory_cost,
+                'parallelism': self.parallelism}
+
+
+def create_hasher(algorithm=None, **params):
+    """
+    Create a hasher with cost parameters from config.
+    :param algorithm: pbkdf2, scrypt or argon2, the configured one if None
+    :param params: cost parameters overriding the config
+    :return:
+    """
+    conf = CONF.password
+    algorithm = algorithm or conf.algorithm
+    if algorithm == 'pbkdf2':
+        kwargs = {'iterations': conf.pbkdf2_iterations, 'digest': conf.pbkdf2_digest}
+        kwargs.update(params)
+        return Pbkdf2Hasher(**kwargs)
+    if algorithm == 'scrypt':
+        kwargs = {'n': conf.scrypt_n, 'r': conf.scrypt_r, 'p': conf.scrypt_p}
+        kwargs.update(params)
+        return ScryptHasher(**kwargs)
+    if algorithm == 'argon2':
+        kwargs = {'time_cost': conf.argon2_time_cost, 'memory_cost': conf.argon2_memory_cost,
+                  'parallelism': conf.argon2_parallelism}
+        kwargs.update(params)
+        return Argon2Hasher(**kwargs)
+    raise ValueError('Password algorithm {} not supported.'.format(algorithm))
+
+
+class HashExecutor(object):
+    """
+    Run password hashing on native threads.
+
+    Hashing is CPU bound, run inline it blocks every green thread of the
+    worker. Here it runs in the eventlet thread pool while the calling
+    green thread waits, and at most max_workers hashes run at once so
+    that a login burst keeps CPU for the other requests. Callers queue
+    for a slot, a call is rejected with HashExecutorBusyError when
+    max_queue callers already wait or no slot is free within
+    queue_timeout.
+    Without eventlet monkey patching, e.g. in commands, hashing runs
+    inline.
+    """
+
+    def __init__(self, max_workers=4, max_queue=100, queue_timeout=10):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Semaphore(max_workers)
+        self._offload = patcher.is_monkey_patched('thread')
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def execute(self, func, *args):
+        """
+        Run a hash function.
+        :param func:
+        :param args:
+        :return: result of func
+        """
+        if not self._offload:
+            return func(*args)
+
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise cas_exc.HashExecutorBusyError(
+                message='Password hashing queue is full, {} waiting'.format(self.waiting))
+
+        start = time.time()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self.waiting -= 1
+        if not acquired:
+            self.rejected += 1
+            LOG.warning('Password hashing rejected after %ss in queue', self.queue_timeout)
+            raise cas_exc.HashExecutorBusyError(
+                message='Timed out after {}s waiting for password hashing'.format(self.queue_timeout))
+
+        started = time.time()
+        self.wait_time += started - start
+        self.running += 1
+        try:
+            return tpool.execute(func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.run_time += time.time() - started
+            self._slots.release()
+
+    def stats(self):
+        return {
+            'max_workers': self.max_workers,
+            'running': self.running,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'avg_wait_ms': round(self.wait_time / self.completed * 1000, 2) if self.completed else 0,
+            'avg_run_ms': round(self.run_time / self.completed * 1000, 2) if self.completed else 0,
+        }
+
+
+_HASHER = None
+_VERIFIERS = {}
+_EXECUTOR = None
+_LOCK = threading.Lock()
+
+
+def get_hasher():
+    """
+    Get the hasher of new passwords.
+    :return:
+    """
+    global _HASHER
+    if _HASHER is None:
+        _HASHER = create_hasher()
+    return _HASHER
+
+
+def get_executor():
+    """
+    Get the executor of password hashing of the process.
+    :return:
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _LOCK:
+            if _EXECUTOR is None:
+                conf = CONF.password
+                _EXECUTOR = HashExecutor(max_workers=conf.hash_workers or os.cpu_count() or 1,
+                                         max_queue=conf.hash_queue_size,
+                                         queue_timeout=conf.hash_queue_timeout)
+    return _EXECUTOR
+
+
+def _get_verifier(password_hash):
+    hasher = get_hasher()
+    if hasher.identify(password_hash):
+        return hasher
+    for algorithm in ('argon2', 'scrypt', 'pbkdf2'):
+        if algorithm == hasher.name:
+            continue
+        verifier = _VERIFIERS.get(algorithm)
+        if verifier is None:
+            try:
+                verifier = _VERIFIERS[algorithm] = create_hasher(algorithm)
+            except ValueError:
+                continue
+        if verifier.identify(password_hash):
+            return verifier
+    return None
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured algorithm.
+    :param password:
+    :return:
+    """
+    return get_executor().execute(get_hasher().hash, password)
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash many passwords with the configured algorithm, in parallel.
+    :param passwords:
+    :param workers: max number of hashes at once, half the executor
+        workers by default, so that logins are still served meanwhile
+    :return: list of hashes in the same order
+    """
+    workers = workers or max(1, get_executor().max_workers // 2)
+    pool = greenpool.GreenPool(workers)
+    return list(pool.imap(hash_password, passwords))
+
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a hash of any supported algorithm.
+    :param password_hash:
+    :param password:
+    :return:
+    """
+    if not password_hash:
+        return False
+    verifier = _get_verifier(password_hash)
+    if verifier is None:
+        return False
+    return get_executor().execute(verifier.verify, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """
+    Check if a hash is not made with the configured algorithm and costs.
+    :param password_hash:
+    :return:
+    """
+    hasher = get_hasher()
+    return not hasher.identify(password_hash) or hasher.needs_update(password_hash)
+
+
+def calibrate(hasher, duration=1.0, password='Calibrate@2020'):
+    """
+    Measure the hash speed of a hasher on one core.
+    :param hasher:
+    :param duration: seconds to hash for
+    :param password:
+    :return: dict of hashes_per_sec and ms_per_hash
+    """
+    password_hash = hasher.hash(password)
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0
+    while elapsed < duration or count < 3:
+        hasher.verify(password_hash, password)
+        count += 1
+        elapsed = time.perf_counter() - start
+    return {
+        'algorithm': hasher.name,
+        'params': hasher.params(),
+        'hashes_per_sec': round(count / elapsed, 2),
+        'ms_per_hash': round(elapsed / count * 1000, 2),
+    }
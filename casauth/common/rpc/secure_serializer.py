@@ -13,29 +13,66 @@
 
 from oslo_serialization import jsonutils
 
+from casauth.common import cfg
 from casauth.common import crypto_utils as cu
 from casauth.common.rpc import serializer
 
+CONF = cfg.CONF
+
+# Prefix of version 2 payloads, not a base64 character so version 1
+# payloads never start with it
+V2_TAG = 'v2:'
+_CONTEXT_AD = b'context'
+_ENTITY_AD = b'entity'
+
 
 # BUG(1650518): Cleanup in the Pike release
 class SecureSerializer(serializer.CasSerializer):
-    def __init__(self, base, key):
+    """
+    Encrypt RPC contexts and entities with a shared key.
+
+    Version 1 payloads are AES-CBC encrypted, version 2 payloads are
+    AES-GCM encrypted and tagged with V2_TAG. Both versions are always
+    read, the version written is set by `rpc_secure_serializer_version`
+    so that peers can be upgraded one by one before switching to 2.
+    Keys are derived once per serializer.
+    """
+
+    def __init__(self, base, key, version=None):
         self._key = key
+        self._version = version or CONF.rpc_secure_serializer_version
+        self._cbc_key = None
+        self._cipher = None
+        if key is not None:
+            self._cbc_key = cu.derive_cbc_key(key)
+            self._cipher = cu.AeadCipher(key, info=b'cas-rpc')
         super(SecureSerializer, self).__init__(base)
 
+    def _encrypt(self, data, associated_data):
+        data = jsonutils.dump_as_bytes(data)
+        if self._version >= 2:
+            return V2_TAG + self._cipher.encrypt_text(data, associated_data)
+        return cu.encode_data(cu.encrypt_data(data, self._key, derived_key=self._cbc_key))
+
+    def _decrypt(self, data, associated_data):
+        if data.startswith(V2_TAG):
+            # An altered payload raises InvalidTag
+            data = self._cipher.decrypt_text(data[len(V2_TAG):], associated_data)
+        else:
+            data = cu.decrypt_data(cu.decode_data(data), self._key, derived_key=self._cbc_key)
+        return jsonutils.loads(data)
+
     def _serialize_entity(self, ctxt, entity):
         if self._key is None:
             return entity
 
-        estr = jsonutils.dumps(entity)
-        return cu.encode_data(cu.encrypt_data(estr, self._key))
+        return self._encrypt(entity, _ENTITY_AD)
 
     def _deserialize_entity(self, ctxt, entity):
         try:
             if self._key is not None:
-                estr = cu.decrypt_data(cu.decode_data(entity), self._key)
-                entity = jsonutils.loads(estr)
-        except (ValueError, TypeError):
+                entity = self._decrypt(entity, _ENTITY_AD)
+        except (ValueError, TypeError, AttributeError):
             return entity
 
         return entity
@@ -44,16 +81,13 @@ class SecureSerializer(serializer.CasSerializer):
         if self._key is None:
             return ctxt
 
-        cstr = jsonutils.dumps(ctxt)
-        return {'context': cu.encode_data(cu.encrypt_data(cstr, self._key))}
+        return {'context': self._encrypt(ctxt, _CONTEXT_AD)}
 
     def _deserialize_context(self, ctxt):
         try:
             if self._key is not None:
-                cstr = cu.decrypt_data(cu.decode_data(ctxt['context']),
-                                       self._key)
-                ctxt = jsonutils.loads(cstr)
-        except (ValueError, TypeError):
+                ctxt = self._decrypt(ctxt['context'], _CONTEXT_AD)
+        except (ValueError, TypeError, AttributeError):
             return ctxt
 
         return ctxt
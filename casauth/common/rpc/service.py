@@ -9,6 +9,7 @@ from oslo_service import service
 from oslo_utils import importutils
 from osprofiler import profiler
 
+from casauth import grpc
 from casauth import rpc
 from casauth.common import cfg
 from casauth.common.rpc import secure_serializer as ssz
@@ -77,3 +78,4 @@ class RpcService(service.Service):
             pass
 
         super(RpcService, self).stop()
+        grpc.close_channels()
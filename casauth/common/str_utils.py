@@ -8,10 +8,10 @@ import time
 import uuid
 
 import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from oslo_log import log as logging
 
 from casauth.common import cfg
+from casauth.common import password_utils
 
 
 CONF = cfg.CONF
@@ -68,7 +68,7 @@ def gen_user_password(password):
     :param password:
     :return:
     """
-    return generate_password_hash(password)
+    return password_utils.hash_password(password)
 
 
 def check_user_password(password_hash, password):
@@ -78,7 +78,7 @@ def check_user_password(password_hash, password):
     :param password:
     :return:
     """
-    return check_password_hash(password_hash, password)
+    return password_utils.verify_password(password_hash, password)
 
 
 def valid_user_password(password, requirement):
@@ -162,18 +162,18 @@ def password_requirement_desc(requirement):
     return ', '.join(desc)
 
 
-def jwt_encode_token(data, expires_in=None, key=None, algorithm='HS256'):
+def jwt_encode_token(data, expires_in=None, key=None, algorithm='HS256', claims=None):
     """
     Gen token for data.
     :param data: data to encode
     :param expires_in: time expire (seconds)
     :param key: secret key
     :param algorithm: algorithm
+    :param claims: extra claims to put in the token
     :return:
     """
-    content = {
-        'data': data,
-    }
+    content = dict(claims) if claims else {}
+    content['data'] = data
     if expires_in:
         content.update({'exp': time.time() + expires_in})
     else:
@@ -196,10 +196,21 @@ def jwt_decode_token(token, key=None, algorithms=('HS256',)):
     :param algorithms: algorithms
     :return:
     """
+    return jwt_decode_claims(token, key=key, algorithms=algorithms)['data']
+
+
+def jwt_decode_claims(token, key=None, algorithms=('HS256',)):
+    """
+    Decode token and return all claims, including 'exp' if set.
+    :param token:
+    :param key: secret key
+    :param algorithms: algorithms
+    :return:
+    """
     key = key or CONF.wsgi.api_secret_key
     algorithms = algorithms or ('HS256',)
     try:
-        return jwt.decode(token, key=key, algorithms=algorithms)['data']
+        return jwt.decode(token, key=key, algorithms=algorithms)
     except ValueError as e:
         LOG.debug(e)
         raise
@@ -0,0 +1,135 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import collections
+import threading
+import time
+
+from oslo_log import log as logging
+from sqlalchemy import func
+
+from casauth.common import cfg
+from casauth.db.sqlalchemy import api as md_api
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+# Read-only snapshot of a Configuration row
+ConfigItem = collections.namedtuple(
+    'ConfigItem', ('id', 'type', 'name', 'version', 'contents', 'extra', 'updated_at'))
+
+_CACHE = None
+_LOCK = threading.Lock()
+
+
+class ConfigCache(object):
+    """
+    Enabled configurations kept in memory.
+
+    All the rows are loaded at once and served without querying. A change
+    is detected by one aggregate query over the table (row count, max id,
+    max version, last update) run at most every check_interval seconds,
+    the rows are then loaded again. invalidate() forces the check on the
+    next read, it is called when a configuration is saved in the process.
+    """
+
+    def __init__(self, check_interval=30):
+        self.check_interval = check_interval
+        self._configs = None  # name -> list of ConfigItem by version desc
+        self._signature = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, name, type=None):
+        """
+        Get the enabled configuration of the highest version.
+        :param name:
+        :param type: ConfigurationType, any type if None
+        :return: a ConfigItem, None if not found
+        """
+        for item in self._get_configs().get(name, ()):
+            if type is None or item.type == type:
+                return item
+        return None
+
+    def get_contents(self, name, type=None, default=None):
+        """
+        Get contents of a configuration, must not be modified.
+        :param name:
+        :param type:
+        :param default:
+        :return:
+        """
+        item = self.get(name, type=type)
+        return item.contents if item is not None else default
+
+    def load(self):
+        """
+        Load all the enabled configurations now.
+        :return: number of configurations
+        """
+        with self._lock:
+            self._refresh(force=True)
+            return sum(len(items) for items in self._configs.values())
+
+    def invalidate(self):
+        """
+        Check the table for changes on the next read.
+        :return:
+        """
+        self._checked_at = 0
+
+    def _get_configs(self):
+        configs = self._configs
+        if configs is not None and time.time() - self._checked_at < self.check_interval:
+            return configs
+        with self._lock:
+            if self._configs is None:
+                self._refresh()
+            elif time.time() - self._checked_at >= self.check_interval:
+                try:
+                    self._refresh()
+                except Exception as e:
+                    # Keep serving the loaded configurations
+                    LOG.warning('Failed to check configurations for changes: %s', e)
+                    self._checked_at = time.time()
+            return self._configs
+
+    def _refresh(self, force=False):
+        from casauth.db import models as md
+
+        model = md.Configuration
+        db_session = md_api.new_session()
+        try:
+            signature = tuple(db_session.query(
+                func.count(model.id), func.max(model.id),
+                func.max(model.version), func.max(model.updated_at)).one())
+            if force or self._configs is None or signature != self._signature:
+                rows = (db_session.query(model)
+                        .filter(model.status.is_(True))
+                        .order_by(model.version.desc()).all())
+                configs = {}
+                for row in rows:
+                    configs.setdefault(row.name, []).append(ConfigItem(
+                        id=row.id, type=row.type, name=row.name, version=row.version,
+                        contents=row.contents, extra=row.extra, updated_at=row.updated_at))
+                self._configs = configs
+                self._signature = signature
+                LOG.debug('Loaded %d configurations', len(rows))
+        finally:
+            db_session.close()
+        self._checked_at = time.time()
+
+
+def get_cache():
+    """
+    Get the configuration cache of the process.
+    :return:
+    """
+    global _CACHE
+    if _CACHE is None:
+        with _LOCK:
+            if _CACHE is None:
+                _CACHE = ConfigCache(check_interval=CONF.wsgi.config_cache_check_interval)
+    return _CACHE
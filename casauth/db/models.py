@@ -1,12 +1,18 @@
+import hashlib
+import time
+import uuid
+
 from oslo_log import log as logging
 from oslo_utils import strutils, importutils
 from sqlalchemy import or_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm.attributes import flag_modified, flag_dirty
 from sqlalchemy import orm
-from sqlalchemy import (Column, Integer, String, JSON, Text, DateTime, Boolean, SmallInteger, Enum)
+from sqlalchemy import (Column, Integer, BigInteger, String, JSON, Text, DateTime, Boolean, SmallInteger,
+                        Enum)
 from sqlalchemy import ForeignKey, Index
 
+from casauth.common import cache_utils
 from casauth.common import cfg
 from casauth.common import objects
 from casauth.common import data_utils
@@ -18,6 +24,8 @@ from casauth.common import exceptions as cas_exc
 from casauth.common import pagination
 from casauth.common import utils
 from casauth.common.i18n import _
+from casauth.db import config_cache
+from casauth.db import token_revocation
 from casauth.db import types as md_type
 from casauth.db.query import db_query
 from casauth.db.sqlalchemy import api as md_api
@@ -30,6 +38,35 @@ def get_model_class(name):
     return importutils.import_class('{}.{}'.format(CONF.db_model_implementation, name))
 
 
+_TOKEN_CACHE = None
+
+
+def get_token_cache():
+    """
+    Get the process-wide cache of verified access tokens.
+    :return:
+    """
+    global _TOKEN_CACHE
+    if _TOKEN_CACHE is None:
+        _TOKEN_CACHE = cache_utils.TTLCache(maxsize=CONF.wsgi.token_cache_size,
+                                           ttl=CONF.wsgi.token_cache_ttl)
+    return _TOKEN_CACHE
+
+
+def invalidate_user_tokens(user_id=None):
+    """
+    Drop cached token verifications of a user, of all the users if None.
+    Other processes drop theirs on their next revocation poll.
+    :param user_id:
+    :return:
+    """
+    if user_id is None:
+        get_token_cache().clear()
+    else:
+        get_token_cache().invalidate_tag(user_id)
+    token_revocation.invalidate_user(user_id)
+
+
 def persisted_models():
     return {
         'user': User,
@@ -40,6 +77,7 @@ def persisted_models():
         'log_entry': LogEntry,
         'configuration': Configuration,
         'lock': Lock,
+        'revoked_token': RevokedToken,
     }
 
 
@@ -236,8 +274,8 @@ class DatabaseModel(ModelBase):
         :param is_admin:
         :return:
         """
-        return data_utils.dump_value(self, fields=fields, extra_fields=extra_fields,
-                                     is_admin=is_admin)
+        return data_utils.get_dumper(self.__class__, fields=fields, extra_fields=extra_fields,
+                                     is_admin=is_admin)(self)
 
     def to_json(self, **kw):
         """
@@ -337,6 +375,30 @@ class UserGroup(BASE, DatabaseModel):
     def __repr__(self):
         return '<UserGroup {} name={}>'.format(self.id, self.name)
 
+    def save(self):
+        result = super(UserGroup, self).save()
+        self.invalidate_tokens()
+        return result
+
+    def update(self, **values):
+        result = super(UserGroup, self).update(**values)
+        self.invalidate_tokens()
+        return result
+
+    def delete(self):
+        result = super(UserGroup, self).delete()
+        self.invalidate_tokens()
+        return result
+
+    def invalidate_tokens(self):
+        """
+        Cached users hold their group, all of them are dropped once the
+        change is committed.
+        :return:
+        """
+        if self.id is not None:
+            md_api.after_commit(invalidate_user_tokens)
+
 
 class User(BASE, DatabaseModel):
     __tablename__ = 'user'
@@ -397,18 +459,143 @@ class User(BASE, DatabaseModel):
         end_date = self.ended_at
         return end_date and time_utils.utc_now() > end_date
 
-    def gen_token(self, expires_in=600):
-        return str_utils.jwt_encode_token(self.id, expires_in=expires_in, algorithm='HS256')
+    def gen_token(self, expires_in=600, family=None, token_type=md_type.TokenType.ACCESS):
+        """
+        Gen a token of this user.
+        :param expires_in: seconds
+        :param family: family id shared by the tokens of a login, so that
+            they can be revoked together; a new family if None
+        :param token_type: TokenType
+        :return:
+        """
+        claims = {
+            'jti': uuid.uuid4().hex,
+            'fam': family or uuid.uuid4().hex,
+            'typ': token_type,
+            'iat': int(time.time()),
+        }
+        if CONF.wsgi.token_claims:
+            claims['user'] = self.token_claims()
+        return str_utils.jwt_encode_token(self.id, expires_in=expires_in, algorithm='HS256',
+                                          claims=claims)
+
+    def token_claims(self):
+        """
+        User attributes put into access tokens when [wsgi] token_claims is on.
+        Tokens are readable by anyone holding them, so no personal data is
+        put, only what is needed to authorize the user.
+        :return:
+        """
+        return {
+            'user_type': self.user_type.value,
+            'account_type': self.account_type.value,
+            'role': self.role.value,
+            'status': self.status.value,
+        }
+
+    def save(self):
+        result = super(User, self).save()
+        self.invalidate_tokens()
+        return result
+
+    def update(self, **values):
+        result = super(User, self).update(**values)
+        self.invalidate_tokens()
+        return result
+
+    def delete(self):
+        result = super(User, self).delete()
+        self.invalidate_tokens()
+        return result
+
+    def invalidate_tokens(self):
+        """
+        Drop cached token verifications of this user once the change is
+        committed, in all the processes, so that changes of role/status
+        take effect on the next request.
+        :return:
+        """
+        if self.id is not None:
+            md_api.after_commit(invalidate_user_tokens, self.id)
 
     @staticmethod
-    def verify_token(token):
+    def verify_token(token, loader=None):
+        """
+        Verify access token and get the token user.
+        :param token:
+        :param loader: function to load user by id on cache miss
+        :return:
+        """
+        cache = get_token_cache()
+        token_key = hashlib.sha256(token.encode('utf-8')).digest()
+        entry = cache.get(token_key)
         try:
-            user_id = str_utils.jwt_decode_token(token, algorithms=['HS256'])
-            return User.raw_query().get(user_id)
+            if entry is not None:
+                user, claims, loaded_at = entry
+                if token_revocation.is_revoked(claims):
+                    return None
+                if not token_revocation.get_index().user_changed(user.id, since=loaded_at):
+                    return md_api.attach(user)
+            else:
+                claims = str_utils.jwt_decode_claims(token, algorithms=['HS256'])
+                if token_revocation.is_revoked(claims):
+                    return None
+            loaded_at = time.time()
+            user = (loader or User.raw_query().get)(claims['data'])
         except BaseException as e:
             LOG.warning(e)
             return None
 
+        if user is None:
+            return None
+        # Cache the loaded object and hand out copies only, so callers
+        # modifying the user never touch the cached state. Claims are kept
+        # to check revocations on cache hits, and the load time to check
+        # changes of the user.
+        cache.set(token_key, (user, claims, loaded_at), expires_at=claims.get('exp'), tag=user.id)
+        return md_api.attach(user)
+
+    @staticmethod
+    def verify_tokens(tokens):
+        """
+        Verify multiple access tokens. Users of tokens not in cache
+        are loaded by a single query.
+        :param tokens:
+        :return: list of users in the same order as tokens, None for invalid ones
+        """
+        cache = get_token_cache()
+        revocations = token_revocation.get_index()
+        users = [None] * len(tokens)
+        missing = {}  # user id -> [(index, token key, claims)]
+        for index, token in enumerate(tokens):
+            token_key = hashlib.sha256(token.encode('utf-8')).digest()
+            entry = cache.get(token_key)
+            if entry is not None:
+                user, claims, loaded_at = entry
+                if token_revocation.is_revoked(claims):
+                    continue
+                if not revocations.user_changed(user.id, since=loaded_at):
+                    users[index] = md_api.attach(user)
+                    continue
+            else:
+                try:
+                    claims = str_utils.jwt_decode_claims(token, algorithms=['HS256'])
+                except BaseException as e:
+                    LOG.warning(e)
+                    continue
+                if token_revocation.is_revoked(claims):
+                    continue
+            missing.setdefault(claims['data'], []).append((index, token_key, claims))
+
+        if missing:
+            loaded_at = time.time()
+            for user in User.raw_query().filter(User.id.in_(list(missing))).all():
+                for index, token_key, claims in missing[user.id]:
+                    cache.set(token_key, (user, claims, loaded_at), expires_at=claims.get('exp'),
+                              tag=user.id)
+                    users[index] = md_api.attach(user)
+        return users
+
 
 class UserProfile(BASE, DatabaseModel):
     __tablename__ = 'user_profile'
@@ -445,6 +632,35 @@ class UserProfile(BASE, DatabaseModel):
     def __repr__(self):
         return '<UserProfile {}>'.format(self.id)
 
+    def save(self):
+        result = super(UserProfile, self).save()
+        self.invalidate_tokens()
+        return result
+
+    def update(self, **values):
+        result = super(UserProfile, self).update(**values)
+        self.invalidate_tokens()
+        return result
+
+    def delete(self):
+        result = super(UserProfile, self).delete()
+        self.invalidate_tokens()
+        return result
+
+    def invalidate_tokens(self):
+        """
+        Cached users hold their profile, they are dropped once the change
+        is committed.
+        :return:
+        """
+        if self.id is not None:
+            md_api.after_commit(self._invalidate_users, self.id)
+
+    @staticmethod
+    def _invalidate_users(profile_id):
+        for user_id, in User.raw_query().filter(User.profile_id == profile_id).with_entities(User.id):
+            invalidate_user_tokens(user_id)
+
     @property
     def country(self):
         return locale_utils.get_country_name(self.country_code)
@@ -508,19 +724,50 @@ class Region(BASE, DatabaseModel):
 class Lock(BASE, DatabaseModel):
     __tablename__ = 'lock'
 
-    __user_fields__ = ('id', 'timestamp')
-    __admin_fields__ = __user_fields__
+    __user_fields__ = ('id', 'name', 'token', 'expires_at')
+    __admin_fields__ = __user_fields__ + ('owner', 'reason', 'created_at', 'updated_at')
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False, unique=True)
+    # Owner of the current lease, empty when the lock is free
+    owner = Column(String(50))
+    # Fencing token, increased on each acquisition
+    token = Column(BigInteger, nullable=False, default=0)
+    reason = Column(String(100))
+    expires_at = Column(DateTime)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
-    reason = Column(String(100))
-    content_type = Column(Integer, ForeignKey('content_type.id'), nullable=False)
 
     def __repr__(self):
         return '<Lock {}>'.format(self.id)
 
 
+class RevokedToken(BASE, DatabaseModel):
+    __tablename__ = 'revoked_token'
+    __table_args__ = (
+        Index('revoked_token_jti_idx', 'jti', unique=True),
+        Index('revoked_token_created_at_idx', 'created_at'),
+        Index('revoked_token_expires_at_idx', 'expires_at'),
+    )
+
+    __user_fields__ = ('id', 'jti', 'family', 'reason', 'expires_at')
+    __admin_fields__ = __user_fields__ + ('user_id', 'created_at', 'updated_at')
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # Either a token id, or a family id revoking all the tokens of a login
+    jti = Column(String(32))
+    family = Column(String(32))
+    user_id = Column(Integer)
+    reason = Column(String(20))
+    # Expiry of the revoked tokens, the row is useless after
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    def __repr__(self):
+        return '<RevokedToken {}>'.format(self.id)
+
+
 class Configuration(BASE, DatabaseModel):
     __tablename__ = 'configuration'
     __table_args__ = (
@@ -557,6 +804,21 @@ class Configuration(BASE, DatabaseModel):
         """
         self.version = objects.Version(version).get_code()
 
+    def save(self):
+        result = super(Configuration, self).save()
+        md_api.after_commit(config_cache.get_cache().invalidate)
+        return result
+
+    def update(self, **values):
+        result = super(Configuration, self).update(**values)
+        md_api.after_commit(config_cache.get_cache().invalidate)
+        return result
+
+    def delete(self):
+        result = super(Configuration, self).delete()
+        md_api.after_commit(config_cache.get_cache().invalidate)
+        return result
+
 
 class Partner(BASE, DatabaseModel):
     __tablename__ = 'partner'
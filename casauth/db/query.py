@@ -1,12 +1,52 @@
+import base64
+import datetime
+from decimal import Decimal
+import enum
 from math import ceil
 
 from oslo_utils import importutils
+from sqlalchemy import and_, or_
+from sqlalchemy import cast, Enum, String
+
+from casauth.common import cache_utils
 from casauth.common import cfg
+from casauth.common import json
 from casauth.common import exceptions as cas_exc
 from casauth.db.sqlalchemy import api as md_api
 
 CONF = cfg.CONF
 
+_COUNT_CACHE = None
+
+
+def get_count_cache():
+    """
+    Get the process-wide cache of list total counts.
+    :return:
+    """
+    global _COUNT_CACHE
+    if _COUNT_CACHE is None:
+        _COUNT_CACHE = cache_utils.TTLCache(maxsize=CONF.wsgi.count_cache_size,
+                                           ttl=CONF.wsgi.count_cache_ttl)
+    return _COUNT_CACHE
+
+
+def _count(query, count_key=None):
+    """
+    Count items of a query, reusing a recent count of the same key.
+    :param query:
+    :param count_key: signature of the query conditions, None to skip the cache
+    :return:
+    """
+    if count_key is None:
+        return query.count()
+    cache = get_count_cache()
+    total = cache.get(count_key)
+    if total is None:
+        total = query.count()
+        cache.set(count_key, total)
+    return total
+
 
 class Query(object):
     """Mimics sqlalchemy query object.
@@ -63,13 +103,30 @@ class Query(object):
             return (collection[0:-1], collection[-2]['id'])
         return (collection, None)
 
-    def paginate(self, page=None, per_page=None, error_out=True, max_per_page=None):
-        args = self._conditions.pop('args', None)
-        order_by = self._conditions.pop('order_by', None)
-        if args:
-            query = md_api.query(self._model, *args, order_by=order_by, **self._conditions)
-        else:
-            query = md_api.query(self._model, order_by=order_by, **self._conditions)
+    def _build_query(self):
+        conditions = dict(self._conditions)
+        args = conditions.pop('args', None) or []
+        order_by = conditions.pop('order_by', None)
+        options = conditions.pop('options', None)
+        query = md_api.query(self._model, *args, order_by=order_by, **conditions)
+        if options:
+            query = query.options(*options)
+        return query
+
+    def paginate(self, page=None, per_page=None, error_out=True, max_per_page=None,
+                 with_total=True, count_key=None):
+        """
+        Get a page of items.
+        :param page: page index from 1
+        :param per_page:
+        :param error_out:
+        :param max_per_page:
+        :param with_total: count all the items matching the query, otherwise
+            has_next is found by fetching one more item than per_page
+        :param count_key: signature of the query conditions for reusing counts
+        :return: a Pagination object
+        """
+        query = self._build_query()
         if page is None:
             page = 1
 
@@ -91,13 +148,67 @@ class Query(object):
             else:
                 per_page = 20
 
-        items = query.limit(per_page).offset((page - 1) * per_page).all()
+        items = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+        has_next = len(items) > per_page
+        items = items[:per_page]
         if not items and page != 1 and error_out:
             pass
 
-        total = query.order_by(None).count()
+        total = _count(query.order_by(None), count_key) if with_total else None
 
-        return Pagination(self, page, per_page, total, items)
+        return Pagination(self, page, per_page, total, items, has_next=has_next)
+
+    def seek(self, sort_keys, cursor=None, per_page=None, with_total=False, count_key=None):
+        """
+        Get items following a cursor (keyset pagination).
+        Unlike paginate(), the cost of a page does not depend on its
+        position as the items are found by `WHERE (sort keys) > (cursor)`
+        instead of OFFSET.
+        :param sort_keys: list of (column, 'asc'/'desc'), should end with
+            an unique non-null column. NULLs are placed last when
+            ascending and first when descending, enums are sorted by name.
+        :param cursor: next_cursor of the previous page, None for the first page
+        :param per_page:
+        :param with_total: count all the items matching the query
+        :param count_key: signature of the query conditions for reusing counts
+        :return: a CursorPagination object
+        """
+        if per_page is None or per_page < 0:
+            per_page = 20
+
+        query = self._build_query().order_by(None)
+        total = _count(query, count_key) if with_total else None
+
+        if cursor:
+            values = decode_cursor(cursor, sort_keys)
+            query = query.filter(_seek_condition(sort_keys, values))
+
+        items = query.order_by(*_seek_order_by(sort_keys)).limit(per_page + 1).all()
+
+        next_cursor = None
+        if len(items) > per_page:
+            items = items[:per_page]
+            last = items[-1]
+            next_cursor = encode_cursor(sort_keys,
+                                        [getattr(last, column.key) for column, _ in sort_keys])
+
+        return CursorPagination(self, per_page, items, next_cursor, total)
+
+    def stream(self, batch_size=1000):
+        """
+        Iterate all items without loading them at once.
+        Rows are read from a server-side cursor and turned into objects
+        batch by batch, so memory use is bound by batch_size.
+        :param batch_size:
+        :return: a generator of items, its session is closed when it is
+            exhausted or closed
+        """
+        # Rows are read after the unit of work of the task has ended
+        db_session = md_api.new_session()
+        try:
+            yield from self._build_query().with_session(db_session).yield_per(batch_size)
+        finally:
+            db_session.close()
 
 
 class Pagination(object):
@@ -108,7 +219,7 @@ class Pagination(object):
     no longer work.
     """
 
-    def __init__(self, query, page, per_page, total, items):
+    def __init__(self, query, page, per_page, total, items, has_next=None):
         #: the unlimited query object that was used to create this
         #: pagination object.
         self.query = query
@@ -116,14 +227,17 @@ class Pagination(object):
         self.page = page
         #: the number of items to be displayed on a page.
         self.per_page = per_page
-        #: the total number of items matching the query
+        #: the total number of items matching the query, None if not counted
         self.total = total
         #: the items for the current page
         self.items = items
+        self._has_next = has_next
 
     @property
     def pages(self):
-        """The total number of pages"""
+        """The total number of pages, None if items were not counted"""
+        if self.total is None:
+            return None
         if self.per_page == 0:
             pages = 0
         else:
@@ -157,6 +271,8 @@ class Pagination(object):
     @property
     def has_next(self):
         """True if a next page exists."""
+        if self._has_next is not None:
+            return self._has_next
         return self.page < self.pages
 
     @property
@@ -203,6 +319,153 @@ class Pagination(object):
                 last = num
 
 
+class CursorPagination(object):
+    """Internal helper class returned by :meth:`Query.seek`.
+    """
+
+    def __init__(self, query, per_page, items, next_cursor, total=None):
+        self.query = query
+        self.per_page = per_page
+        self.items = items
+        #: cursor of the next page, None for the last page
+        self.next_cursor = next_cursor
+        #: the total number of items, None if not counted
+        self.total = total
+
+    @property
+    def has_next(self):
+        """True if a next page exists."""
+        return self.next_cursor is not None
+
+
+def _sort_key_names(sort_keys):
+    return ['{}__{}'.format(column.key, direction) for column, direction in sort_keys]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.strftime(json.DATE_TIME_MICROSEC_FORMAT)}
+    if isinstance(value, datetime.date):
+        return {'d': value.strftime(json.DATE_FORMAT)}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    if isinstance(value, enum.Enum):
+        return {'e': value.name}
+    return value
+
+
+def _decode_value(value, column):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.datetime.strptime(value['dt'], json.DATE_TIME_MICROSEC_FORMAT)
+        if 'd' in value:
+            return datetime.datetime.strptime(value['d'], json.DATE_FORMAT).date()
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        enum_class = getattr(_table_column(column).type, 'enum_class', None)
+        if 'e' in value and enum_class is not None:
+            try:
+                return enum_class[value['e']]
+            except KeyError:
+                pass
+        raise ValueError('Cursor value invalid')
+    return value
+
+
+def encode_cursor(sort_keys, values):
+    """
+    Encode the sort key values of the last item of a page to an opaque cursor.
+    :param sort_keys: list of (column, direction)
+    :param values:
+    :return:
+    """
+    data = {
+        'k': _sort_key_names(sort_keys),
+        'v': [_encode_value(v) for v in values],
+    }
+    data = json.json_dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_keys):
+    """
+    Decode a cursor created by encode_cursor() with the same sort keys.
+    :param cursor:
+    :param sort_keys:
+    :return: list of the sort key values
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.json_loads(data.decode('utf-8'))
+        keys, values = data['k'], data['v']
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError('Cursor invalid: {}'.format(e))
+    if keys != _sort_key_names(sort_keys) or len(values) != len(keys):
+        raise ValueError('Cursor does not match the sort keys')
+    return [_decode_value(v, column) for v, (column, _) in zip(values, sort_keys)]
+
+
+def _table_column(column):
+    return column.property.columns[0]
+
+
+def _sort_expression(column):
+    """
+    Enums are stored by name, they are compared and sorted as strings so
+    that the order is the same as the cursor comparison on any database.
+    """
+    if isinstance(_table_column(column).type, Enum):
+        return cast(column, String)
+    return column
+
+
+def _seek_order_by(sort_keys):
+    """
+    Build the order of keyset pagination. NULLs of nullable keys are put
+    last when ascending and first when descending by sorting on
+    `key IS NULL` first, whatever the database default is.
+    :param sort_keys:
+    :return:
+    """
+    order_by = []
+    for column, direction in sort_keys:
+        if _table_column(column).nullable:
+            order_by.append(getattr(column.is_(None), direction)())
+        order_by.append(getattr(_sort_expression(column), direction)())
+    return order_by
+
+
+def _seek_condition(sort_keys, values):
+    """
+    Build the condition of items placed after values in the sort order, i.e.
+        (k1 > v1) OR (k1 == v1 AND k2 > v2) OR ...
+    with `<` for descending keys. NULL values are compared explicitly
+    following the order of _seek_order_by().
+    :param sort_keys:
+    :param values:
+    :return:
+    """
+    clauses = []
+    equals = []
+    for (column, direction), value in zip(sort_keys, values):
+        expression = _sort_expression(column)
+        if isinstance(value, enum.Enum):
+            value = value.name
+        if value is None:
+            # NULLs are last when ascending, nothing is after them
+            after = column.isnot(None) if direction == 'desc' else None
+            equal = column.is_(None)
+        else:
+            after = expression < value if direction == 'desc' else expression > value
+            if direction != 'desc' and _table_column(column).nullable:
+                after = or_(after, column.is_(None))
+            equal = expression == value
+        if after is not None:
+            clauses.append(and_(*equals, after) if equals else after)
+        equals.append(equal)
+    return or_(*clauses)
+
+
 class Queryable(object):
 
     def __getattr__(self, item):
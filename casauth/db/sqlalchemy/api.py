@@ -57,7 +57,37 @@ def find_by_filter(model, **kwargs):
     return _query_by_filter(model, *filters, **kwargs)
 
 
+def _flush_nested(uow, func, *args, **kwargs):
+    """
+    Run a change in a savepoint of a unit of work and write it at once,
+    so that its failure is returned to the caller and only discards the
+    change, the unit of work can go on.
+    :param uow:
+    :param func: function making the change, raising CasError on failure
+    :return: (result, error)
+    """
+    savepoint = None
+    try:
+        savepoint = uow.session.begin_nested()
+        result = func(*args, **kwargs)
+        uow.flush()
+        savepoint.commit()
+        return result, None
+    except BaseException as e:
+        if savepoint is not None:
+            savepoint.rollback()
+        if isinstance(e, cas_exc.CasError):
+            return None, e
+        if isinstance(e, sqlalchemy.exc.IntegrityError):
+            return None, cas_exc.InvalidModelError(message=cas_errors.DB_COMMIT_FAILED, cause=e)
+        return None, cas_exc.CasError(message=cas_errors.DB_COMMIT_FAILED, cause=e)
+
+
 def save(model):
+    uow = session.get_unit_of_work()
+    if uow is not None:
+        return _flush_nested(uow, uow.add, model)
+
     db_session = None
     try:
         db_session = session.get_session()
@@ -65,18 +95,21 @@ def save(model):
         db_session.flush()
         return model, None
     except sqlalchemy.exc.IntegrityError as error:
-        print(error)
         if db_session:
             db_session.rollback()
         return None, cas_exc.InvalidModelError(message=cas_errors.DB_COMMIT_FAILED, cause=error)
     except BaseException as e:
-        print(e)
         if db_session:
             db_session.rollback()
         return None, cas_exc.CasError(message=cas_errors.DB_COMMIT_FAILED, cause=e)
 
 
 def delete(model):
+    uow = session.get_unit_of_work()
+    if uow is not None:
+        _, error = _flush_nested(uow, uow.delete, model)
+        return None, error
+
     db_session = None
     try:
         db_session = session.get_session()
@@ -94,6 +127,116 @@ def delete(model):
         return None, cas_exc.CasError(message=cas_errors.DB_COMMIT_FAILED, cause=e)
 
 
+def begin():
+    """
+    Start a unit of work, until it is committed or rolled back all saves
+    and deletes of the current green thread share one transaction. E.g.
+        uow = begin()
+        try:
+            profile.create()
+            user.create()
+        except BaseException:
+            uow.rollback()
+            raise
+        _, error = commit(uow)
+    :return:
+    """
+    return session.begin_unit_of_work()
+
+
+def commit(uow):
+    """
+    Write all changes of a unit of work by one flush and commit.
+    :param uow:
+    :return: (None, error)
+    """
+    try:
+        uow.commit()
+        return None, None
+    except sqlalchemy.exc.IntegrityError as error:
+        return None, cas_exc.InvalidModelError(message=cas_errors.DB_COMMIT_FAILED, cause=error)
+    except BaseException as e:
+        return None, cas_exc.CasError(message=cas_errors.DB_COMMIT_FAILED, cause=e)
+
+
+def flush():
+    """
+    Write pending changes of the current unit of work without committing,
+    e.g. to get ids of new objects. Does nothing outside a unit of work.
+    :return: (None, error)
+    """
+    uow = session.get_unit_of_work()
+    if uow is None:
+        return None, None
+    try:
+        uow.flush()
+        return None, None
+    except sqlalchemy.exc.IntegrityError as error:
+        return None, cas_exc.InvalidModelError(message=cas_errors.DB_COMMIT_FAILED, cause=error)
+    except BaseException as e:
+        return None, cas_exc.CasError(message=cas_errors.DB_COMMIT_FAILED, cause=e)
+
+
+def save_nested(save_func, *args, **kwargs):
+    """
+    Run a save in a savepoint of the current unit of work and write it at
+    once, so that its failure is returned here and only discards its own
+    changes, e.g. for best effort writes. Without unit of work the save is
+    run as is.
+    :param save_func: function returning (result, error), e.g. model.save
+    :return: (result, error)
+    """
+    uow = session.get_unit_of_work()
+    if uow is None:
+        return save_func(*args, **kwargs)
+
+    def _save():
+        result, error = save_func(*args, **kwargs)
+        if error:
+            raise error
+        return result
+
+    return _flush_nested(uow, _save)
+
+
+def after_commit(func, *args, **kwargs):
+    """
+    Run a function once the current unit of work is committed, it is
+    dropped if the unit of work is rolled back. Without unit of work the
+    function is run now.
+    :param func:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    uow = session.get_unit_of_work()
+    if uow is None:
+        return func(*args, **kwargs)
+    uow.after_commit(func, *args, **kwargs)
+
+
+def bulk_insert(model_class, mappings, return_defaults=False):
+    """
+    Insert rows of dicts by executemany, in the current unit of work if any.
+    Model events and validation are skipped.
+    :param model_class:
+    :param mappings: list of dicts of column values
+    :param return_defaults: set generated ids to the dicts, rows are
+        then inserted one by one
+    :return:
+    """
+    session.get_current_session().bulk_insert_mappings(model_class, mappings,
+                                                       return_defaults=return_defaults)
+
+
+def new_session():
+    """
+    Create a session out of the current unit of work.
+    :return:
+    """
+    return session.get_session()
+
+
 def delete_all(query_func, model, **conditions):
     query_func(model, **conditions).delete()
 
@@ -169,6 +312,16 @@ def load(model_class, id):
     return model_class.raw_query().get(id)
 
 
+def attach(model):
+    """
+    Copy a detached (e.g. cached) model object into a new session
+    without querying the database.
+    :param model:
+    :return:
+    """
+    return session.get_current_session().merge(model, load=False)
+
+
 def query(model_class, *args, order_by=None, **kwargs):
     """
     Create query for model class. E.g.
@@ -196,7 +349,7 @@ def query(model_class, *args, order_by=None, **kwargs):
 
 
 def _base_query(cls):
-    sess = session.get_session()
+    sess = session.get_current_session()
     return sess.query(cls)
 
 
@@ -0,0 +1,343 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import datetime
+import hashlib
+import math
+import threading
+import time
+import uuid
+
+from oslo_log import log as logging
+import sqlalchemy.exc
+from sqlalchemy import and_, or_, select, text
+
+from casauth.db import models as md
+from casauth.db.sqlalchemy import session
+
+LOG = logging.getLogger(__name__)
+
+# Prefix of MySQL user lock names, names are hashed to fit 64 chars
+_NAMED_LOCK_PREFIX = 'cas-lock:'
+
+_SERVICE = None
+_LOCK = threading.Lock()
+
+
+class Lease(object):
+    """
+    A lock held until it is released or its lease expires.
+
+    The fencing token grows on every acquisition of the same lock name,
+    so that writes of an owner whose lease expired can be rejected by
+    comparing tokens.
+    """
+
+    def __init__(self, service, name, owner, token, expires_at):
+        self.service = service
+        self.name = name
+        self.owner = owner
+        self.token = token
+        self.expires_at = expires_at
+        # MySQL connection holding the user lock
+        self._conn = None
+        # In-process lock of the name
+        self._local = None
+
+    @property
+    def expired(self):
+        return self.expires_at <= datetime.datetime.utcnow()
+
+    def extend(self, lease_time):
+        return self.service.extend(self, lease_time)
+
+    def release(self):
+        return self.service.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __repr__(self):
+        return '<Lease {} token={}>'.format(self.name, self.token)
+
+
+class _LocalLock(object):
+    """
+    Lock of a name within the process, shared by the waiting threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class LockService(object):
+    """
+    Lease locks stored in the `lock` table.
+
+    A lock is taken by one atomic UPDATE of an expired row or INSERT of
+    a new row, so contenders never read then write. Waiters do not poll
+    the table:
+    - threads of the same process wait on an in-process lock first, so
+      only one of them talks to the database;
+    - on MySQL, the owner also holds a GET_LOCK() user lock, other
+      processes block in GET_LOCK() and wake up on its release. Polling
+      is only used on other databases or after a crashed owner, until
+      its lease expires.
+    """
+
+    def __init__(self, get_engine=None, poll_interval=1, named_locks=None):
+        self._get_engine = get_engine or session.get_engine
+        self.poll_interval = poll_interval
+        self._named_locks = named_locks
+        self._local_locks = {}
+        self._local_mutex = threading.Lock()
+
+    @property
+    def table(self):
+        return md.Lock.__table__
+
+    @property
+    def named_locks(self):
+        if self._named_locks is None:
+            self._named_locks = self._get_engine().dialect.name == 'mysql'
+        return self._named_locks
+
+    def acquire(self, name, lease_time, wait_timeout=None, reason=None, poll_interval=None):
+        """
+        Acquire a lock.
+        :param name:
+        :param lease_time: seconds the lock is held if not released
+        :param wait_timeout: seconds to wait for the lock, don't wait if empty
+        :param reason:
+        :param poll_interval: overrides the service poll_interval
+        :return: a Lease object, None if the lock is held by another owner
+        """
+        deadline = time.time() + (wait_timeout or 0)
+        local = self._get_local(name)
+        if not (local.lock.acquire(timeout=wait_timeout) if wait_timeout else
+                local.lock.acquire(blocking=False)):
+            self._put_local(name, local)
+            return None
+
+        lease = None
+        try:
+            lease = self._acquire(name, lease_time, deadline, reason,
+                                  poll_interval or self.poll_interval)
+        finally:
+            if lease is None:
+                local.lock.release()
+                self._put_local(name, local)
+        if lease is not None:
+            lease._local = local
+        return lease
+
+    def _acquire(self, name, lease_time, deadline, reason, poll_interval):
+        owner = uuid.uuid4().hex
+        conn = None
+        interval = min(0.05, poll_interval)
+        try:
+            while True:
+                if self.named_locks and conn is None:
+                    conn = self._get_named_lock(name, deadline)
+
+                lease = self._try_acquire(name, owner, lease_time, reason)
+                if lease is not None:
+                    lease._conn, conn = conn, None
+                    return lease
+
+                now = time.time()
+                if now >= deadline:
+                    return None
+                if self.named_locks and conn is None:
+                    # Lease of a live owner expired, take it over
+                    continue
+                # The owner crashed or the database has no named locks,
+                # wait for the lease to expire
+                wait = min(interval, deadline - now)
+                expires_at = self._get_expires_at(name)
+                if conn is not None and expires_at is not None:
+                    wait = (expires_at - datetime.datetime.utcnow()).total_seconds()
+                    wait = min(max(wait, 0.01), deadline - now)
+                time.sleep(wait)
+                interval = min(interval * 2, poll_interval)
+        finally:
+            self._close_conn(name, conn)
+
+    def _get_named_lock(self, name, deadline):
+        """
+        Wait for the MySQL user lock of a name, until the deadline or the
+        expiry of the current lease.
+        :param name:
+        :param deadline:
+        :return: the connection holding the user lock, None on timeout
+        """
+        wait = max(0.0, deadline - time.time())
+        expires_at = self._get_expires_at(name)
+        if expires_at is not None:
+            wait = min(wait, max(0.0, (expires_at - datetime.datetime.utcnow()).total_seconds()))
+        conn = self._get_engine().connect()
+        try:
+            acquired = conn.execute(text('SELECT GET_LOCK(:name, :timeout)'),
+                                    name=self._named_lock(name),
+                                    timeout=math.ceil(wait)).scalar()
+        except BaseException:
+            conn.close()
+            raise
+        if acquired != 1:
+            conn.close()
+            return None
+        return conn
+
+    def _try_acquire(self, name, owner, lease_time, reason):
+        table = self.table
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=lease_time)
+        try:
+            with self._get_engine().begin() as conn:
+                result = conn.execute(
+                    table.update()
+                    .where(and_(table.c.name == name,
+                                or_(table.c.owner.is_(None), table.c.expires_at <= now)))
+                    .values(owner=owner, token=table.c.token + 1, reason=reason,
+                            expires_at=expires_at, updated_at=now))
+                if not result.rowcount:
+                    conn.execute(table.insert().values(
+                        name=name, owner=owner, token=1, reason=reason,
+                        expires_at=expires_at, created_at=now, updated_at=now))
+                token = conn.execute(select([table.c.token])
+                                     .where(table.c.name == name)).scalar()
+        except sqlalchemy.exc.IntegrityError:
+            # Inserted by another owner
+            return None
+        return Lease(self, name, owner, token, expires_at)
+
+    def _get_expires_at(self, name):
+        table = self.table
+        with self._get_engine().connect() as conn:
+            return conn.execute(select([table.c.expires_at])
+                                .where(and_(table.c.name == name,
+                                            table.c.owner.isnot(None)))).scalar()
+
+    def extend(self, lease, lease_time):
+        """
+        Renew a lease from now.
+        :param lease:
+        :param lease_time:
+        :return: False if the lease was lost
+        """
+        table = self.table
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=lease_time)
+        with self._get_engine().begin() as conn:
+            result = conn.execute(
+                table.update()
+                .where(and_(table.c.name == lease.name, table.c.owner == lease.owner,
+                            table.c.token == lease.token, table.c.expires_at > now))
+                .values(expires_at=expires_at, updated_at=now))
+        if not result.rowcount:
+            return False
+        lease.expires_at = expires_at
+        return True
+
+    def release(self, lease):
+        """
+        Release a lease.
+        :param lease:
+        :return: False if the lease was already lost
+        """
+        table = self.table
+        now = datetime.datetime.utcnow()
+        try:
+            with self._get_engine().begin() as conn:
+                result = conn.execute(
+                    table.update()
+                    .where(and_(table.c.name == lease.name, table.c.owner == lease.owner,
+                                table.c.token == lease.token))
+                    .values(owner=None, expires_at=now, updated_at=now))
+            released = bool(result.rowcount) and lease.expires_at > now
+        finally:
+            conn, lease._conn = lease._conn, None
+            self._close_conn(lease.name, conn)
+            local, lease._local = lease._local, None
+            if local is not None:
+                local.lock.release()
+                self._put_local(lease.name, local)
+        if not released:
+            LOG.warning('Lock %s was lost before release, lease expired at %s',
+                        lease.name, lease.expires_at)
+        return released
+
+    def force_release(self, name):
+        """
+        Release a lock whoever holds it.
+        :param name:
+        :return: True if the lock was held
+        """
+        table = self.table
+        now = datetime.datetime.utcnow()
+        with self._get_engine().begin() as conn:
+            result = conn.execute(
+                table.update()
+                .where(and_(table.c.name == name, table.c.owner.isnot(None)))
+                .values(owner=None, expires_at=now, updated_at=now))
+        return bool(result.rowcount)
+
+    def get(self, name):
+        """
+        Get the row of a held lock.
+        :param name:
+        :return: dict of the row, None if the lock is free
+        """
+        table = self.table
+        now = datetime.datetime.utcnow()
+        with self._get_engine().connect() as conn:
+            row = conn.execute(table.select().where(
+                and_(table.c.name == name, table.c.owner.isnot(None),
+                     table.c.expires_at > now))).first()
+        return dict(row) if row else None
+
+    def _named_lock(self, name):
+        return _NAMED_LOCK_PREFIX + hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+    def _close_conn(self, name, conn):
+        if conn is None:
+            return
+        try:
+            conn.execute(text('SELECT RELEASE_LOCK(:name)'), name=self._named_lock(name))
+        except sqlalchemy.exc.DBAPIError as e:
+            LOG.warning('Failed to release named lock of %s: %s', name, e)
+        finally:
+            conn.close()
+
+    def _get_local(self, name):
+        with self._local_mutex:
+            local = self._local_locks.get(name)
+            if local is None:
+                local = self._local_locks[name] = _LocalLock()
+            local.users += 1
+            return local
+
+    def _put_local(self, name, local):
+        with self._local_mutex:
+            local.users -= 1
+            if local.users <= 0 and self._local_locks.get(name) is local:
+                del self._local_locks[name]
+
+
+def get_service(poll_interval=1):
+    """
+    Get the lock service of the process.
+    :param poll_interval: max seconds between two tries when polling
+    :return:
+    """
+    global _SERVICE
+    if _SERVICE is None:
+        with _LOCK:
+            if _SERVICE is None:
+                _SERVICE = LockService(poll_interval=poll_interval)
+    return _SERVICE
@@ -0,0 +1,41 @@
+# Copyright 2011 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import MetaData
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime)
+
+from casauth.db.sqlalchemy.migrate_repo.schema import create_tables
+from casauth.db.sqlalchemy.migrate_repo.schema import Table
+
+meta = MetaData()
+
+# Locks are transient, the table is re-created with lease columns
+lock = Table(
+    'lock',
+    meta,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String(100), nullable=False, unique=True),
+    Column('owner', String(50)),
+    Column('token', BigInteger, nullable=False, default=0),
+    Column('reason', String(100)),
+    Column('expires_at', DateTime()),
+    Column('created_at', DateTime()),
+    Column('updated_at', DateTime()),
+)
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    create_tables([lock])
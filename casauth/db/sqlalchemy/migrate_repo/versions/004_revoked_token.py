@@ -0,0 +1,45 @@
+# Copyright 2011 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from sqlalchemy.schema import MetaData
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime)
+from sqlalchemy import Index
+
+from casauth.db.sqlalchemy.migrate_repo.schema import create_tables
+from casauth.db.sqlalchemy.migrate_repo.schema import Table
+
+meta = MetaData()
+
+revoked_token = Table(
+    'revoked_token',
+    meta,
+    Column('id', BigInteger, primary_key=True, autoincrement=True),
+    Column('jti', String(32)),
+    Column('family', String(32)),
+    Column('user_id', Integer),
+    Column('reason', String(20)),
+    Column('expires_at', DateTime(), nullable=False),
+    Column('created_at', DateTime()),
+    Column('updated_at', DateTime()),
+    Index('revoked_token_jti_idx', 'jti', unique=True),
+    Index('revoked_token_created_at_idx', 'created_at'),
+    Index('revoked_token_expires_at_idx', 'expires_at'),
+)
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    create_tables([revoked_token])
@@ -16,9 +16,11 @@
 import contextlib
 import threading
 
+from eventlet import corolocal
 from oslo_db.sqlalchemy import session
 from oslo_log import log as logging
 from sqlalchemy import MetaData
+from sqlalchemy import inspect
 
 from casauth.common import cfg
 from casauth.common.i18n import _
@@ -26,6 +28,8 @@ from casauth.db.sqlalchemy import mappers
 
 _FACADE = None
 _LOCK = threading.Lock()
+# Unit of work of the current green thread
+_LOCAL = corolocal.local()
 
 
 LOG = logging.getLogger(__name__)
@@ -103,6 +107,129 @@ def raw_query(model, **kwargs):
     return get_session(**kwargs).query(model)
 
 
+class UnitOfWork(object):
+    """
+    A transaction shared by all database calls of a task.
+
+    Saved objects are added to one session and flushed in a savepoint at
+    once, so that a failed save is returned to its caller and only
+    discards its own changes, everything is committed together when the
+    unit of work is committed. Nested begin_unit_of_work() calls
+    join the outer unit of work, only the outermost commit is effective
+    and a rollback at any level discards everything.
+    Side effects which must only happen once the changes are written,
+    e.g. sending mails or dropping cached state, are registered by
+    after_commit() and run after the commit, they are discarded on
+    rollback.
+    """
+
+    def __init__(self):
+        self.session = get_session(autocommit=False, expire_on_commit=False)
+        self.depth = 0
+        self.rollback_only = False
+        self._after_commit = []
+
+    def after_commit(self, func, *args, **kwargs):
+        """
+        Run a function after the outermost commit succeeds.
+        :param func:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        self._after_commit.append((func, args, kwargs))
+
+    def add(self, model):
+        """
+        Add an object to the session, objects already in the session
+        are returned as is, detached objects are merged.
+        :param model:
+        :return: the object attached to the session
+        """
+        db_session = self.session
+        if model in db_session:
+            return model
+        if inspect(model).transient:
+            # New object, nothing to merge with
+            db_session.add(model)
+            return model
+        return db_session.merge(model)
+
+    def delete(self, model):
+        self.session.delete(self.add(model))
+
+    def flush(self):
+        self.session.flush()
+
+    def commit(self):
+        if self.depth:
+            self.depth -= 1
+            return
+        try:
+            if self.rollback_only:
+                self.session.rollback()
+                raise RuntimeError(_('Unit of work was rolled back by a nested task.'))
+            self.session.commit()
+        except BaseException:
+            self.session.rollback()
+            self._after_commit = []
+            raise
+        finally:
+            self._end()
+
+        hooks, self._after_commit = self._after_commit, []
+        for func, args, kwargs in hooks:
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                LOG.exception('Failed to run %s after commit: %s', func, e)
+
+    def rollback(self):
+        if self.depth:
+            self.depth -= 1
+            self.rollback_only = True
+            return
+        self._after_commit = []
+        try:
+            self.session.rollback()
+        finally:
+            self._end()
+
+    def _end(self):
+        self.session.close()
+        if getattr(_LOCAL, 'unit_of_work', None) is self:
+            _LOCAL.unit_of_work = None
+
+
+def begin_unit_of_work():
+    """
+    Start a unit of work in the current green thread, or join the
+    one already started.
+    :return:
+    """
+    uow = get_unit_of_work()
+    if uow is not None:
+        uow.depth += 1
+        return uow
+    uow = _LOCAL.unit_of_work = UnitOfWork()
+    return uow
+
+
+def get_unit_of_work():
+    return getattr(_LOCAL, 'unit_of_work', None)
+
+
+def get_current_session():
+    """
+    Get session of the current unit of work, a new session if none.
+    :return:
+    """
+    uow = get_unit_of_work()
+    if uow is not None:
+        return uow.session
+    return get_session()
+
+
 def clean_db():
     engine = get_engine()
     meta = MetaData()
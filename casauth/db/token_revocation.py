@@ -0,0 +1,311 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import threading
+import time
+
+from oslo_log import log as logging
+import sqlalchemy.exc
+from sqlalchemy import or_
+
+from casauth.common import cfg
+from casauth.common import errors
+from casauth.common import exceptions as cas_exc
+from casauth.common import time_utils
+from casauth.db import types as md_type
+from casauth.db.sqlalchemy import api as md_api
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+_INDEX = None
+_LOCK = threading.Lock()
+
+
+def _to_sec(dt):
+    return (dt - time_utils.EPOCH).total_seconds()
+
+
+class RevocationIndex(object):
+    """
+    Revoked tokens kept in memory.
+
+    A token is revoked by its id (jti claim), all the tokens of a login by
+    their family id (fam claim). Revocations are rows of the revoked_token
+    table, each process reads the rows added since its last poll at most
+    every check_interval seconds, so checking a token is two dict lookups.
+    Rows committed late are caught by reading again the rows created in
+    the last commit_lag seconds. Entries are dropped once the tokens they
+    revoke have expired.
+
+    Changes of users are polled the same way, so that verifications of
+    tokens cached by any process before a change are dropped within
+    check_interval seconds.
+    """
+
+    def __init__(self, check_interval=5, commit_lag=60):
+        self.check_interval = check_interval
+        self.commit_lag = commit_lag
+        self._tokens = {}  # jti -> (expires_at, reason)
+        self._families = {}  # family -> (expires_at, reason)
+        self._users = {}  # user id -> (expires_at, changed_at)
+        self._all_changed_at = 0
+        self._last_id = None
+        self._checked_at = 0
+        self._purged_at = time.time()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens) + len(self._families)
+
+    def check(self, jti, family=None):
+        """
+        Check if a token is revoked.
+        :param jti:
+        :param family:
+        :return: revoke reason, None if not revoked
+        """
+        self._maybe_poll()
+        # A revoked family comes first, so a token rotated then reused
+        # is reported as such once only
+        entry = (self._families.get(family) if family else None) or self._tokens.get(jti)
+        return entry[1] if entry else None
+
+    def user_changed(self, user_id, since):
+        """
+        Check if a user is changed after a time.
+        :param user_id:
+        :param since: epoch seconds
+        :return:
+        """
+        self._maybe_poll()
+        entry = self._users.get(user_id)
+        return max(entry[1] if entry else 0, self._all_changed_at) > since
+
+    def add(self, jti=None, family=None, expires_at=None, reason=None,
+            user_id=None, changed_at=None):
+        """
+        Add a revocation written by this process, other processes get it
+        on their next poll.
+        :param jti:
+        :param family:
+        :param expires_at: epoch seconds
+        :param reason:
+        :param user_id: changed user of USER_CHANGED, all users if None
+        :param changed_at: epoch seconds of USER_CHANGED
+        :return:
+        """
+        if reason == md_type.TokenRevokeReason.USER_CHANGED:
+            if user_id is None:
+                self._all_changed_at = max(self._all_changed_at, changed_at)
+            else:
+                entry = self._users.get(user_id)
+                if entry is None or entry[1] < changed_at:
+                    self._users[user_id] = (expires_at, changed_at)
+            return
+        if jti:
+            self._tokens[jti] = (expires_at, reason)
+        if family:
+            self._families[family] = (expires_at, reason)
+
+    def load(self):
+        """
+        Load all the revocations now.
+        :return: number of revoked tokens and families
+        """
+        with self._lock:
+            self._last_id = None
+            self._refresh()
+        return len(self)
+
+    def _maybe_poll(self):
+        if time.time() - self._checked_at >= self.check_interval:
+            self._poll()
+
+    def _poll(self):
+        # Only the first load is waited for, meanwhile other threads go on
+        # with the current entries
+        if not self._lock.acquire(blocking=self._last_id is None):
+            return
+        try:
+            if time.time() - self._checked_at >= self.check_interval:
+                self._refresh()
+        except Exception as e:
+            LOG.warning('Failed to poll revoked tokens: %s', e)
+            self._checked_at = time.time()
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        from casauth.db import models as md
+
+        model = md.RevokedToken
+        now = time.time()
+        db_session = md_api.new_session()
+        try:
+            query = db_session.query(model.id, model.jti, model.family, model.reason,
+                                     model.user_id, model.expires_at, model.created_at)
+            if self._last_id is None:
+                query = query.filter(model.expires_at > time_utils.utc_from_timestamp(now))
+            else:
+                since = time_utils.utc_from_timestamp(self._checked_at - self.commit_lag)
+                query = query.filter(or_(model.id > self._last_id, model.created_at >= since))
+            last_id = self._last_id or 0
+            count = 0
+            for row in query.all():
+                self.add(jti=row.jti, family=row.family, expires_at=_to_sec(row.expires_at),
+                         reason=row.reason, user_id=row.user_id,
+                         changed_at=_to_sec(row.created_at))
+                last_id = max(last_id, row.id)
+                count += 1
+        finally:
+            db_session.close()
+        self._last_id = last_id
+        self._checked_at = now
+        if count:
+            LOG.debug('Loaded %d revoked tokens', count)
+
+        if now - self._purged_at >= self.commit_lag:
+            for entries in (self._tokens, self._families, self._users):
+                for key in [key for key, entry in entries.items() if entry[0] <= now]:
+                    del entries[key]
+            self._purged_at = now
+
+
+def get_index():
+    """
+    Get the revocation index of the process.
+    :return:
+    """
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = RevocationIndex(check_interval=CONF.wsgi.token_revocation_check_interval)
+    return _INDEX
+
+
+def _write(**values):
+    """
+    Write a revocation row and commit it on its own session, out of the
+    unit of work of the request, so that it is kept even if the request
+    fails afterwards.
+    :param values: column values
+    :return: (revocation, error)
+    """
+    from casauth.db import models as md
+
+    now = time_utils.utc_now()
+    revocation = md.RevokedToken(created_at=now, updated_at=now, **values)
+    db_session = md_api.new_session()
+    try:
+        with db_session.begin():
+            db_session.add(revocation)
+    except sqlalchemy.exc.IntegrityError as e:
+        return None, cas_exc.InvalidModelError(message=errors.DB_COMMIT_FAILED, cause=e)
+    except Exception as e:
+        return None, cas_exc.CasError(message=errors.DB_COMMIT_FAILED, cause=e)
+    finally:
+        db_session.close()
+    return revocation, None
+
+
+def revoke(jti=None, family=None, expires_at=None, reason=None, user_id=None):
+    """
+    Revoke a token or a token family, e.g. the revocation of a family on
+    reuse of a rotated token is kept though the request fails.
+    :param jti: token id
+    :param family: family id, to revoke all the tokens of a login,
+        ignored if jti is set
+    :param expires_at: epoch seconds after which the revoked tokens are expired
+    :param reason: TokenRevokeReason
+    :param user_id:
+    :return: (revocation, error), error is an InvalidModelError if the
+        token is already revoked
+    """
+    family = None if jti else family
+    revocation, error = _write(jti=jti, family=family, user_id=user_id, reason=reason,
+                               expires_at=time_utils.utc_from_timestamp(expires_at))
+    if not error:
+        # Only written revocations are served
+        get_index().add(jti=jti, family=family, expires_at=expires_at, reason=reason)
+    return revocation, error
+
+
+def invalidate_user(user_id=None):
+    """
+    Drop verifications of the tokens of a user cached before now, in this
+    process at once and in the others on their next poll. Called once the
+    change of the user is committed.
+    :param user_id: all the users if None
+    :return:
+    """
+    # Cached verifications are gone after the cache ttl anyway
+    changed_at = time.time()
+    expires_at = changed_at + CONF.wsgi.token_cache_ttl
+    get_index().add(reason=md_type.TokenRevokeReason.USER_CHANGED, user_id=user_id,
+                    expires_at=expires_at, changed_at=changed_at)
+    _, error = _write(user_id=user_id, reason=md_type.TokenRevokeReason.USER_CHANGED,
+                      expires_at=time_utils.utc_from_timestamp(expires_at))
+    if error:
+        LOG.warning('Failed to publish the change of user %s, other processes may serve it '
+                    'from cache for %ss: %s', user_id, CONF.wsgi.token_cache_ttl, error)
+
+
+def is_revoked(claims):
+    """
+    Check the claims of a valid token against the revocations. A refresh
+    token used again after its rotation may have been stolen, the whole
+    family is revoked then.
+    :param claims: decoded token claims
+    :return:
+    """
+    jti = claims.get('jti')
+    if not jti:
+        # Tokens issued before revocation support
+        return False
+    family = claims.get('fam')
+    reason = get_index().check(jti, family)
+    if reason is None:
+        return False
+    if reason == md_type.TokenRevokeReason.ROTATED and family:
+        revoke_reused(claims)
+    return True
+
+
+def revoke_reused(claims):
+    """
+    Revoke the family of a refresh token used again.
+    :param claims:
+    :return:
+    """
+    family = claims['fam']
+    LOG.warning('Refresh token %s of user %s reused, revoking token family %s',
+                claims['jti'], claims['data'], family)
+    # Tokens of the family are issued at the latest now, for one refresh
+    # token lifetime at most
+    lifetime = claims['exp'] - claims.get('iat', time.time())
+    _, error = revoke(family=family, expires_at=time.time() + lifetime,
+                      reason=md_type.TokenRevokeReason.REUSED, user_id=claims['data'])
+    if error:
+        LOG.error('Failed to revoke token family %s: %s', family, error)
+
+
+def purge(before=None):
+    """
+    Delete revocations of expired tokens.
+    :param before: datetime, now if None
+    :return: number of deleted rows
+    """
+    from casauth.db import models as md
+
+    before = before or time_utils.utc_now()
+    db_session = md_api.new_session()
+    try:
+        with db_session.begin():
+            return (db_session.query(md.RevokedToken)
+                    .filter(md.RevokedToken.expires_at <= before)
+                    .delete(synchronize_session=False))
+    finally:
+        db_session.close()
@@ -178,6 +178,27 @@ class HistoryAction(BaseType):
     LOGOUT = 'LOGOUT'
 
 
+class TokenType(BaseType):
+    ACCESS = 'access'
+    REFRESH = 'refresh'
+
+    @staticmethod
+    def all():
+        return 'access', 'refresh'
+
+
+class TokenRevokeReason(BaseType):
+    LOGOUT = 'LOGOUT'
+    ROTATED = 'ROTATED'
+    REUSED = 'REUSED'
+    # Tokens stay valid, only their cached verifications are dropped
+    USER_CHANGED = 'USER_CHANGED'
+
+    @staticmethod
+    def all():
+        return 'LOGOUT', 'ROTATED', 'REUSED', 'USER_CHANGED'
+
+
 class HistoryType(BaseType):
     USER = 'USER'
     TASK = 'TASK'
@@ -7,23 +7,39 @@ from __future__ import print_function
 
 from concurrent import futures
 from functools import partial
+import threading
 
 import grpc
+from oslo_log import log as logging
 
 from casauth.common import cfg
 from casauth.common import exceptions as cas_ecx
 from casauth.common.grpc import credentials
 
 CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+# Accept the keepalive pings of idle pooled client channels (see
+# CHANNEL_OPTIONS), the default policy answers pings of idle channels or
+# more often than every 5 minutes with GOAWAY too_many_pings
+SERVER_OPTIONS = (
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_ping_interval_without_data_ms', 20000),
+    ('grpc.http2.max_ping_strikes', 0),
+)
 
 
 def get_server(interceptors=None, options=None, workers=4):
     """
     Create a gRPC server
+    :param options: channel args, overriding SERVER_OPTIONS
     :return:
     """
+    server_options = dict(SERVER_OPTIONS)
+    server_options.update(options or ())
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers),
-                         interceptors=interceptors, options=options)
+                         interceptors=interceptors, options=list(server_options.items()))
 
     return server
 
@@ -34,45 +50,214 @@ class AuthGateway(grpc.AuthMetadataPlugin):
         pass
 
 
-class GRPCClient:
-    def __init__(self, host, port, service_module, stub_name, timeout=10, **kwargs):
-        root_certificate = kwargs.get('root_certificate')
+# Keep idle connections alive, so pooled channels stay warm between calls
+CHANNEL_OPTIONS = (
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+)
+
+# Seconds a channel removed from the pool is kept open for the calls
+# still running on it
+CHANNEL_CLOSE_GRACE = 60
+
+_CHANNELS = {}
+_CHANNELS_LOCK = threading.Lock()
+
+
+class PooledChannel(object):
+    """
+    A channel shared by all clients of the same target in the process.
+    Connection is made lazily on the first call. Once removed from the
+    pool, the channel is closed after its running calls are finished, or
+    after CHANNEL_CLOSE_GRACE seconds at most.
+    """
+
+    def __init__(self, host, port, root_certificate=None, call_credentials=None, options=None):
+        target = '{0}:{1}'.format(host, port)
+        options = list(CHANNEL_OPTIONS) + list(options or ())
         if root_certificate:
-            call_credentials = kwargs.get('call_credentials')
             # Call credential object will be invoked for every single RPC
             # Combining channel credentials and call credentials together
             channel_credential = grpc.ssl_channel_credentials(root_certificate)
             credentials = grpc.composite_channel_credentials(channel_credential,
                                                              call_credentials) \
                 if call_credentials else channel_credential
-            channel = grpc.secure_channel('{0}:{1}'.format(host, port), credentials)
+            self.channel = grpc.secure_channel(target, credentials, options=options)
         else:
-            channel = grpc.insecure_channel('{0}:{1}'.format(host, port))
+            self.channel = grpc.insecure_channel(target, options=options)
+        self.state = None
+        self.stubs = {}
+        self.retired = False
+        self._calls = 0
+        self._lock = threading.Lock()
+        self._close_timer = None
+        self.channel.subscribe(self._on_state_changed)
+
+    def _on_state_changed(self, state):
+        self.state = state
+
+    @property
+    def healthy(self):
+        return self.state not in (grpc.ChannelConnectivity.TRANSIENT_FAILURE,
+                                  grpc.ChannelConnectivity.SHUTDOWN)
+
+    def get_stub(self, service_module, stub_name):
+        key = (service_module.__name__, stub_name)
+        stub = self.stubs.get(key)
+        if stub is None:
+            stub = self.stubs[key] = getattr(service_module, stub_name)(self.channel)
+        return stub
+
+    def begin_call(self):
+        """
+        Count a call on the channel.
+        :return: False if the channel is retired, nothing is counted then
+        """
+        with self._lock:
+            if self.retired:
+                return False
+            self._calls += 1
+            return True
+
+    def end_call(self):
+        with self._lock:
+            self._calls -= 1
+            close = self.retired and self._calls == 0
+        if close:
+            self.close()
+
+    def retire(self, grace=CHANNEL_CLOSE_GRACE):
+        """
+        Close the channel once no call is running on it.
+        :param grace: seconds to wait for the running calls, None to
+            close at once
+        :return:
+        """
+        with self._lock:
+            if self.retired:
+                return
+            self.retired = True
+            close = self._calls == 0 or not grace
+            if not close:
+                self._close_timer = threading.Timer(grace, self.close)
+                self._close_timer.daemon = True
+                self._close_timer.start()
+        if close:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            if self._close_timer is not None:
+                self._close_timer.cancel()
+                self._close_timer = None
+            if self.channel is None:
+                return
+            channel, self.channel = self.channel, None
         try:
-            grpc.channel_ready_future(channel).result(timeout=timeout)
-        except grpc.FutureTimeoutError as e:
-            raise cas_ecx.GRCPTimeoutError(e)
+            channel.unsubscribe(self._on_state_changed)
+            channel.close()
+        except Exception as e:
+            LOG.warning('Failed to close gRPC channel: %s', e)
 
-        self.stub = getattr(service_module, stub_name)(channel)
+
+def get_channel(host, port, root_certificate=None, call_credentials=None, options=None):
+    """
+    Get a pooled channel, a new one is created if the current channel
+    of the target is broken.
+    :return:
+    """
+    key = (host, port, root_certificate, call_credentials)
+    with _CHANNELS_LOCK:
+        channel = _CHANNELS.get(key)
+        if channel is not None and not channel.healthy:
+            channel.retire()
+            channel = None
+        if channel is None:
+            channel = _CHANNELS[key] = PooledChannel(host, port,
+                                                     root_certificate=root_certificate,
+                                                     call_credentials=call_credentials,
+                                                     options=options)
+    return key, channel
+
+
+def evict_channel(key, channel):
+    """
+    Remove a broken channel from the pool.
+    :param key:
+    :param channel:
+    :return:
+    """
+    with _CHANNELS_LOCK:
+        if _CHANNELS.get(key) is channel:
+            del _CHANNELS[key]
+        else:
+            return
+    channel.retire()
+
+
+def close_channels(grace=None):
+    """
+    Close all pooled channels, e.g. on shutdown.
+    :param grace: seconds to wait for the running calls, None to close at once
+    :return:
+    """
+    with _CHANNELS_LOCK:
+        channels = list(_CHANNELS.values())
+        _CHANNELS.clear()
+    for channel in channels:
+        channel.retire(grace=grace)
+
+
+class GRPCClient:
+    def __init__(self, host, port, service_module, stub_name, timeout=10, **kwargs):
+        self._host = host
+        self._port = port
+        self._service_module = service_module
+        self._stub_name = stub_name
+        self._kwargs = kwargs
+        self._connect()
         self.timeout = timeout
 
+    def _connect(self):
+        self._channel_key, self._channel = get_channel(
+            self._host, self._port,
+            root_certificate=self._kwargs.get('root_certificate'),
+            call_credentials=self._kwargs.get('call_credentials'),
+            options=self._kwargs.get('options'))
+        self.stub = self._channel.get_stub(self._service_module, self._stub_name)
+
     def __getattr__(self, attr):
-        return partial(self._wrapped_call, self.stub, attr)
+        return partial(self._wrapped_call, attr)
 
-    def _wrapped_call(self, *args, **kwargs):
+    def _wrapped_call(self, method, request, **kwargs):
+        if not self._channel.begin_call():
+            # Evicted by another client, go on with the new pooled channel
+            self._connect()
+            if not self._channel.begin_call():
+                raise cas_ecx.GRCPError(message='Channel of {0} is closed'.format(method))
+        channel = self._channel
         try:
-            return getattr(args[0], args[1])(
-                args[2], **kwargs, timeout=self.timeout
+            # Wait for the lazy connection to be ready within the call timeout
+            return getattr(self.stub, method)(
+                request, **kwargs, timeout=self.timeout, wait_for_ready=True
             )
         except grpc.RpcError as e:
-            message = 'Call {0} failed with {1}'.format(args[1], e.code())
-            raise cas_ecx.GRCPError(message)
+            code = e.code()
+            if code == grpc.StatusCode.UNAVAILABLE:
+                evict_channel(self._channel_key, channel)
+            message = 'Call {0} failed with {1}'.format(method, code)
+            if code == grpc.StatusCode.DEADLINE_EXCEEDED:
+                raise cas_ecx.GRCPTimeoutError(message=message, cause=e)
+            raise cas_ecx.GRCPError(message=message, cause=e)
+        finally:
+            channel.end_call()
 
 
 def get_client(host, port, service_module, stub_name, timeout=10, **kwargs):
     """
-    Get
+    Get a client using the pooled channel of the target.
     :return:
     """
     return GRPCClient(host, port, service_module, stub_name, timeout, **kwargs)
-
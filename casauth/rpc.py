@@ -2,7 +2,11 @@
 # Copyright (c) 2020 FTI-CAS
 #
 
+import atexit
+import threading
+
 from oslo_config import cfg
+from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_messaging.rpc import dispatcher
 
@@ -11,6 +15,7 @@ from casauth.common.rpc import serializer as sz
 
 
 CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
 TRANSPORT = None
 NOTIFICATION_TRANSPORT = None
 NOTIFIER = None
@@ -20,6 +25,11 @@ ALLOWED_EXMODS = []
 
 EXTRA_EXMODS = []
 
+# Transports of other servers by URL, and clients by target
+_TRANSPORTS = {}
+_CLIENTS = {}
+_LOCK = threading.Lock()
+
 
 def init(conf):
     global TRANSPORT, NOTIFICATION_TRANSPORT, NOTIFIER
@@ -36,12 +46,52 @@ def cleanup():
     global TRANSPORT, NOTIFICATION_TRANSPORT, NOTIFIER
     assert TRANSPORT is not None
     assert NOTIFICATION_TRANSPORT is not None
-    assert NOTIFIER is not None
+    cleanup_transports()
     TRANSPORT.cleanup()
     NOTIFICATION_TRANSPORT.cleanup()
     TRANSPORT = NOTIFICATION_TRANSPORT = NOTIFIER = None
 
 
+def get_transport(transport_url=None):
+    """
+    Get the RPC transport of an URL, created once per process.
+    :param transport_url: None for the transport of the config file
+    :return:
+    """
+    if not transport_url:
+        assert TRANSPORT is not None
+        return TRANSPORT
+
+    transport = _TRANSPORTS.get(transport_url)
+    if transport is None:
+        with _LOCK:
+            transport = _TRANSPORTS.get(transport_url)
+            if transport is None:
+                ex_mods = get_allowed_exmods()
+                transport = messaging.get_rpc_transport(CONF, allowed_remote_exmods=ex_mods,
+                                                        url=transport_url)
+                if not _TRANSPORTS:
+                    atexit.register(cleanup_transports)
+                _TRANSPORTS[transport_url] = transport
+    return transport
+
+
+def cleanup_transports():
+    """
+    Close the transports created by get_transport().
+    :return:
+    """
+    with _LOCK:
+        transports = list(_TRANSPORTS.items())
+        _TRANSPORTS.clear()
+        _CLIENTS.clear()
+    for url, transport in transports:
+        try:
+            transport.cleanup()
+        except Exception as e:
+            LOG.warning('Failed to close RPC transport: %s', e)
+
+
 def get_client(target, key=None, version_cap='1.0', serializer=None,
                secure_serializer=ssr.SecureSerializer, transport_url=None,
                timeout=None):
@@ -56,12 +106,7 @@ def get_client(target, key=None, version_cap='1.0', serializer=None,
     :param timeout:
     :return:
     """
-    if transport_url:
-        ex_mods = get_allowed_exmods()
-        transport = messaging.get_rpc_transport(CONF, allowed_remote_exmods=ex_mods, url=transport_url)
-    else:
-        assert TRANSPORT is not None
-        transport = TRANSPORT
+    transport = get_transport(transport_url)
 
     if not timeout:
         timeout = RPC_RESPONSE_TIMEOUT
@@ -73,6 +118,30 @@ def get_client(target, key=None, version_cap='1.0', serializer=None,
                                timeout=timeout)
 
 
+def get_cached_client(target, key=None, version_cap='1.0', serializer=None,
+                      secure_serializer=ssr.SecureSerializer, transport_url=None,
+                      timeout=None):
+    """
+    Get a RPC client shared by the process, clients are thread-safe.
+    Clients are kept by transport URL, target and serializer, the
+    serializer must not keep a state.
+    Same params as get_client().
+    :return:
+    """
+    cache_key = (transport_url, target.exchange, target.topic, target.namespace,
+                 target.version, target.server, target.fanout, key, version_cap,
+                 type(serializer) if serializer is not None else None,
+                 secure_serializer, timeout)
+    client = _CLIENTS.get(cache_key)
+    if client is None:
+        client = get_client(target, key=key, version_cap=version_cap, serializer=serializer,
+                            secure_serializer=secure_serializer,
+                            transport_url=transport_url, timeout=timeout)
+        with _LOCK:
+            client = _CLIENTS.setdefault(cache_key, client)
+    return client
+
+
 def get_server(target, endpoints, key=None, serializer=None,
                secure_serializer=ssr.SecureSerializer):
     """
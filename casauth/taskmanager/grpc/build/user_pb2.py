@@ -19,7 +19,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   syntax='proto3',
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
-  serialized_pb=b'\n\nuser.proto\x12\x04user\"\x1c\n\x0bTokeRequest\x12\r\n\x05token\x18\x01 \x01(\t\"\x19\n\x0bUserRequest\x12\n\n\x02id\x18\x01 \x01(\x05\"\x8c\x01\n\x04Ldap\x12\n\n\x02\x64\x63\x18\x01 \x01(\t\x12\n\n\x02ou\x18\x02 \x01(\t\x12\n\n\x02\x63n\x18\x03 \x01(\t\x12\x10\n\x08password\x18\x04 \x01(\t\x12\x13\n\x0b\x64omain_name\x18\x05 \x01(\t\x12\x14\n\x0cproject_name\x18\x06 \x01(\t\x12\x12\n\nproject_dn\x18\x07 \x01(\t\x12\x0f\n\x07user_dn\x18\x08 \x01(\t\"\x8e\x01\n\x04User\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x11\n\tuser_name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x11\n\tfull_name\x18\x04 \x01(\t\x12\x11\n\tuser_type\x18\x05 \x01(\t\x12\x14\n\x0c\x61\x63\x63ount_type\x18\x06 \x01(\t\x12\x0c\n\x04role\x18\x07 \x01(\t\x12\x0e\n\x06status\x18\x08 \x01(\t2\x97\x01\n\x0bUserService\x12-\n\x0cverify_token\x12\x11.user.TokeRequest\x1a\n.user.User\x12)\n\x08get_user\x12\x11.user.UserRequest\x1a\n.user.User\x12.\n\rget_ldap_info\x12\x11.user.UserRequest\x1a\n.user.Ldapb\x06proto3'
+  serialized_pb=b'\n\nuser.proto\x12\x04user\"/\n\x0bTokeRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tstateless\x18\x02 \x01(\x08\"2\n\rTokensRequest\x12\x0e\n\x06tokens\x18\x01 \x03(\t\x12\x11\n\tstateless\x18\x02 \x01(\x08\"\x19\n\x0bUserRequest\x12\n\n\x02id\x18\x01 \x01(\x05\"\x8c\x01\n\x04Ldap\x12\n\n\x02\x64\x63\x18\x01 \x01(\t\x12\n\n\x02ou\x18\x02 \x01(\t\x12\n\n\x02\x63n\x18\x03 \x01(\t\x12\x10\n\x08password\x18\x04 \x01(\t\x12\x13\n\x0b\x64omain_name\x18\x05 \x01(\t\x12\x14\n\x0cproject_name\x18\x06 \x01(\t\x12\x12\n\nproject_dn\x18\x07 \x01(\t\x12\x0f\n\x07user_dn\x18\x08 \x01(\t\"\x8e\x01\n\x04User\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x11\n\tuser_name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x11\n\tfull_name\x18\x04 \x01(\t\x12\x11\n\tuser_type\x18\x05 \x01(\t\x12\x14\n\x0c\x61\x63\x63ount_type\x18\x06 \x01(\t\x12\x0c\n\x04role\x18\x07 \x01(\t\x12\x0e\n\x06status\x18\x08 \x01(\t\"\"\n\x05Users\x12\x19\n\x05users\x18\x01 \x03(\x0b\x32\n.user.User2\xca\x01\n\x0bUserService\x12-\n\x0cverify_token\x12\x11.user.TokeRequest\x1a\n.user.User\x12\x31\n\rverify_tokens\x12\x13.user.TokensRequest\x1a\x0b.user.Users\x12)\n\x08get_user\x12\x11.user.UserRequest\x1a\n.user.User\x12.\n\rget_ldap_info\x12\x11.user.UserRequest\x1a\n.user.Ldapb\x06proto3'
 )
 
 
@@ -40,6 +40,13 @@ _TOKEREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='stateless', full_name='user.TokeRequest.stateless', index=1,
+      number=2, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
   ],
   extensions=[
   ],
@@ -53,7 +60,46 @@ _TOKEREQUEST = _descriptor.Descriptor(
   oneofs=[
   ],
   serialized_start=20,
-  serialized_end=48,
+  serialized_end=67,
+)
+
+
+_TOKENSREQUEST = _descriptor.Descriptor(
+  name='TokensRequest',
+  full_name='user.TokensRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='tokens', full_name='user.TokensRequest.tokens', index=0,
+      number=1, type=9, cpp_type=9, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='stateless', full_name='user.TokensRequest.stateless', index=1,
+      number=2, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=69,
+  serialized_end=119,
 )
 
 
@@ -84,8 +130,8 @@ _USERREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=50,
-  serialized_end=75,
+  serialized_start=121,
+  serialized_end=146,
 )
 
 
@@ -165,8 +211,8 @@ _LDAP = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=78,
-  serialized_end=218,
+  serialized_start=149,
+  serialized_end=289,
 )
 
 
@@ -246,14 +292,49 @@ _USER = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=221,
-  serialized_end=363,
+  serialized_start=292,
+  serialized_end=434,
 )
 
+
+_USERS = _descriptor.Descriptor(
+  name='Users',
+  full_name='user.Users',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='users', full_name='user.Users.users', index=0,
+      number=1, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=436,
+  serialized_end=470,
+)
+
+_USERS.fields_by_name['users'].message_type = _USER
 DESCRIPTOR.message_types_by_name['TokeRequest'] = _TOKEREQUEST
+DESCRIPTOR.message_types_by_name['TokensRequest'] = _TOKENSREQUEST
 DESCRIPTOR.message_types_by_name['UserRequest'] = _USERREQUEST
 DESCRIPTOR.message_types_by_name['Ldap'] = _LDAP
 DESCRIPTOR.message_types_by_name['User'] = _USER
+DESCRIPTOR.message_types_by_name['Users'] = _USERS
 _sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
 TokeRequest = _reflection.GeneratedProtocolMessageType('TokeRequest', (_message.Message,), {
@@ -263,6 +344,13 @@ TokeRequest = _reflection.GeneratedProtocolMessageType('TokeRequest', (_message.
   })
 _sym_db.RegisterMessage(TokeRequest)
 
+TokensRequest = _reflection.GeneratedProtocolMessageType('TokensRequest', (_message.Message,), {
+  'DESCRIPTOR' : _TOKENSREQUEST,
+  '__module__' : 'user_pb2'
+  # @@protoc_insertion_point(class_scope:user.TokensRequest)
+  })
+_sym_db.RegisterMessage(TokensRequest)
+
 UserRequest = _reflection.GeneratedProtocolMessageType('UserRequest', (_message.Message,), {
   'DESCRIPTOR' : _USERREQUEST,
   '__module__' : 'user_pb2'
@@ -284,6 +372,13 @@ User = _reflection.GeneratedProtocolMessageType('User', (_message.Message,), {
   })
 _sym_db.RegisterMessage(User)
 
+Users = _reflection.GeneratedProtocolMessageType('Users', (_message.Message,), {
+  'DESCRIPTOR' : _USERS,
+  '__module__' : 'user_pb2'
+  # @@protoc_insertion_point(class_scope:user.Users)
+  })
+_sym_db.RegisterMessage(Users)
+
 
 
 _USERSERVICE = _descriptor.ServiceDescriptor(
@@ -293,8 +388,8 @@ _USERSERVICE = _descriptor.ServiceDescriptor(
   index=0,
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
-  serialized_start=366,
-  serialized_end=517,
+  serialized_start=473,
+  serialized_end=675,
   methods=[
   _descriptor.MethodDescriptor(
     name='verify_token',
@@ -306,10 +401,20 @@ _USERSERVICE = _descriptor.ServiceDescriptor(
     serialized_options=None,
     create_key=_descriptor._internal_create_key,
   ),
+  _descriptor.MethodDescriptor(
+    name='verify_tokens',
+    full_name='user.UserService.verify_tokens',
+    index=1,
+    containing_service=None,
+    input_type=_TOKENSREQUEST,
+    output_type=_USERS,
+    serialized_options=None,
+    create_key=_descriptor._internal_create_key,
+  ),
   _descriptor.MethodDescriptor(
     name='get_user',
     full_name='user.UserService.get_user',
-    index=1,
+    index=2,
     containing_service=None,
     input_type=_USERREQUEST,
     output_type=_USER,
@@ -319,7 +424,7 @@ _USERSERVICE = _descriptor.ServiceDescriptor(
   _descriptor.MethodDescriptor(
     name='get_ldap_info',
     full_name='user.UserService.get_ldap_info',
-    index=2,
+    index=3,
     containing_service=None,
     input_type=_USERREQUEST,
     output_type=_LDAP,
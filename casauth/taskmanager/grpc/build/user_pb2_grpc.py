@@ -19,6 +19,11 @@ class UserServiceStub(object):
                 request_serializer=user__pb2.TokeRequest.SerializeToString,
                 response_deserializer=user__pb2.User.FromString,
                 )
+        self.verify_tokens = channel.unary_unary(
+                '/user.UserService/verify_tokens',
+                request_serializer=user__pb2.TokensRequest.SerializeToString,
+                response_deserializer=user__pb2.Users.FromString,
+                )
         self.get_user = channel.unary_unary(
                 '/user.UserService/get_user',
                 request_serializer=user__pb2.UserRequest.SerializeToString,
@@ -40,6 +45,12 @@ class UserServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def verify_tokens(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def get_user(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -60,6 +71,11 @@ def add_UserServiceServicer_to_server(servicer, server):
                     request_deserializer=user__pb2.TokeRequest.FromString,
                     response_serializer=user__pb2.User.SerializeToString,
             ),
+            'verify_tokens': grpc.unary_unary_rpc_method_handler(
+                    servicer.verify_tokens,
+                    request_deserializer=user__pb2.TokensRequest.FromString,
+                    response_serializer=user__pb2.Users.SerializeToString,
+            ),
             'get_user': grpc.unary_unary_rpc_method_handler(
                     servicer.get_user,
                     request_deserializer=user__pb2.UserRequest.FromString,
@@ -97,6 +113,23 @@ class UserService(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def verify_tokens(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/user.UserService/verify_tokens',
+            user__pb2.TokensRequest.SerializeToString,
+            user__pb2.Users.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def get_user(request,
             target,
@@ -2,10 +2,36 @@ from google.protobuf.timestamp_pb2 import Timestamp
 
 from casauth.common import str_utils
 from casauth.db import models as md
+from casauth.db import token_revocation
 from casauth.taskmanager.grpc.build import user_pb2 as user_message
 from casauth.taskmanager.grpc.build import user_pb2_grpc as user_service
 
 
+def _user_message(user):
+    return user_message.User(id=user.id, user_name=user.user_name, email=user.email,
+                             full_name=user.profile.full_name, user_type=user.user_type.value,
+                             account_type=user.account_type.value, role=user.role.value,
+                             status=user.status.value)
+
+
+def _claims_user_message(token):
+    """
+    Create user message from the claims carried by the token,
+    returns None if the token has no user claims. Claims carry the id,
+    role, status and types only, other fields are left empty.
+    :param token:
+    :return:
+    """
+    try:
+        claims = str_utils.jwt_decode_claims(token, algorithms=['HS256'])
+    except BaseException:
+        return None
+    user_claims = claims.get('user')
+    if not user_claims or token_revocation.is_revoked(claims):
+        return None
+    return user_message.User(id=claims['data'], **user_claims)
+
+
 class UserServicer(user_service.UserServiceServicer):
 
     def verify_token(self, request, context):
@@ -15,6 +41,11 @@ class UserServicer(user_service.UserServiceServicer):
         :param context:
         :return:
         """
+        if request.stateless:
+            user_ = _claims_user_message(request.token)
+            if user_:
+                return user_
+
         user = md.User.verify_token(token=request.token)
         if user:
             # profile = user.profile
@@ -38,21 +69,37 @@ class UserServicer(user_service.UserServiceServicer):
             #     updated_at.FromDatetime(user.updated_at)
             # except:
             #     pass
-            user_ = user_message.User(id=user.id, user_name=user.user_name, email=user.email,
-                                      full_name=user.profile.full_name, user_type=user.user_type.value,
-                                      account_type=user.account_type.value, role=user.role.value,
-                                      status=user.status.value)
-
-            return user_
+            return _user_message(user)
 
         return None
 
+    def verify_tokens(self, request, context):
+        """
+        Verify multiple tokens in one call.
+        Users are returned in the same order as the tokens,
+        an empty user (id 0) is returned for an invalid token.
+        :param request:
+        :param context:
+        :return:
+        """
+        tokens = list(request.tokens)
+        results = [None] * len(tokens)
+        if request.stateless:
+            for index, token in enumerate(tokens):
+                results[index] = _claims_user_message(token)
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            users = md.User.verify_tokens([tokens[index] for index in pending])
+            for index, user in zip(pending, users):
+                if user:
+                    results[index] = _user_message(user)
+
+        return user_message.Users(users=[result or user_message.User() for result in results])
+
     def get_user(self, request, context):
         user = md.User.get_by(id=request.id)
-        return user_message.User(id=user.id, user_name=user.user_name, email=user.email,
-                                 full_name=user.profile.full_name, user_type=user.user_type.value,
-                                 account_type=user.account_type.value, role=user.role.value,
-                                 status=user.status.value) if user else None
+        return _user_message(user) if user else None
 
     def get_ldap_info(self, request, context):
         user = md.User.get_by(id=request.id)
@@ -4,11 +4,12 @@ from oslo_service import periodic_task
 from osprofiler import profiler
 
 
-from foxcloud import client as fox_client
 from foxcloud import exceptions as fox_exc
 
 from casauth.common import cfg
 from casauth.common import crypto_utils
+from casauth.common import exceptions as cas_exc
+from casauth.common import ldap_utils
 from casauth.common.context import CasContext
 from casauth.common import rpc_utils
 from casauth.common import str_utils
@@ -63,19 +64,15 @@ class UserManager(periodic_task.PeriodicTasks):
         if not user:
             return None
 
+        ldap_pool = ldap_utils.get_admin_pool()
         ldap_client = None
+        failed = True
         try:
-            ldap_info = {
-                'ldap_endpoint': CONF.ldap.url,
-                'dn': 'cn={},{}'.format(CONF.ldap.cn, CONF.ldap.dc),
-                'password': CONF.password,
-            }
-
-            ldap_client = fox_client.Client('1', engine='console', services='ldap', **ldap_info)
+            ldap_client = ldap_pool.acquire()
             username = user.email
             password = crypto_utils.encode_data(username)
             user_dn = 'ou={},{}'.format(CONF.ldap.user_ou, CONF.ldap.dc)
-            data = ldap_client.ldap.create_user(dn=user_dn, username=username, password=password)
+            data = ldap_client.create_user(dn=user_dn, username=username, password=password)
             _, err = data.parse().values()
             if err:
                 return self.fail(err)
@@ -88,7 +85,7 @@ class UserManager(periodic_task.PeriodicTasks):
             }
             user_dn = 'cn={},{}'.format(username, user_dn)
             group_dn = 'cn={},ou=Groups,{}'.format(CONF.ldap.os_cn, CONF.ldap.dc)
-            data = ldap_client.ldap.add_to_group(user_dn=user_dn, group_dn=group_dn)
+            data = ldap_client.add_to_group(user_dn=user_dn, group_dn=group_dn)
             _, err = data.parse().values()
             if err:
                 # Try to delete ldap user
@@ -114,16 +111,14 @@ class UserManager(periodic_task.PeriodicTasks):
                 ldap_client.delete_user(dn=self.create_ldap_dn(user_info))
                 return self.fail(err)
 
+            failed = False
             return self.ok(user_data)
-        except fox_exc.FoxCloudException as e:
+        except (fox_exc.FoxCloudException, cas_exc.LdapPoolTimeoutError) as e:
             LOG.error(e)
             return self.fail(str(e))
         finally:
-            try:
-                if ldap_client:
-                    ldap_client.unbind()
-            except Exception as e:
-                LOG.warning('Failed to close LDAP session: %s', e)
+            if ldap_client is not None:
+                ldap_pool.release(ldap_client, discard=failed)
 
     def create_ldap_dn(self, ldap_info):
         """
@@ -144,27 +139,22 @@ class UserManager(periodic_task.PeriodicTasks):
             return self.fail(e)
 
     def delete_ldap_user(self, user_info):
+        ldap_pool = ldap_utils.get_admin_pool()
         ldap_client = None
+        failed = True
         try:
-            ldap_info = {
-                'ldap_endpoint': CONF.ldap.url,
-                'dn': 'cn={},{}'.format(CONF.ldap.cn, CONF.ldap.dc),
-                'password': CONF.password,
-            }
-            ldap_client = fox_client.Client('1', engine='console', services='ldap', **ldap_info)
+            ldap_client = ldap_pool.acquire()
             data = ldap_client.delete_user(dn=self.create_ldap_dn(user_info))
             _, err = data.parse().values()
 
+            failed = False
             return self.fail(err) if err else self.ok()
-        except fox_exc.FoxCloudException as e:
+        except (fox_exc.FoxCloudException, cas_exc.LdapPoolTimeoutError) as e:
             LOG.error(e)
             return self.fail(str(e))
         finally:
-            try:
-                if ldap_client:
-                    ldap_client.unbind()
-            except Exception as e:
-                LOG.warning('Failed to close LDAP session: %s', e)
+            if ldap_client is not None:
+                ldap_pool.release(ldap_client, discard=failed)
 
     def get_ldap_info(self, ctx, name_or_id):
         user = md.User.get_by(id=name_or_id)
@@ -1,6 +1,6 @@
 import logging
 
-from flask import Flask
+from flask import Flask, g
 from flask_babel import Babel, lazy_gettext as _l
 from flask_caching import Cache
 from flask_cors import CORS
@@ -8,6 +8,7 @@ from flask_executor import Executor
 from flask_limiter import Limiter, util as limiter_util
 from casauth.wsgi import config
 from casauth.common import cfg
+from casauth.common import limiter_utils
 
 CONF = cfg.CONF
 
@@ -22,9 +23,17 @@ app.logger.setLevel(log_level)
 # CORS
 cors = CORS(app, resources={r'/api/*': {'origins': '*'}})
 
-# Limiter
+# Limiter, counters are shared by the workers when the storage is not memory://
+app.config['RATELIMIT_STORAGE_URL'] = CONF.wsgi.limiter_storage_url
 limiter = Limiter(app, key_func=limiter_util.get_remote_address)
 
+
+@app.after_request
+def count_rejected(response):
+    if response.status_code == 429 and not g.get('limiter_rejected'):
+        limiter_utils.record_rejected('api')
+    return response
+
 # Caching
 if CONF.cache_type not in ('null', None):
     cache = Cache(app)
@@ -33,6 +33,8 @@ api_v1.add_resource(api_docs.ApiDocs, '/docs', endpoint='api_docs')
 
 api_v1.add_resource(user.Register, '/register', endpoint='register')
 api_v1.add_resource(user.Users, '/users', endpoint='users')
+api_v1.add_resource(user.UsersExport, '/users/export', endpoint='users_export')
+api_v1.add_resource(user.UsersImport, '/users/import', endpoint='users_import')
 api_v1.add_resource(user.User, '/user', endpoint='user_self')
 api_v1.add_resource(user.User, '/user/<int:user_id>', endpoint='user')
 api_v1.add_resource(user.Auth, '/login', endpoint='login')
@@ -1,9 +1,12 @@
 #
 # Copyright (c) 2020 FTI-CAS
 #
+import csv
 import datetime
+import io
 from os import environ as env
 
+from flask import Response, g, stream_with_context
 from flask_httpauth import HTTPTokenAuth
 from flask_restful import abort
 from webargs import fields, validate
@@ -12,7 +15,9 @@ from webargs.multidictproxy import MultiDictProxy
 
 from casauth.db import models as md
 from casauth.db import types as md_type
+from casauth.db.sqlalchemy import api as md_api
 from casauth.wsgi import app
+from casauth.wsgi.base import context
 from casauth.common import json as app_common, errors
 
 LOG = app.logger
@@ -50,6 +55,8 @@ PAGING_ARGS = {
         missing=LIST_ITEMS_PER_PAGE,
         validate=[validate.Range(min=1, max=LIST_MAX_ITEMS_PER_PAGE)]),
     'sort_by': fields.List(fields.Str(), required=False),  # form: col1,col2__desc,col3__asc default asc
+    'cursor': fields.Str(required=False),  # next_cursor of previous page, empty for first page
+    'with_total': fields.Bool(required=False, missing=False),
 }
 FIELD_FILTER_ARGS = {
     'fields': fields.List(fields.Str(), required=False),
@@ -61,6 +68,15 @@ CONDITION_FILTER_ARGS = {
     'extra_field_condition': fields.Str(required=False),  # json object string
 }
 
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_ARGS = {
+    'sort_by': PAGING_ARGS['sort_by'],
+    'format': fields.Str(required=False, missing='ndjson',
+                         validate=validate.OneOf(EXPORT_FORMATS)),
+}
+# Number of rows written to the response at once
+EXPORT_CHUNK_ROWS = 100
+
 GET_OBJECT_ARGS = {
     **REGION_ARGS,
     **FIELD_FILTER_ARGS,
@@ -76,6 +92,9 @@ LIST_OBJECTS_ARGS = {
     page: page index from 1 of data
     page_size: number of items in a page
     sort_by: sorting key, e.g. col1__asc,col2__desc
+    cursor: use keyset pagination instead of page index, pass empty value
+        to get the first page then next_cursor of the previous page
+    with_total: count the total number of items
     fields: data fields of object to get if don't want to get default fields
     extra_fields: data fields not it default fields list
     condition: a condition can be in several forms:
@@ -100,7 +119,11 @@ LIST_OBJECTS_ARGS = {
 def verify_request_token(token):
     if not token:
         return None
-    return md.User.verify_token(token)
+    identity_map = context.get_identity_map()
+    user = md.User.verify_token(token, loader=identity_map.load)
+    # Kept for the handlers revoking or rotating the request token
+    g.request_token = token
+    return identity_map.add(user)
 
 
 @auth.get_user_roles
@@ -154,15 +177,23 @@ def _do_exec_manager_func(func, ctx):
     """
     ex = None
     if ctx.succeed:
+        # All db changes of the function are written by one commit
+        uow = md_api.begin()
         try:
             func(ctx)
         except BaseException as e:
             ex = e
 
-    # When context fails, rollback all uncommitted db changes
-    if ex is not None or ctx.failed:
-        if ex:
-            ctx.set_error(errors.UNKNOWN_ERROR, cause=ex, status=500)
+        # When context fails, rollback all uncommitted db changes
+        if ex is not None or ctx.failed:
+            uow.rollback()
+        else:
+            _, error = md_api.commit(uow)
+            if error:
+                ctx.set_error(error, status=500)
+
+    if ex is not None:
+        ctx.set_error(errors.UNKNOWN_ERROR, cause=ex, status=500)
 
 
 def exec_manager_func(func, ctx, required_roles=None):
@@ -181,6 +212,116 @@ def exec_manager_func(func, ctx, required_roles=None):
     return process_result_context(ctx)
 
 
+def exec_manager_func_stream(func, ctx, format='ndjson', filename='export',
+                             required_roles=None):
+    """
+    Execute manager function returning a stream of items.
+    :param func: sets ctx.response as {'fields': [...], 'data': <iterator>}
+    :param ctx:
+    :param format: one of EXPORT_FORMATS
+    :param filename: file name without extension
+    :param required_roles:
+    :return:
+    """
+    if check_user_permission(ctx, required_roles):
+        _do_exec_manager_func(func, ctx)
+    else:
+        ctx.set_error(error=errors.USER_ACTION_NOT_ALLOWED, status=400)
+
+    if ctx.failed:
+        return process_result_context(ctx)
+    return stream_result_context(ctx, format=format, filename=filename)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime(app_common.DATE_TIME_FORMAT)
+    if isinstance(value, (dict, list, tuple)):
+        return app_common.json_dumps(value)
+    return value
+
+
+def _iter_ndjson(items):
+    encoder = ApiJSONEncoder()
+    for item in items:
+        yield encoder.encode(item)
+        yield '\n'
+
+
+def _iter_csv(items, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    for item in items:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(item.get(f)) for f in fields])
+        yield buffer.getvalue()
+
+
+def _iter_chunks(parts, size):
+    """
+    Join generated parts, every chunk holds about `size` rows.
+    """
+    chunk = []
+    for part in parts:
+        chunk.append(part)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_result_context(ctx, format='ndjson', filename='export'):
+    """
+    Stream the items of a result context.
+    Items are encoded one by one while the response is sent, the whole
+    result is never in memory.
+    :param ctx:
+    :param format: one of EXPORT_FORMATS
+    :param filename: file name without extension
+    :return:
+    """
+    result = ctx.response
+    if format == 'csv':
+        parts = _iter_csv(result['data'], result['fields'])
+        mimetype = 'text/csv'
+        # Rows are a single part each
+        chunk_size = EXPORT_CHUNK_ROWS
+    else:
+        parts = _iter_ndjson(result['data'])
+        mimetype = 'application/x-ndjson'
+        # Row and line break are two parts
+        chunk_size = EXPORT_CHUNK_ROWS * 2
+
+    def _generate():
+        try:
+            for chunk in _iter_chunks(parts, chunk_size):
+                yield chunk
+        except GeneratorExit:
+            # Client gone, the rest of the result is not read
+            raise
+        except BaseException as e:
+            # Headers were sent, the client sees a truncated body
+            LOG.error('ERROR streaming %s: %s', ctx.task, e)
+            raise
+        finally:
+            # Releases the database session and cursor of the items
+            close = getattr(result['data'], 'close', None)
+            if close:
+                close()
+
+    headers = {
+        'Content-Disposition': 'attachment; filename="{}.{}"'.format(filename, format),
+    }
+    return Response(stream_with_context(_generate()), status=ctx.status or 200,
+                    mimetype=mimetype, headers=headers)
+
+
 # Log all attributes with value of these types
 LOG_FIELD_TYPES = (str, int, float, bool, dict, list, tuple, datetime.datetime)
 
@@ -222,6 +363,7 @@ def process_result_context(ctx):
 
         if DEBUG:
             LOG.debug('RESULT %s', response)
+            LOG.debug('USER LOADS %s', context.get_identity_map().loads)
         return response, ctx.status or 200
     else:
         resp = {'errors': ctx.error_json()}
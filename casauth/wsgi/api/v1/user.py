@@ -1,13 +1,16 @@
 #
 # Copyright (c) 2020 FTI-CAS
 #
-from flask import redirect
+from flask import g, redirect, request
+from flask_limiter import util as limiter_util
 from flask_restful import Resource
 from webargs import fields, validate
 from webargs.flaskparser import use_args
 
 from oslo_log import log as logging
 
+from casauth.common import errors
+from casauth.common import limiter_utils
 from casauth.db import types as md_type
 from casauth.wsgi.api.v1 import base
 from casauth.wsgi.base import context
@@ -30,6 +33,19 @@ def do_login(args):
     :param args:
     :return:
     """
+    # Blocked attempts are rejected before loading the user
+    user_name = args['user_name']
+    ip = limiter_util.get_remote_address()
+    login_limiter = limiter_utils.get_login_limiter()
+    retry_after = login_limiter.check(user_name, ip)
+    if retry_after:
+        limiter_utils.record_rejected('login')
+        g.limiter_rejected = True
+        ctx = context.Context(task='login user', check_token=False)
+        ctx.set_error(errors.USER_LOGIN_TOO_MANY_ATTEMPTS, status=429)
+        response, status = base.process_result_context(ctx)
+        return response, status, {'Retry-After': str(retry_after)}
+
     ctx = context.create_context(
         task='login user',
         check_token=False,
@@ -42,7 +58,13 @@ def do_login(args):
     #     data['ip'] = ctx.request.access_route
     #     history.contents.update(data)
 
-    return base.exec_manager_func(user_mgr.login, ctx)
+    result = base.exec_manager_func(user_mgr.login, ctx)
+    if ctx.succeed:
+        login_limiter.succeeded(user_name, ip)
+    elif ctx.status in (401, 404):
+        # Unknown user or wrong password
+        login_limiter.failed(user_name, ip)
+    return result
 
 
 def do_logout(args):
@@ -53,7 +75,7 @@ def do_logout(args):
     """
     ctx = context.create_context(
         task='logout user',
-        data=args)
+        data=dict(args, token=g.request_token))
     return base.exec_manager_func(user_mgr.logout, ctx)
 
 
@@ -107,6 +129,35 @@ def do_get_users(args):
     return base.exec_manager_func(user_mgr.get_users, ctx)
 
 
+def do_export_users(args):
+    """
+    Do export users.
+    :param args:
+    :return:
+    """
+    ctx = context.create_context(
+        task='export users',
+        data=args)
+    return base.exec_manager_func_stream(user_mgr.export_users, ctx,
+                                         format=args['format'], filename='users')
+
+
+def do_import_users(args):
+    """
+    Do import users.
+    :param args:
+    :return:
+    """
+    # CSV file sent as request body
+    if args.get('users') is None and not args.get('csv') and request.mimetype == 'text/csv':
+        args['csv'] = request.get_data(as_text=True)
+
+    ctx = context.create_context(
+        task='import users',
+        data=args)
+    return base.exec_manager_func(user_mgr.import_users, ctx)
+
+
 def do_create_user(args):
     """
     Do create user.
@@ -187,6 +238,34 @@ class Users(Resource):
         return do_create_user(args=args)
 
 
+class UsersExport(Resource):
+    export_users_args = {
+        **base.REGION_ARGS,
+        **base.FIELD_FILTER_ARGS,
+        **base.CONDITION_FILTER_ARGS,
+        **base.EXPORT_ARGS,
+    }
+
+    @auth.login_required
+    @use_args(export_users_args, location=LOCATION)
+    def get(self, args):
+        return do_export_users(args=args)
+
+
+class UsersImport(Resource):
+    import_users_args = {
+        'users': fields.List(fields.Dict(), required=False),
+        'csv': fields.Str(required=False),
+        'send_mail': fields.Bool(required=False, missing=True),
+        'dry_run': fields.Bool(required=False, missing=False),
+    }
+
+    @auth.login_required
+    @use_args(import_users_args, location=LOCATION)
+    def post(self, args):
+        return do_import_users(args=args)
+
+
 class User(Resource):
     get_user_args = {
         **base.GET_OBJECT_ARGS,
@@ -302,7 +381,7 @@ def do_refresh_token(args):
     """
     ctx = context.create_context(
         task='refresh user token',
-        data=args)
+        data=dict(args, token=g.request_token))
     return base.exec_manager_func(user_mgr.refresh_token, ctx)
 
 
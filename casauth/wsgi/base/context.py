@@ -19,6 +19,85 @@ def _get_context():
     return getattr(_request_ctx_stack.top, 'context', None)
 
 
+class IdentityMap(object):
+    """
+    Users loaded during a request, so that each user row is selected
+    from database at most once per request.
+    """
+
+    def __init__(self):
+        self._users = {}
+        # Number of user SELECTs issued through this map
+        self.loads = 0
+        self.hits = 0
+
+    def add(self, user):
+        if user is not None and user.id is not None:
+            self._users[user.id] = user
+        return user
+
+    def load(self, user_id):
+        """
+        Load user from database without looking up the map.
+        :param user_id:
+        :return:
+        """
+        self.loads += 1
+        return md_api.load(md.User, user_id)
+
+    def get(self, user_id):
+        """
+        Get user by id, load from database if not in the map.
+        :param user_id:
+        :return:
+        """
+        if user_id is None:
+            return None
+        user = self._users.get(user_id)
+        if user is not None:
+            self.hits += 1
+            return user
+        return self.add(self.load(user_id))
+
+    def load_user(self, user):
+        """
+        Same as md_api.load_user(), but users already in the map are reused.
+        :param user: md.User object or user id/name/email.
+        :return:
+        """
+        if isinstance(user, md.User):
+            # The instance of the request is kept if there is one
+            return self._users.get(user.id) or self.add(user)
+        if isinstance(user, dict):
+            user = user.get('id')
+        if isinstance(user, int):
+            return self.get(user)
+        if isinstance(user, str):
+            name = user.lower().strip()
+            for item in self._users.values():
+                if name in (item.user_name, item.email):
+                    self.hits += 1
+                    return item
+            self.loads += 1
+            return self.add(md_api.load_user(name))
+        return None
+
+
+def get_identity_map():
+    """
+    Get identity map of the current request.
+    A new empty map is returned when called outside a request.
+    :return:
+    """
+    ctx_stack_top = _request_ctx_stack.top
+    if ctx_stack_top is None:
+        return IdentityMap()
+    identity_map = getattr(ctx_stack_top, 'identity_map', None)
+    if identity_map is None:
+        identity_map = ctx_stack_top.identity_map = IdentityMap()
+    return identity_map
+
+
 class Context(object):
     def __init__(self, task,
                  request_user=None, target_user=None,
@@ -203,13 +282,15 @@ class Context(object):
         data = self.data or {}
         from casauth.wsgi import api
         current_user = api.api_auth.current_user()
+        identity_map = get_identity_map()
 
         if self.check_token:
             user_id = getattr(current_user, 'id', None)
             if not user_id:
                 self.set_error(errors.USER_NOT_AUTHORIZED, status=401)
                 return
-            self.request_user = md.User.get_by(id=user_id)
+            # The user has been loaded when verifying the request token
+            self.request_user = identity_map.get(user_id)
             if not self.request_user:
                 self.set_error(errors.USER_NOT_AUTHORIZED, status=401)
                 return
@@ -217,7 +298,7 @@ class Context(object):
         # Target user
         target_user = (self.target_user or data.get('user_id') or
                        data.get('user_name') or self.request_user)
-        self.target_user = md_api.load_user(target_user) if target_user else None
+        self.target_user = identity_map.load_user(target_user) if target_user else None
 
         # # Request user
         self.request_user = self.request_user or self.target_user
@@ -296,5 +377,5 @@ def create_admin_context(task,
 
     # Load target user
     if ctx.target_user:
-        ctx.target_user = md_api.load_user(ctx.target_user)
+        ctx.target_user = get_identity_map().load_user(ctx.target_user)
     return ctx
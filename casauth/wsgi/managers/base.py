@@ -3,56 +3,84 @@
 #
 
 import datetime
+import functools
 from functools import wraps
 import re
-import time
 
 from oslo_log import log as logging
 from sqlalchemy import and_, or_
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import RelationshipProperty, load_only, noload
 
 from casauth.common import exceptions as cas_exc, json, errors
+from casauth.common import cache_utils
+from casauth.common import cfg
 from casauth.common import time_utils
 from casauth.common import data_utils
 from casauth.db import models as md
+from casauth.db.sqlalchemy import locking
+from casauth.wsgi.base import context
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 DEFAULT_SORT_BY = ['create_date__desc']
 
-
-def get_lock(id, timeout=None):
+# Compiled listing conditions, keyed by (model class, condition shape)
+CONDITION_CACHE_SIZE = 512
+_COMPILED_CONDITIONS = cache_utils.TTLCache(maxsize=CONDITION_CACHE_SIZE, ttl=0)
+# Normalized JSON condition strings
+_NORMALIZED_CONDITIONS = cache_utils.TTLCache(maxsize=CONDITION_CACHE_SIZE, ttl=0)
+
+_CONDITION_OPERATORS = {
+    'eq': lambda column, v: column == v,
+    'ne': lambda column, v: column != v,
+    'gt': lambda column, v: column > v,
+    'egt': lambda column, v: column >= v,
+    'lt': lambda column, v: column < v,
+    'elt': lambda column, v: column <= v,
+    'in': lambda column, v: column.in_(v),
+    'nin': lambda column, v: ~column.in_(v),
+    'like': lambda column, v: column.like(v),
+    'nlike': lambda column, v: ~column.like(v),
+    'ilike': lambda column, v: column.ilike(v),
+    'nilike': lambda column, v: ~column.ilike(v),
+    'contain': lambda column, v: column.contains(v),
+    'ncontain': lambda column, v: ~column.contains(v),
+}
+
+
+def get_lock(id):
     """
-    Get lock object.
-    :param id:
-    :param timeout: timeout in seconds
-    :return:
+    Get a held lock.
+    :param id: lock name
+    :return: dict of the lock, None if the lock is free or expired
     """
-    lock = md.Lock.raw_query().get(id)
-    if lock and timeout is not None:
-        if lock.timestamp + datetime.timedelta(seconds=timeout) < datetime.datetime.utcnow():
-            error = lock.delete()
-            return None
-    return lock
+    return locking.get_service().get(str(id))
 
 
-def acquire_lock(ctx, id, timeout=None):
+def acquire_lock(ctx, id, timeout=None, wait_timeout=None, poll_interval=None):
     """
     Create a lock to do an action with preventing race condition.
     :param ctx:
-    :param id:
-    :param timeout:
-    :return:
+    :param id: lock name
+    :param timeout: lease time in seconds, the lock is freed after it
+        if not released
+    :param wait_timeout: seconds to wait for the lock, don't wait if empty
+    :param poll_interval: max seconds between two tries when the lock is
+        polled instead of waited for
+    :return: a lease object, its token increases on each acquisition
     """
-    lock = get_lock(id, timeout=timeout)
-    if lock:
-        ctx.set_error(errors.DB_LOCK_ACQUIRE_FAILED, status=406)
-        return
-
+    service = locking.get_service(poll_interval=CONF.wsgi.lock_poll_interval)
     try:
-        lock = md.Lock.create(id=id, timestamp=datetime.datetime.utcnow())
-    except cas_exc.InvalidModelError as ex:
+        lock = service.acquire(str(id), timeout or CONF.wsgi.lock_lease_time,
+                               wait_timeout=wait_timeout, reason=ctx.task,
+                               poll_interval=poll_interval)
+    except Exception as e:
+        ctx.set_error(errors.DB_LOCK_ACQUIRE_FAILED, cause=e, status=500)
+        return
+    if not lock:
         ctx.set_error(errors.DB_LOCK_ACQUIRE_FAILED, status=406)
         return
-
     return lock
 
 
@@ -62,28 +90,32 @@ def release_lock(ctx, lock):
     :param lock:
     :return:
     """
-    ret = lock.delete()
-    if not ret:
+    try:
+        released = lock.release()
+    except Exception as e:
+        ctx.set_error(errors.DB_LOCK_RELEASE_FAILED, cause=e, status=500)
+        return
+    if not released:
+        # Lease expired before release, another owner may have taken the lock
         ctx.set_error(errors.DB_LOCK_RELEASE_FAILED, status=406)
         return
 
 
 def release_lock_by_id(ctx, id):
     """
-    Release a lock.
+    Release a lock whoever holds it.
     :param ctx:
     :param id:
     :return:
     """
-    lock = get_lock(id)
-    if lock:
-        ret = lock.delete()
-        if not ret:
-            ctx.set_error(errors.DB_LOCK_RELEASE_FAILED, status=406)
-            return
+    try:
+        locking.get_service().force_release(str(id))
+    except Exception as e:
+        ctx.set_error(errors.DB_LOCK_RELEASE_FAILED, cause=e, status=500)
+        return
 
 
-def with_lock(ctx, id, timeout=None, wait_timeout=None, check_interval=1):
+def with_lock(ctx, id, timeout=None, wait_timeout=None, check_interval=None):
     """
     Create a lock with ID to perform an action.
     Usage:
@@ -94,35 +126,25 @@ def with_lock(ctx, id, timeout=None, wait_timeout=None, check_interval=1):
 
     :param ctx:
     :param id: lock id
-    :param timeout:
+    :param timeout: lease time in seconds
     :param wait_timeout:
-    :param check_interval:
+    :param check_interval: max seconds between two tries when the lock
+        is polled instead of waited for
     :return:
     """
-    check_interval = check_interval or 1
-
     def wrapper(func):
         @wraps(func)
         def func_wrapper(*a, **kw):
-            wait = 0
-            while True:
-                lock = acquire_lock(ctx, id, timeout=timeout)
-                if lock:
-                    LOG.debug('Lock acquired: ' + id)
-                    try:
-                        return func(*a, **kw)
-                    finally:
-                        release_lock(ctx, lock)
-                        LOG.debug('Lock released: ' + id)
-                else:
-                    if not wait_timeout:
-                        ctx.set_error(errors.DB_LOCK_ACQUIRE_FAILED, status=500)
-                        return
-                    time.sleep(check_interval)
-                    wait += check_interval
-                    if wait >= wait_timeout:
-                        ctx.set_error(errors.DB_LOCK_ACQUIRE_FAILED, status=500)
-                        return
+            lock = acquire_lock(ctx, id, timeout=timeout, wait_timeout=wait_timeout,
+                                poll_interval=check_interval)
+            if not lock:
+                return
+            LOG.debug('Lock acquired: %s, token %s', id, lock.token)
+            try:
+                return func(*a, **kw)
+            finally:
+                release_lock(ctx, lock)
+                LOG.debug('Lock released: %s', id)
 
         return func_wrapper
     return wrapper
@@ -158,6 +180,10 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
         fields of context data:
             page: page index from 1 of data
             page_size: number of items in a page
+            cursor: keyset pagination cursor, empty for the first page,
+                then next_cursor of the previous page. `page` is ignored.
+            with_total: count the total number of items, the count is
+                reused for a few seconds for the same condition
             fields: data fields of object to get if don't want to get default fields
             extra_fields: data fields not it default fields list
             condition: a condition can be in several forms:
@@ -176,6 +202,8 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
             sort_by: sorting key, e.g. col1__asc,col2__desc
             extra_field_condition: condition applied on extra fields,
                 this way may have less performance, avoid to use it if not needed
+        Only the columns and relationships of fields and extra_fields are
+        loaded, the returned objects have the other attributes unloaded.
     :param model_class:
     :param override_condition: is a list or a dict.
     :param on_loaded_func: function for processing loaded items.
@@ -189,10 +217,178 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
     is_admin = ctx.is_admin_request
 
     data = ctx.data
-    region_id = data.get('region_id') or None
     page = int(data.get('page') or 1)
     page_size = int(data.get('page_size') or 1000)
+    cursor = data.get('cursor')
+    with_total = bool(data.get('with_total'))
+
+    list_query = _build_list_query(ctx, model_class, override_condition=override_condition)
+    if list_query is None:
+        return
+    query, sort_keys, fields, extra_fields, count_key = list_query
+
+    if cursor is not None:
+        return _dump_objects_by_cursor(ctx, model_class, query, sort_keys, cursor,
+                                       page_size=page_size, with_total=with_total,
+                                       count_key=count_key,
+                                       fields=fields, extra_fields=extra_fields,
+                                       on_loaded_func=on_loaded_func)
+
+    dump = data_utils.get_dumper(model_class, fields=fields, extra_fields=extra_fields,
+                                 is_admin=is_admin)
+    prev_page = None
+    objects_data = []
+    all_objects = []
+    while True:
+        objects = query.paginate(page=page, per_page=page_size, error_out=False,
+                                 with_total=with_total, count_key=count_key)
+        items = on_loaded_func(ctx, objects.items) if on_loaded_func else objects.items
+
+        for item in items:
+            # if extra_field_condition:
+            #     if not _check_extra_field_condition(item, extra_field_condition):
+            #         continue
+            objects_data.append(dump(item) if item.__class__ is model_class else
+                                item.to_dict(fields=fields, extra_fields=extra_fields,
+                                             is_admin=is_admin))
+            all_objects.append(item)
+
+        if prev_page is None and objects.has_prev:
+            prev_page = objects.prev_num
+
+        if all_objects or not objects.has_next:
+            break
+        page += 1
+
+    ctx.response = {
+        'data': objects_data,
+        'has_more': objects.has_next,
+        'next_page': objects.next_num if objects.has_next else None,
+        'prev_page': prev_page,
+    }
+    if with_total:
+        ctx.response['total'] = objects.total
+    return all_objects
+
+
+def _projection_options(model_class, attrs, sort_keys=None):
+    """
+    Build query options loading only the columns and relationships of
+    the requested attributes, big columns such as JSON data and eager
+    relationships nobody asked for are not loaded.
+    :param model_class:
+    :param attrs: names of the requested attributes
+    :param sort_keys: list of (column, direction), sort columns are always loaded
+    :return: list of query options, empty if the projection is not safe
+    """
+    mapper = sa_inspect(model_class, raiseerr=False)
+    if mapper is None:
+        return []
+
+    columns = set()
+    relationships = set()
+    for name in attrs:
+        prop = mapper.attrs.get(name)
+        if prop is None:
+            if hasattr(model_class, name):
+                # Python property, it may read any column
+                return []
+            continue
+        if isinstance(prop, RelationshipProperty):
+            relationships.add(name)
+            columns.update(mapper.get_property_by_column(col).key
+                           for col in prop.local_columns)
+        else:
+            columns.add(name)
+    columns.update(column.key for column, _ in sort_keys or ())
+
+    options = [load_only(*columns)] if columns else []
+    options.extend(noload(getattr(model_class, rel.key))
+                   for rel in mapper.relationships if rel.key not in relationships)
+    return options
+
+
+def _count_key(model_class, condition, region_id, join, override_condition):
+    """
+    Build the signature of a listing condition, used as key of cached counts.
+    :param model_class:
+    :param condition: normalized condition
+    :param region_id:
+    :param join:
+    :param override_condition:
+    :return: None if the condition can't be normalized
+    """
+    if override_condition and isinstance(override_condition, (list, tuple)):
+        # SQL expressions, no stable signature
+        return None
+    try:
+        return json.json_dumps([model_class.__name__, condition or None, region_id,
+                                join or None, override_condition or None],
+                               sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_objects(ctx, model_class, override_condition=None, roles_required=None,
+                   batch_size=1000):
+    """
+    Get all model objects matching a condition as a stream of dicts.
+    Objects are fetched by a server-side cursor in batches, so memory
+    does not grow with the number of objects.
+    :param ctx: same data as dump_objects() except paging fields
+    :param model_class:
+    :param override_condition: is a list or a dict.
+    :param roles_required:
+    :param batch_size: number of objects fetched at once
+    :return: ctx.response is set as:
+        {
+            'fields': <list of dumped fields>,
+            'data': <iterator of object dicts>,
+        }
+    """
+    if roles_required:
+        if not ctx.check_request_user_role(roles_required):
+            ctx.set_error(errors.USER_ACTION_NOT_ALLOWED, status=403)
+            return
+    is_admin = ctx.is_admin_request
+
+    list_query = _build_list_query(ctx, model_class, override_condition=override_condition)
+    if list_query is None:
+        return
+    query, _, fields, extra_fields, _ = list_query
+
+    dump = data_utils.get_dumper(model_class, fields=fields, extra_fields=extra_fields,
+                                 is_admin=is_admin)
+
+    def _iter_data():
+        items = query.stream(batch_size=batch_size)
+        try:
+            for item in items:
+                yield dump(item)
+        finally:
+            items.close()
+
+    ctx.response = {
+        'fields': [*fields, *[f for f in extra_fields or [] if f not in fields]],
+        'data': _iter_data(),
+    }
+    return ctx.response
+
+
+def _build_list_query(ctx, model_class, override_condition=None):
+    """
+    Build the query of the listing arguments of ctx data, see dump_objects().
+    :param ctx:
+    :param model_class:
+    :param override_condition:
+    :return: (query, sort_keys, fields, extra_fields, count_key), None on error
+    """
+    is_admin = ctx.is_admin_request
+
+    data = ctx.data
+    region_id = data.get('region_id') or None
     sort_by = data.get('sort_by')
+    with_total = bool(data.get('with_total'))
     condition = data.get('condition')
     fields = data.get('fields')
     extra_fields = data.get('extra_fields')
@@ -205,14 +401,13 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
     conds = []
     try:
         if condition:
-            if isinstance(condition, str):
-                condition = json.json_loads(condition)
-            filter_ = _parse_condition(model_class, condition)
+            condition = normalize_condition(condition)
+            filter_ = _build_condition(model_class, *condition)
             if filter_ is not None:
                 conds.append(filter_)
     except BaseException as e:
         ctx.set_error(errors.OBJECT_LIST_CONDITION_INVALID, cause=e, status=406)
-        return
+        return None
 
     if region_id:
         attr = getattr(model_class, 'region_id', None)
@@ -222,7 +417,7 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
     cond_kwargs = override_condition if isinstance(override_condition, dict) else {}
     cond_args = override_condition if isinstance(override_condition, (list, tuple)) else []
 
-    order_by = []
+    sort_keys = []
     if sort_by is None:
         sort_by = DEFAULT_SORT_BY
     if sort_by:
@@ -230,11 +425,13 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
             item = item.split('__')
             attr = item[0]
             direction = item[1] if len(item) == 2 else 'asc'
+            if direction not in ('asc', 'desc'):
+                continue
 
             attr = getattr(model_class, attr, None)
             if attr:
-                attr = getattr(attr, direction, None)
-                order_by.append(attr())
+                sort_keys.append((attr, direction))
+    order_by = [getattr(attr, direction)() for attr, direction in sort_keys]
 
     # Create query first
     params = {
@@ -243,6 +440,8 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
             *cond_args,
         ],
         'order_by': order_by,
+        'options': _projection_options(model_class, [*fields, *(extra_fields or [])],
+                                       sort_keys=sort_keys),
         **cond_kwargs,
     }
     query = model_class.query(**params)
@@ -253,7 +452,7 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
             query = _parse_join_condition(query, join)
         except BaseException as e:
             ctx.set_error(errors.OBJECT_LIST_CONDITION_INVALID, cause=e, status=406)
-            return
+            return None
 
     # # Condition will be used on extra fields of objects
     # if isinstance(extra_field_condition, str):
@@ -262,35 +461,70 @@ def dump_objects(ctx, model_class, override_condition=None, on_loaded_func=None,
     #     except:
     #         extra_field_condition = None
 
-    prev_page = None
+    count_key = None
+    if with_total:
+        count_key = _count_key(model_class, condition, region_id, join, override_condition)
+
+    return query, sort_keys, fields, extra_fields, count_key
+
+
+def _dump_objects_by_cursor(ctx, model_class, query, sort_keys, cursor, page_size,
+                            with_total=False, count_key=None, fields=None,
+                            extra_fields=None, on_loaded_func=None):
+    """
+    Get multiple model objects by keyset pagination.
+    :param ctx:
+    :param model_class:
+    :param query:
+    :param sort_keys: list of (column, direction)
+    :param cursor: cursor from the previous page, empty for the first page
+    :param page_size:
+    :param with_total:
+    :param count_key:
+    :param fields:
+    :param extra_fields:
+    :param on_loaded_func:
+    :return:
+    """
+    is_admin = ctx.is_admin_request
+    # Items must have a strict order to be found after a cursor
+    if not any(attr.key == 'id' for attr, _ in sort_keys):
+        sort_keys = sort_keys + [(model_class.id, 'asc')]
+
+    dump = data_utils.get_dumper(model_class, fields=fields, extra_fields=extra_fields,
+                                 is_admin=is_admin)
     objects_data = []
     all_objects = []
+    total = None
     while True:
-        objects = query.paginate(page=page, per_page=page_size, error_out=False)
+        try:
+            objects = query.seek(sort_keys, cursor=cursor, per_page=page_size,
+                                 with_total=with_total and total is None,
+                                 count_key=count_key)
+        except ValueError as e:
+            ctx.set_error(errors.OBJECT_LIST_CURSOR_INVALID, cause=e, status=406)
+            return
+        if total is None:
+            total = objects.total
         items = on_loaded_func(ctx, objects.items) if on_loaded_func else objects.items
 
         for item in items:
-            # if extra_field_condition:
-            #     if not _check_extra_field_condition(item, extra_field_condition):
-            #         continue
-            objects_data.append(item.to_dict(fields=fields,
-                                             extra_fields=extra_fields,
+            objects_data.append(dump(item) if item.__class__ is model_class else
+                                item.to_dict(fields=fields, extra_fields=extra_fields,
                                              is_admin=is_admin))
             all_objects.append(item)
 
-        if prev_page is None and objects.has_prev:
-            prev_page = objects.prev_num
-
         if all_objects or not objects.has_next:
             break
-        page += 1
+        cursor = objects.next_cursor
 
     ctx.response = {
         'data': objects_data,
         'has_more': objects.has_next,
-        'next_page': objects.next_num if objects.has_next else None,
-        'prev_page': prev_page,
+        'next_cursor': objects.next_cursor,
     }
+    if with_total:
+        ctx.response['total'] = total
     return all_objects
 
 
@@ -319,86 +553,136 @@ def _parse_condition(model_class, condition):
         }
         will check for: (name == 'abc') and (status != None)
 
+    The condition is split into its shape and values, the filter builder
+    compiled from the shape is cached per model class, so parsing cost is
+    paid once per shape and only the values are bound on each call.
+
     :param model_class:
-    :param condition:
+    :param condition: condition object or its JSON string
     :return:
     """
+    return _build_condition(model_class, *normalize_condition(condition))
+
+
+def normalize_condition(condition):
+    """
+    Split a condition into its shape and values.
+    :param condition: condition object or its JSON string
+    :return: (shape, params), shape is a hashable tuple tree having
+        values replaced by their order in params
+    """
+    if isinstance(condition, str):
+        normalized = _NORMALIZED_CONDITIONS.get(condition)
+        if normalized is None:
+            params = []
+            shape = _normalize_condition(json.json_loads(condition), params)
+            normalized = (shape, tuple(params))
+            _NORMALIZED_CONDITIONS.set(condition, normalized)
+        return normalized
+
+    params = []
+    shape = _normalize_condition(condition, params)
+    return shape, tuple(params)
+
+
+def _normalize_condition(condition, params):
     if isinstance(condition, list):
         if len(condition) == 1:
-            return _parse_condition(model_class, condition[0])
-        else:
-            item0 = condition[0]
-            if item0 == 'or':
-                condition = condition[1:]
-                op_ = or_
-            elif item0 == 'and':
-                condition = condition[1:]
-                op_ = and_
-            else:
-                op_ = and_
-            return op_(_parse_condition(model_class, cond) for cond in condition)
+            return _normalize_condition(condition[0], params)
+        item0 = condition[0]
+        if item0 in ('or', 'and'):
+            return item0, tuple(_normalize_condition(cond, params) for cond in condition[1:])
+        return 'and', tuple(_normalize_condition(cond, params) for cond in condition)
 
     if isinstance(condition, str):
-        condition = _parse_str_condition(condition)
+        key, op, value_str, value_type = _split_str_condition(condition)
+        params.append(value_str)
+        return 'leaf', key, op, value_type
 
     op = condition['op']
     v = condition['v']
-    if op == 'and':
-        return and_(_parse_condition(model_class, cond) for cond in v)
+    if op in ('and', 'or'):
+        return op, tuple(_normalize_condition(cond, params) for cond in v)
 
-    if op == 'or':
-        return or_(_parse_condition(model_class, cond) for cond in v)
+    params.append(v)
+    return 'leaf', condition['k'], op, None
+
+
+def _build_condition(model_class, shape, params):
+    """
+    Build SQLAlchemy filter from a normalized condition.
+    :param model_class:
+    :param shape:
+    :param params:
+    :return:
+    """
+    key = (model_class, shape)
+    builder = _COMPILED_CONDITIONS.get(key)
+    if builder is None:
+        builder = _compile_condition(model_class, shape)
+        _COMPILED_CONDITIONS.set(key, builder)
+    return builder(iter(params))
+
+
+def _compile_condition(model_class, shape):
+    """
+    Compile a condition shape to a function building the filter from
+    an iterator of the condition values.
+    :param model_class:
+    :param shape:
+    :return:
+    """
+    kind = shape[0]
+    if kind in ('and', 'or'):
+        op_ = and_ if kind == 'and' else or_
+        children = [_compile_condition(model_class, item) for item in shape[1]]
+
+        def build_group(params):
+            # Every child consumes its values even if it builds no filter
+            clauses = [child(params) for child in children]
+            clauses = [clause for clause in clauses if clause is not None]
+            return op_(*clauses) if clauses else None
+        return build_group
+
+    _, k, op, value_type = shape
+    if value_type is not None and not value_type.startswith('as_'):
+        raise ValueError('Value type "{}" invalid'.format(value_type))
 
-    k = condition['k']
     if '.' in k:
         class_name, k = k.split('.')
         model_class = md.get_model_class(class_name)
 
     column = getattr(model_class, k, None)
-    if not column:
-        return
+    operator = _CONDITION_OPERATORS.get(op)
+    if column is None or operator is None:
+        def build_nothing(params):
+            next(params)
+        return build_nothing
 
     col_type = column.type.__class__.__name__
-    if v is not None:
+
+    def build_leaf(params):
+        v = next(params)
+        if value_type is not None:
+            v = parse_condition_value_cached(v, value_type)
         if isinstance(v, str):
-            if col_type == 'Date':
-                v = datetime.datetime.strptime(v, json.DATE_FORMAT)
-            elif col_type == 'Time':
-                v = datetime.datetime.strptime(v, json.TIME_FORMAT)
-            elif col_type == 'DateTime':
-                format_ = json.DATE_TIME_FORMAT
-                if ' ' in format_ and ' ' not in v:
-                    format_ = json.DATE_FORMAT
-                v = datetime.datetime.strptime(v, format_)
+            v = _parse_column_value(v, col_type)
+        return operator(column, v)
+    return build_leaf
 
-    if op == 'eq':
-        return column == v
-    if op == 'ne':
-        return column != v
-    if op == 'gt':
-        return column > v
-    if op == 'egt':
-        return column >= v
-    if op == 'lt':
-        return column < v
-    if op == 'elt':
-        return column <= v
-    if op == 'in':
-        return column.in_(v)
-    if op == 'nin':
-        return ~column.in_(v)
-    if op == 'like':
-        return column.like(v)
-    if op == 'nlike':
-        return ~column.like(v)
-    if op == 'ilike':
-        return column.ilike(v)
-    if op == 'nilike':
-        return ~column.ilike(v)
-    if op == 'contain':
-        return column.contains(v)
-    if op == 'ncontain':
-        return ~column.contains(v)
+
+@functools.lru_cache(maxsize=1024)
+def _parse_column_value(v, col_type):
+    if col_type == 'Date':
+        return datetime.datetime.strptime(v, json.DATE_FORMAT)
+    elif col_type == 'Time':
+        return datetime.datetime.strptime(v, json.TIME_FORMAT)
+    elif col_type == 'DateTime':
+        format_ = json.DATE_TIME_FORMAT
+        if ' ' in format_ and ' ' not in v:
+            format_ = json.DATE_FORMAT
+        return datetime.datetime.strptime(v, format_)
+    return v
 
 
 def _parse_str_condition(condition):
@@ -412,6 +696,21 @@ def _parse_str_condition(condition):
         age__egt__40__as_int
         birth_day__gt__1990-10-01__as_date
     """
+    key, op, value_str, value_type = _split_str_condition(condition)
+    value = parse_condition_value(value_str, value_type)
+    return {
+        'op': op,
+        'k': key,
+        'v': value,
+    }
+
+
+def _split_str_condition(condition):
+    """
+    Split a condition string to its key, operator, value and value type.
+    :param condition:
+    :return:
+    """
     parts = condition.split('__')
     count = len(parts)
     if count < 3:
@@ -425,13 +724,7 @@ def _parse_str_condition(condition):
         value_str = parts[2]
     else:
         value_str = '__'.join(parts[2:-1])
-
-    value = parse_condition_value(value_str, value_type)
-    return {
-        'op': op,
-        'k': key,
-        'v': value,
-    }
+    return key, op, value_str, value_type
 
 
 def parse_condition_value(value, value_type):
@@ -469,6 +762,15 @@ def parse_condition_value(value, value_type):
     return result
 
 
+@functools.lru_cache(maxsize=1024)
+def parse_condition_value_cached(value, value_type):
+    """
+    Same as parse_condition_value() for string values, the parsed values
+    are immutable so they are shared.
+    """
+    return parse_condition_value(value, value_type)
+
+
 def _parse_join_condition(query, condition):
     """
     Parse join condition.
@@ -655,6 +957,9 @@ def dump_object(ctx, object, fields=None, extra_fields=None):
     :param extra_fields:
     :return:
     """
+    if isinstance(object, md.User):
+        # Users of the request are dumped from the ones already loaded
+        object = context.get_identity_map().load_user(object)
     is_admin = ctx.is_admin_request
     ctx.response = resp = data_utils.dump_value(object,
                                                 fields=fields, extra_fields=extra_fields,
@@ -5,9 +5,10 @@
 import re
 
 from foxcloud import client as fox_client
-from foxcloud import exceptions as cas_exc
+from foxcloud import exceptions as fox_exc
 
 from casauth.common import cfg, errors
+from casauth.common import exceptions as cas_exc
 from casauth.common import time_utils, str_utils, mail_utils
 from casauth.db import models as md
 from casauth.db import types as md_type
@@ -152,9 +153,13 @@ def _update_partner_attrs(ctx, partner, action='update_partner'):
     if password:
         # User must provide current password to check for matching (if updates)
         if not is_admin:
-            if action == 'update_partner' and not str_utils.check_user_password(partner.password_hash,
-                                                                                   data['old_password']):
-                ctx.set_error(errors.USER_PASSWORD_INVALID, status=406)
+            try:
+                if action == 'update_partner' and not str_utils.check_user_password(partner.password_hash,
+                                                                                       data['old_password']):
+                    ctx.set_error(errors.USER_PASSWORD_INVALID, status=406)
+                    return
+            except cas_exc.HashExecutorBusyError as e:
+                ctx.set_error(errors.SERVER_BUSY, cause=e, status=503)
                 return
 
         # New password must meet some requirements
@@ -165,7 +170,11 @@ def _update_partner_attrs(ctx, partner, action='update_partner'):
             ctx.set_error(errors.USER_PASSWORD_REQUIREMENT_NOT_MET, cause=e, status=406)
             return
 
-        partner.set_password(password)
+        try:
+            partner.set_password(password)
+        except cas_exc.HashExecutorBusyError as e:
+            ctx.set_error(errors.SERVER_BUSY, cause=e, status=503)
+            return
 
     # Other attributes
     for attr in md.User.__partner_update_fields__:
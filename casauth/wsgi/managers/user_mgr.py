@@ -2,7 +2,11 @@
 # Copyright (c) 2020 FTI-CAS
 #
 
+import csv
+import io
 import re
+import time
+import uuid
 
 from foxcloud import client as fox_client
 from foxcloud import exceptions as fox_exc
@@ -10,10 +14,15 @@ from foxcloud import exceptions as fox_exc
 from casauth.common import cfg, errors
 from casauth.common import exceptions as cas_exc
 from casauth.common import time_utils, str_utils, mail_utils
+from casauth.common import ldap_utils
+from casauth.common import password_utils
+from casauth.db import config_cache
 from casauth.db import models as md
+from casauth.db import token_revocation
 from casauth.db import types as md_type
 from casauth.db.sqlalchemy import api as md_api
 from casauth.wsgi import app
+from casauth.wsgi.base import context
 from casauth.wsgi.managers import base as base_mgr
 
 CONF = cfg.CONF
@@ -26,6 +35,14 @@ CREATE_ROLES = (md_type.UserRole.USER,) + ADMIN_ROLES
 UPDATE_ROLES = (md_type.UserRole.USER,) + ADMIN_ROLES
 DELETE_ROLES = ADMIN_ROLES
 
+USER_NAME_PATTERN = re.compile('^[a-z][a-z0-9@_\\.\\-]*$')
+
+# Profile attributes taken from rows of imported users
+IMPORT_PROFILE_FIELDS = ('full_name', 'short_name', 'tax_no', 'id_no', 'id_location', 'phone_num',
+                         'address', 'city', 'country_code', 'ref_name', 'ref_phone', 'ref_email',
+                         'rep_name', 'rep_phone', 'rep_email')
+IMPORT_PROFILE_DATE_FIELDS = ('birthday', 'id_created_at', 'id_expired_at')
+
 
 def get_ldap_config(ctx):
     """
@@ -33,16 +50,12 @@ def get_ldap_config(ctx):
     :param ctx:
     :return:
     """
-    ldap_config = md_api.query(md.Configuration,
-                               type=md_type.ConfigurationType.BACKEND,
-                               name='ldap_config',
-                               status=md_type.ConfigurationStatus.ENABLED,
-                               order_by=md.Configuration.version.desc()).first()
+    ldap_config = config_cache.get_cache().get_contents('ldap_config')
     if not ldap_config:
-        e = ValueError('Config BACKEND/ldap_config not found in database.')
+        e = ValueError('Config ldap_config not found in database.')
         ctx.set_error(errors.CONFIG_NOT_FOUND, cause=e, status=404)
         return
-    return ldap_config.contents
+    return ldap_config
 
 
 def encrypt_ldap_info(ldap_info):
@@ -106,13 +119,34 @@ def create_ldap_client(ctx, user=None):
     return fox_client.Client('1', engine='console', services='ldap', **params).ldap
 
 
+def get_ldap_pool(ctx):
+    """
+    Get the pool of LDAP clients bound with the admin account.
+    :param ctx:
+    :return:
+    """
+    ldap_config = get_ldap_config(ctx)
+    if ctx.failed:
+        return
+    if not ldap_config['enabled']:
+        return None
+
+    ctx.data = ctx.data or {}
+    ctx.data['ldap_config'] = ldap_config
+
+    dn = 'cn={},{}'.format(ldap_config['cn'], ldap_config['dc'])
+    return ldap_utils.get_pool(ldap_config['url'], dn, ldap_config['password'])
+
+
 def create_ldap_user(ctx, user):
-    ldap_client = create_ldap_client(ctx)  # Use LDAP admin account to create user
-    if not ldap_client or ctx.failed:
+    ldap_pool = get_ldap_pool(ctx)  # Use LDAP admin account to create user
+    if not ldap_pool or ctx.failed:
         return
 
     data = ctx.data
+    ldap_client = None
     try:
+        ldap_client = ldap_pool.acquire()
         dc = data['ldap_config']['dc']
         username = user.user_name
         password = data['password']
@@ -137,21 +171,23 @@ def create_ldap_user(ctx, user):
         except:
             pass
         ctx.set_error(error, cause=e, status=500)
+    except cas_exc.LdapPoolTimeoutError as e:
+        ctx.set_error(errors.USER_CREATE_FAILED, cause=e, status=503)
 
-    finally:  # Destroy client session
-        try:
-            ldap_client.unbind()
-        except Exception as e:
-            LOG.warning('Failed to close LDAP session: %s', e)
+    finally:  # Give back client session, a failed one is closed
+        if ldap_client is not None:
+            ldap_pool.release(ldap_client, discard=ctx.failed)
 
 
 def update_ldap_user(ctx, user):
-    ldap_client = create_ldap_client(ctx)  # Use LDAP admin account to update user
-    if not ldap_client or ctx.failed:
+    ldap_pool = get_ldap_pool(ctx)  # Use LDAP admin account to update user
+    if not ldap_pool or ctx.failed:
         return
 
     data = ctx.data
+    ldap_client = None
     try:
+        ldap_client = ldap_pool.acquire()
         ldap_info = decrypt_ldap_info(user.data['ldap_info'])
 
         # Change user password
@@ -175,20 +211,22 @@ def update_ldap_user(ctx, user):
         except:
             pass
         ctx.set_error(error, cause=e, status=500)
+    except cas_exc.LdapPoolTimeoutError as e:
+        ctx.set_error(errors.USER_UPDATE_FAILED, cause=e, status=503)
 
-    finally:  # Destroy client session
-        try:
-            ldap_client.unbind()
-        except Exception as e:
-            LOG.warning('Failed to close LDAP session: %s', e)
+    finally:  # Give back client session, a failed one is closed
+        if ldap_client is not None:
+            ldap_pool.release(ldap_client, discard=ctx.failed)
 
 
 def delete_ldap_user(ctx, user):
-    ldap_client = create_ldap_client(ctx)  # Use LDAP admin account to create user
-    if not ldap_client or ctx.failed:
+    ldap_pool = get_ldap_pool(ctx)  # Use LDAP admin account to create user
+    if not ldap_pool or ctx.failed:
         return
 
+    ldap_client = None
     try:
+        ldap_client = ldap_pool.acquire()
         ldap_info = decrypt_ldap_info(user.data['ldap_info'])
         ldap_client.delete_user(dn=create_ldap_dn(ldap_info))
 
@@ -203,12 +241,12 @@ def delete_ldap_user(ctx, user):
         except:
             pass
         ctx.set_error(error, cause=e, status=500)
+    except cas_exc.LdapPoolTimeoutError as e:
+        ctx.set_error(errors.USER_DELETE_FAILED, cause=e, status=503)
 
-    finally:  # Destroy client session
-        try:
-            ldap_client.unbind()
-        except Exception as e:
-            LOG.warning('Failed to close LDAP session: %s', e)
+    finally:  # Give back client session, a failed one is closed
+        if ldap_client is not None:
+            ldap_pool.release(ldap_client, discard=ctx.failed)
 
 
 def login(ctx):
@@ -229,12 +267,25 @@ def login(ctx):
     password = data['password']
 
     user = ctx.target_user
-    if not str_utils.check_user_password(user.password, password):
-        ctx.set_error(errors.USER_PASSWORD_INVALID, status=401)
+    try:
+        if not str_utils.check_user_password(user.password, password):
+            ctx.set_error(errors.USER_PASSWORD_INVALID, status=401)
+            return
+    except cas_exc.HashExecutorBusyError as e:
+        ctx.set_error(errors.SERVER_BUSY, cause=e, status=503)
         return
 
-    access_token_exp = app.config['API_ACCESS_TOKEN_EXPIRATION'].total_seconds()
-    refresh_token_exp = app.config['API_REFRESH_TOKEN_EXPIRATION'].total_seconds()
+    # Hash of old algorithm or costs is replaced while the password is known
+    if password_utils.needs_rehash(user.password):
+        def _rehash():
+            user.set_password(password)
+            return user.save()
+
+        # Best effort, a failure must not fail the login
+        _, error = md_api.save_nested(_rehash)
+        if error:
+            LOG.warning('Failed to rehash password of user %s: %s', user.id, error)
+
     base_data = {
         'id': user.id,
         'user_name': user.user_name,
@@ -242,14 +293,8 @@ def login(ctx):
         'role': user.role.value,
         'full_name': user.profile.full_name,
         'user_type': user.user_type.value,
-        'token_type': 'Bearer',
-        'access_token': user.gen_token(expires_in=access_token_exp),
-        'expires_in': access_token_exp,
-        'expires_on': time_utils.utc_future(seconds=access_token_exp),
-        'refresh_token': user.gen_token(expires_in=refresh_token_exp),
-        'refresh_token_expires_in': refresh_token_exp,
-        'refresh_token_expires_on': time_utils.utc_future(seconds=refresh_token_exp),
     }
+    base_data.update(gen_user_tokens(user))
 
     if data.get('get_user_data'):
         base_mgr.dump_object(ctx, object=user)
@@ -262,12 +307,47 @@ def login(ctx):
     return ctx.response
 
 
+def gen_user_tokens(user, family=None):
+    """
+    Gen an access token and a refresh token of a login.
+    :param user:
+    :param family: family id of the login, a new login if None
+    :return:
+    """
+    family = family or uuid.uuid4().hex
+    access_token_exp = app.config['API_ACCESS_TOKEN_EXPIRATION'].total_seconds()
+    refresh_token_exp = app.config['API_REFRESH_TOKEN_EXPIRATION'].total_seconds()
+    return {
+        'token_type': 'Bearer',
+        'access_token': user.gen_token(expires_in=access_token_exp, family=family),
+        'expires_in': access_token_exp,
+        'expires_on': time_utils.utc_future(seconds=access_token_exp),
+        'refresh_token': user.gen_token(expires_in=refresh_token_exp, family=family,
+                                        token_type=md_type.TokenType.REFRESH),
+        'refresh_token_expires_in': refresh_token_exp,
+        'refresh_token_expires_on': time_utils.utc_future(seconds=refresh_token_exp),
+    }
+
+
 def logout(ctx):
     """
-    Log out an user.
+    Log out an user, all the tokens of the login are revoked.
     :param ctx:
     :return:
     """
+    claims = str_utils.jwt_decode_claims(ctx.data['token'])
+    if not claims.get('fam'):
+        # Tokens issued before revocation support expire by themselves
+        return
+
+    refresh_token_exp = app.config['API_REFRESH_TOKEN_EXPIRATION'].total_seconds()
+    _, error = token_revocation.revoke(family=claims['fam'],
+                                       expires_at=time.time() + refresh_token_exp,
+                                       reason=md_type.TokenRevokeReason.LOGOUT,
+                                       user_id=claims['data'])
+    if error:
+        ctx.set_error(errors.USER_LOGOUT_FAILED, cause=error, status=500)
+        return
 
 
 def check_user(ctx, roles):
@@ -323,7 +403,7 @@ def get_user(ctx):
 
     data = ctx.data
     if data['user_id']:
-        user = md.User.raw_query().get(data['user_id'])
+        user = context.get_identity_map().get(data['user_id'])
         if not user:
             ctx.set_error(errors.USER_NOT_FOUND, status=404)
             return
@@ -350,6 +430,15 @@ def get_users(ctx):
     return base_mgr.dump_objects(ctx, model_class=md.User, roles_required=ADMIN_ROLES)
 
 
+def export_users(ctx):
+    """
+    Export all users matching a condition. Only ADMIN can do this action.
+    :param ctx: same data as get_users() without paging fields
+    :return:
+    """
+    return base_mgr.stream_objects(ctx, model_class=md.User, roles_required=ADMIN_ROLES)
+
+
 def create_user(ctx):
     """
     Create a new user.
@@ -366,8 +455,7 @@ def create_user(ctx):
     else:
         # Validate user info
         # User name pattern
-        pattern = '^[a-z][a-z0-9@_\\.\\-]*$'
-        if not re.match(pattern, user_name):
+        if not USER_NAME_PATTERN.match(user_name):
             ctx.set_error(errors.USER_NAME_INVALID, status=406)
             return
 
@@ -418,7 +506,7 @@ def create_user(ctx):
         ctx.set_error(error, status=500)
         return
 
-    user.profile_id = user_profile.id
+    user.profile = user_profile
     ctx.target_user = user
     ctx.request_user = ctx.request_user or user
 
@@ -427,25 +515,237 @@ def create_user(ctx):
     if ctx.failed:
         return
 
-    if user.status == md_type.UserStatus.DEACTIVATED:
-        try:
-            # Send activation e-mail
-            if not user.is_active:
-                mail_utils.send_mail_user_activation(user)
-
-        except Exception as e:
-            LOG.error("Error [create_user()] %s", str(e))
-
     user, error = user.create()
     if error:
-        user_profile.delete()
         ctx.set_error(error, status=500)
         return
+
+    if user.status == md_type.UserStatus.DEACTIVATED and not user.is_active:
+        # Send activation e-mail once the user is written
+        md_api.after_commit(_send_activation_mail, user)
+
     ctx.status = 201
-    user = md.User.get_by(id=user.id)
     base_mgr.dump_object(ctx, user)
 
 
+def _send_activation_mail(user):
+    try:
+        mail_utils.send_mail_user_activation(user)
+    except Exception as e:
+        LOG.error("Error [create_user()] %s", str(e))
+
+
+def _send_activation_mails(ctx, mail_users):
+    try:
+        mail_utils.send_mail_users_activation(mail_users)
+    except Exception as e:
+        LOG.error("Error [import_users()] %s", str(e))
+        ctx.set_warning(errors.MAIL_ACTIVATION_SEND_FAILED, cause=e)
+
+
+def load_import_rows(data):
+    """
+    Get rows of users to import from the JSON list or the CSV text of data.
+    :param data: {'users': [<dict>, ...]} or {'csv': <CSV text with header line>}
+    :return: list of dicts
+    """
+    rows = data.get('users')
+    if rows is None and data.get('csv'):
+        rows = list(csv.DictReader(io.StringIO(data['csv'])))
+    return rows or []
+
+
+def _too_long_field(model_class, values):
+    """
+    Find a string value longer than its column.
+    :param model_class:
+    :param values: dict of column values
+    :return: name of the first too long field, None if none
+    """
+    columns = model_class.__table__.c
+    for name, value in values.items():
+        length = getattr(columns[name].type, 'length', None) if name in columns else None
+        if length and isinstance(value, str) and len(value) > length:
+            return name
+    return None
+
+
+def _parse_import_row(ctx, row, seen):
+    """
+    Validate a row of imported user, without any database access.
+    :param ctx:
+    :param row:
+    :param seen: user names and e-mails of the previous rows
+    :return: (user mapping, profile mapping, password), or a dict of the
+        error message and the invalid field if any
+    """
+    row = {k: v.strip() if isinstance(v, str) else v for k, v in row.items() if k}
+    row = {k: v for k, v in row.items() if v not in (None, '')}
+
+    user_name = (row.get('user_name') or '').lower()
+    email = (row.get('email') or '').lower()
+    if user_name == '###':
+        user_name = email
+    if not user_name or not USER_NAME_PATTERN.match(user_name):
+        return {'error': errors.USER_NAME_INVALID}
+    if not str_utils.valid_email(email):
+        return {'error': errors.USER_EMAIL_INVALID}
+    if user_name in seen or email in seen:
+        return {'error': errors.USER_ALREADY_EXISTS}
+
+    password = row.get('password')
+    if password:
+        requirement = app.config['PASSWORD_REQUIREMENT']
+        if not str_utils.valid_user_password(password, requirement=requirement):
+            return {'error': errors.USER_PASSWORD_REQUIREMENT_NOT_MET}
+
+    role = md_type.UserRole.USER
+    if row.get('user_role'):
+        role = md_type.UserRole.parse(row['user_role'])
+        if not role or (ctx.request_user and ctx.request_user.role <= role):
+            return {'error': errors.USER_ROLE_INVALID}
+    status = md_type.UserStatus.DEACTIVATED
+    if row.get('status'):
+        status = md_type.UserStatus.parse(row['status'])
+        if not status:
+            return {'error': errors.USER_STATUS_INVALID}
+
+    now = time_utils.utc_now()
+    user = {
+        'user_name': user_name,
+        'email': email,
+        'status': status,
+        'user_type': md_type.UserType.parse(row.get('user_type')) or md_type.UserType.PERSONAL,
+        'account_type': md_type.AccountType.parse(row.get('account_type')) or md_type.AccountType.EU,
+        'role': role,
+        'level': 0,
+        'group_id': CONF.wsgi.default_user_group_id,
+        'is_active': status == md_type.UserStatus.ACTIVE,
+        'deleted': False,
+        'created_at': now,
+        'updated_at': now,
+    }
+    profile = {attr: row[attr] for attr in IMPORT_PROFILE_FIELDS if attr in row}
+    for attr in IMPORT_PROFILE_DATE_FIELDS:
+        if attr in row:
+            profile[attr] = time_utils.parse(row[attr])
+            if profile[attr] is None:
+                return {'error': errors.USER_FIELD_INVALID, 'field': attr}
+    profile['full_name'] = profile.get('full_name') or user_name
+
+    # Values not fitting their column would fail the whole import
+    for model_class, values in ((md.User, user), (md.UserProfile, profile)):
+        field = _too_long_field(model_class, values)
+        if field:
+            return {'error': errors.USER_FIELD_TOO_LONG, 'field': field}
+
+    profile['gender'] = md_type.UserGender.parse(row.get('gender')) or md_type.UserGender.OTHER
+    profile['created_at'] = profile['updated_at'] = now
+    seen.update((user_name, email))
+    return user, profile, password
+
+
+def import_users(ctx):
+    """
+    Create many users at once. Only ADMIN can do this action.
+    Rows are all validated first, existing users are found by one query,
+    then users are inserted by chunks and activation e-mails are queued
+    by one call.
+    :param ctx: sample ctx data:
+        {
+            'users': <list of user dicts with create_user() fields>,
+            'csv': <CSV text, used if 'users' is not given>,
+            'send_mail': <send activation e-mail to deactivated users>,
+            'dry_run': <only validate the rows>,
+        }
+    :return:
+    """
+    if ctx.check_token and not ctx.check_request_user_role(ADMIN_ROLES):
+        ctx.set_error(errors.USER_ACTION_NOT_ALLOWED, status=403)
+        return
+
+    data = ctx.data
+    try:
+        rows = load_import_rows(data)
+    except csv.Error as e:
+        ctx.set_error(errors.REQUEST_PARAM_INVALID, cause=e, status=406)
+        return
+    if len(rows) > CONF.wsgi.user_import_max_rows:
+        e = ValueError('Max {} users per import.'.format(CONF.wsgi.user_import_max_rows))
+        ctx.set_error(errors.REQUEST_PARAM_INVALID, cause=e, status=406)
+        return
+
+    failed = []
+    parsed = []
+    seen = set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            failed.append({'index': index, 'user_name': None, 'error': errors.REQUEST_PARAM_INVALID})
+            continue
+        result = _parse_import_row(ctx, row, seen)
+        if isinstance(result, dict):
+            failed.append(dict(result, index=index, user_name=row.get('user_name')))
+        else:
+            parsed.append((index, result))
+
+    # Find existing users of all rows by one query
+    if seen:
+        existing = md_api.query(md.User, md.User.user_name.in_(seen) | md.User.email.in_(seen)) \
+            .with_entities(md.User.user_name, md.User.email).all()
+        taken = {name for item in existing for name in item}
+        new_items = []
+        for index, (user, profile, password) in parsed:
+            if user['user_name'] in taken or user['email'] in taken:
+                failed.append({'index': index, 'user_name': user['user_name'],
+                               'error': errors.USER_ALREADY_EXISTS})
+            else:
+                new_items.append((index, (user, profile, password)))
+        parsed = new_items
+
+    failed.sort(key=lambda item: item['index'])
+    ctx.response = {
+        'created': 0 if data.get('dry_run') else len(parsed),
+        'failed': failed,
+    }
+    if data.get('dry_run') or not parsed:
+        return
+
+    # Passwords are hashed in parallel on half the hashing executor,
+    # the other half is left to logins
+    with_password = [user for _, (user, _, password) in parsed if password]
+    try:
+        hashes = password_utils.hash_passwords(
+            [password for _, (_, _, password) in parsed if password])
+    except cas_exc.HashExecutorBusyError as e:
+        ctx.set_error(errors.SERVER_BUSY, cause=e, status=503)
+        return
+    for user, password_hash in zip(with_password, hashes):
+        user['password'] = password_hash
+
+    chunk_size = CONF.wsgi.user_import_chunk_size
+    for start in range(0, len(parsed), chunk_size):
+        chunk = parsed[start:start + chunk_size]
+        profiles = [profile for _, (_, profile, _) in chunk]
+        # Ids of profiles are needed by users, they are inserted one by one
+        md_api.bulk_insert(md.UserProfile, profiles, return_defaults=True)
+        users = []
+        for _, (user, profile, _) in chunk:
+            user['profile_id'] = profile['id']
+            users.append(user)
+        md_api.bulk_insert(md.User, users)
+
+    if data.get('send_mail', True):
+        mail_users = [{'user_name': user['user_name'], 'email': user['email'],
+                       'full_name': profile['full_name']}
+                      for _, (user, profile, _) in parsed
+                      if user['status'] == md_type.UserStatus.DEACTIVATED]
+        if mail_users:
+            # Queued once the users are written
+            md_api.after_commit(_send_activation_mails, ctx, mail_users)
+
+    ctx.status = 201
+
+
 def _update_user_attrs(ctx, user, action='update_user'):
     """
     Update user data fields.
@@ -459,8 +759,13 @@ def _update_user_attrs(ctx, user, action='update_user'):
     password = data['password'] if action in ('create_user', 'reset_password') else data.get('password')
     if password:
         # User must provide current password to check for matching (if updates)
-        if action == 'update_user' and not str_utils.check_user_password(user.password, data['old_password']):
-            ctx.set_error(errors.USER_PASSWORD_INVALID, status=406)
+        try:
+            if action == 'update_user' and not str_utils.check_user_password(user.password,
+                                                                               data['old_password']):
+                ctx.set_error(errors.USER_PASSWORD_INVALID, status=406)
+                return
+        except cas_exc.HashExecutorBusyError as e:
+            ctx.set_error(errors.SERVER_BUSY, cause=e, status=503)
             return
 
         # New password must meet some requirements
@@ -472,7 +777,11 @@ def _update_user_attrs(ctx, user, action='update_user'):
             ctx.set_error(errors.USER_PASSWORD_REQUIREMENT_NOT_MET, cause=e, status=406)
             return
 
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except cas_exc.HashExecutorBusyError as e:
+            ctx.set_error(errors.SERVER_BUSY, cause=e, status=503)
+            return
 
     # Other attributes
     for attr in md.User.__user_update_fields__:
@@ -566,24 +875,31 @@ def delete_user(ctx):
     user = ctx.target_user
     remove_from_db = ctx.data.get('remove_from_db', False)
     if remove_from_db:
+        # The deletion is written first, so that the LDAP entry is only
+        # deleted once the row can be deleted. A LDAP failure then rolls
+        # back the deletion.
+        _, error = user.delete()
+        if error:
+            ctx.set_error(error, status=500)
+            return
+
         # Delete the user in LDAP backend
         delete_ldap_user(ctx, user)
         if ctx.failed:
             return
-
-        _, error = user.delete()
     else:
         # just mark the user as deleted
         _, error = user.update(status=md_type.UserStatus.DEACTIVATED, delete=True)
-
-    if error:
-        ctx.set_error(error, status=500)
-        return
+        if error:
+            ctx.set_error(error, status=500)
+            return
 
 
 def refresh_token(ctx):
     """
-    Refresh token for user.
+    Refresh token for user. The refresh token is rotated: it is revoked
+    and a new one is issued in the same family. A rotated refresh token
+    used again revokes the family.
     :param ctx:
     :return:
     """
@@ -591,19 +907,31 @@ def refresh_token(ctx):
         return
 
     user = ctx.target_user
-    access_token_exp = app.config['API_ACCESS_TOKEN_EXPIRATION'].total_seconds()
-    refresh_token_exp = app.config['API_REFRESH_TOKEN_EXPIRATION'].total_seconds()
-    response = {
-        'token_type': 'Bearer',
-        'access_token': user.gen_token(expires_in=access_token_exp),
-        'expires_in': access_token_exp,
-        'expires_on': time_utils.utc_future(seconds=access_token_exp),
-        'refresh_token': user.gen_token(expires_in=refresh_token_exp),
-        'refresh_token_expires_in': refresh_token_exp,
-        'refresh_token_expires_on': time_utils.utc_future(seconds=refresh_token_exp),
-    }
-    ctx.response = response
-    return response
+    claims = str_utils.jwt_decode_claims(ctx.data['token'])
+    token_type = claims.get('typ')
+    if token_type is None:
+        # Token issued before rotation support, a new family is started
+        ctx.response = gen_user_tokens(user)
+        return ctx.response
+
+    if token_type != md_type.TokenType.REFRESH:
+        ctx.set_error(errors.USER_TOKEN_INVALID, status=401)
+        return
+
+    _, error = token_revocation.revoke(jti=claims['jti'], expires_at=claims['exp'],
+                                       reason=md_type.TokenRevokeReason.ROTATED,
+                                       user_id=user.id)
+    if isinstance(error, cas_exc.InvalidModelError):
+        # Already rotated, by a concurrent request or a reuse
+        token_revocation.revoke_reused(claims)
+        ctx.set_error(errors.USER_TOKEN_INVALID, status=401)
+        return
+    if error:
+        ctx.set_error(errors.USER_TOKEN_REFRESH_FAILED, cause=error, status=500)
+        return
+
+    ctx.response = gen_user_tokens(user, family=claims['fam'])
+    return ctx.response
 
 
 def activate_user(ctx):
@@ -636,7 +964,7 @@ def activate_user(ctx):
         ctx.set_error(errors.USER_BLOCKED_OR_DELETED, status=403)
         return
 
-    error = user.update(status=md_type.UserStatus.ACTIVE, is_active=True)
+    _, error = user.update(status=md_type.UserStatus.ACTIVE, is_active=True)
     if error:
         ctx.set_error(error, status=500)
         return
@@ -54,7 +54,50 @@ _api_opts = [
 ]
 
 mail_opts = [
-
+    cfg.IntOpt('smtp_pool_size', default=4,
+               help='Max number of SMTP sessions kept per mail account.'),
+    cfg.IntOpt('smtp_max_messages_per_connection', default=100,
+               help='Number of messages sent before a SMTP session is '
+                    'recycled. Set to 0 for no limit.'),
+    cfg.IntOpt('smtp_keepalive_interval', default=30,
+               help='Idle seconds after which a SMTP session is checked '
+                    'with NOOP before reuse.'),
+    cfg.IntOpt('smtp_idle_timeout', default=300,
+               help='Idle seconds after which a SMTP session is re-opened '
+                    'instead of reused.'),
+    cfg.IntOpt('smtp_timeout', default=30,
+               help='Socket timeout in seconds of SMTP sessions.'),
+    cfg.StrOpt('outbox_path', default='/var/lib/cas/mail_outbox.sqlite',
+               help='SQLite file of the durable mail outbox.'),
+    cfg.IntOpt('outbox_workers_per_account', default=2,
+               help='Number of concurrent deliveries per mail account, '
+                    'over all the processes sharing the outbox. Each '
+                    'process runs as many dispatcher threads.'),
+    cfg.IntOpt('outbox_batch_size', default=20,
+               help='Max number of messages a dispatcher thread claims and '
+                    'sends over one SMTP session.'),
+    cfg.IntOpt('outbox_poll_interval', default=5,
+               help='Seconds between outbox polls of an idle dispatcher.'),
+    cfg.IntOpt('outbox_max_attempts', default=8,
+               help='Number of delivery attempts before a message is '
+                    'marked as failed.'),
+    cfg.IntOpt('outbox_retry_backoff', default=30,
+               help='Seconds before the first retry, doubled on each '
+                    'following attempt.'),
+    cfg.IntOpt('outbox_max_retry_backoff', default=3600,
+               help='Max seconds between two delivery attempts.'),
+    cfg.IntOpt('outbox_lease_time', default=600,
+               help='Seconds a claimed message is reserved to a dispatcher. '
+                    'Messages of a crashed dispatcher are retried after it.'),
+    cfg.IntOpt('outbox_retention', default=7 * 24 * 3600,
+               help='Seconds sent and failed messages are kept in the '
+                    'outbox for status lookups.'),
+    cfg.StrOpt('template_cache_dir', default='/var/cache/cas/mail_templates',
+               help='Directory of the compiled mail templates bytecode. '
+                    'Leave empty to compile templates in memory only.'),
+    cfg.BoolOpt('template_auto_reload', default=False,
+                help='Check mail template files for changes on each render. '
+                     'Only useful in development.'),
 ]
 
 CONF = cfg.CONF
@@ -15,6 +15,9 @@ from oslo_service import service
 
 from casmail import grpc as _grpc
 from casmail.common import cfg
+from casmail.common import outbox
+from casmail.common import smtp_pool
+from casmail.common import template_util
 from casmail.common.grpc import credentials
 from casmail.taskmanager.grpc.servicers import MailServicer
 from casmail.taskmanager.grpc.build import mails_pb2_grpc as mail_service
@@ -54,6 +57,10 @@ class GRPCService(service.Service):
         else:
             self.grpc_server.add_insecure_port(_LISTEN_ADDRESS_TEMPLATE % (self.host, self.port))
 
+        # Compile all mail templates, fail fast on a broken one
+        template_util.get_registry().warm()
+        # Mails queued by the servicers are sent by the dispatcher threads
+        outbox.start_dispatcher()
         self.grpc_server.start()
 
         self._wait_forever()
@@ -81,5 +88,8 @@ class GRPCService(service.Service):
             self.grpc_server.stop()
         except Exception as e:
             LOG.info("Failed to stop gRPC server before shutdown. ")
+        outbox.stop_dispatcher(timeout=CONF.mailer.smtp_timeout)
+        smtp_pool.close_pools()
+        LOG.info("Mail template render times: %s", template_util.get_registry().stats())
 
         super(GRPCService, self).stop()
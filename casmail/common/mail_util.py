@@ -3,9 +3,9 @@
 #
 
 
-from jinja2 import Environment, PackageLoader, select_autoescape, TemplateError
 import mailer
 
+from casmail.common import smtp_pool
 from casmail.common import str_util
 
 MAILING = {
@@ -43,11 +43,28 @@ MAILING = {
     }
 }
 
-# Loads confirmation email template from file
-MAIL_ENV = Environment(
-    loader=PackageLoader('casmail', 'templates'),
-    autoescape=select_autoescape(['html', 'xml'])
-)
+def create_message(subject, recipients, html_body, attachments=None,
+                   charset='utf-8', config=None, **kw):
+    """
+    Create an e-mail message sent from the account.
+    :param subject:
+    :param recipients:
+    :param html_body:
+    :param attachments: a list such as
+        [
+            (filename, cid, mimetype, content, charset),
+            (filename, cid, mimetype, content),
+        ]
+    :param charset:
+    :param config:
+    :param kw:
+    :return:
+    """
+    config = config or MAILING['info']
+    return mailer.Message(From=config['usr'], To=recipients,
+                          subject=str(subject), html=html_body,
+                          attachments=attachments,
+                          charset=charset, **kw)
 
 
 def send_mail(subject, recipients, html_body, attachments=None,
@@ -69,13 +86,28 @@ def send_mail(subject, recipients, html_body, attachments=None,
     """
     config = config or MAILING['info']
     try:
-        sender = mailer.Mailer(**config)
-        usr = config['usr']
-        message = mailer.Message(From=usr, To=recipients,
-                                 subject=str(subject), html=html_body,
-                                 attachments=attachments,
-                                 charset=charset, **kw)
-        sender.send(message)
+        message = create_message(subject, recipients, html_body, attachments=attachments,
+                                 charset=charset, config=config, **kw)
+        smtp_pool.get_pool(config).send(message)
+    except BaseException as e:
+        raise Exception(e)
+
+
+def send_many(messages, config=None):
+    """
+    Send many e-mail messages over one SMTP session.
+    :param messages: list of mailer.Message objects or dicts of
+        create_message() arguments
+    :param config:
+    :return:
+    """
+    config = config or MAILING['info']
+    messages = [create_message(config=config, **msg) if isinstance(msg, dict) else msg
+                for msg in messages]
+    if not messages:
+        return
+    try:
+        smtp_pool.get_pool(config).send(messages)
     except BaseException as e:
         raise Exception(e)
 
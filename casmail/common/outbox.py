@@ -0,0 +1,473 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import json
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+
+from oslo_log import log as logging
+
+from casmail.common import cfg
+from casmail.common import mail_util
+from casmail.common import smtp_pool
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+STATUS_PENDING = 'PENDING'
+STATUS_SENDING = 'SENDING'
+STATUS_SENT = 'SENT'
+STATUS_FAILED = 'FAILED'
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS outbox ('
+    ' id TEXT PRIMARY KEY,'
+    ' account TEXT NOT NULL,'
+    ' subject TEXT NOT NULL,'
+    ' recipients TEXT NOT NULL,'
+    ' html_body TEXT NOT NULL,'
+    ' status TEXT NOT NULL,'
+    ' attempts INTEGER NOT NULL DEFAULT 0,'
+    ' last_error TEXT,'
+    ' next_attempt_at REAL NOT NULL,'
+    ' created_at REAL NOT NULL,'
+    ' updated_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS outbox_due'
+    ' ON outbox (account, status, next_attempt_at)',
+    'CREATE TABLE IF NOT EXISTS outbox_slot ('
+    ' account TEXT NOT NULL,'
+    ' slot INTEGER NOT NULL,'
+    ' owner TEXT NOT NULL,'
+    ' expires_at REAL NOT NULL,'
+    ' PRIMARY KEY (account, slot))',
+)
+
+_OUTBOX = None
+_DISPATCHER = None
+_LOCK = threading.Lock()
+
+
+class Outbox(object):
+    """
+    Durable queue of outgoing e-mails stored in a SQLite file.
+
+    A message is PENDING until a dispatcher claims it. A claimed message
+    is SENDING for a lease time, after which it can be claimed again, so
+    messages of a crashed process are not lost. Every process and thread
+    uses its own connection on the same file.
+
+    Deliveries of an account are limited across processes by slots: a
+    dispatcher holds one of the slots of the account while it sends a
+    batch, a slot of a crashed process is free again after its lease time.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        conn = self._connect()
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, account, subject, recipients, html_body):
+        """
+        Store a message to send.
+        :param account: mail account name, a key of MAILING
+        :param subject:
+        :param recipients: an address or a list of addresses
+        :param html_body:
+        :return: id of the message
+        """
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            'INSERT INTO outbox (id, account, subject, recipients, html_body,'
+            ' status, attempts, next_attempt_at, created_at, updated_at)'
+            ' VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)',
+            (message_id, account, str(subject), json.dumps(recipients),
+             html_body, STATUS_PENDING, now, now, now))
+        return message_id
+
+    def enqueue_many(self, account, messages):
+        """
+        Store many messages to send in one transaction.
+        :param account: mail account name, a key of MAILING
+        :param messages: list of (subject, recipients, html_body)
+        :return: ids of the messages
+        """
+        now = time.time()
+        rows = [(uuid.uuid4().hex, account, str(subject), json.dumps(recipients),
+                 html_body, STATUS_PENDING, now, now, now)
+                for subject, recipients, html_body in messages]
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO outbox (id, account, subject, recipients, html_body,'
+                ' status, attempts, next_attempt_at, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [row[0] for row in rows]
+
+    def claim(self, account, limit, lease_time):
+        """
+        Reserve due messages of an account to the caller.
+        :param account:
+        :param limit:
+        :param lease_time: seconds the messages are reserved
+        :return: list of message dicts
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            ids = [row['id'] for row in conn.execute(
+                'SELECT id FROM outbox WHERE account = ? AND status IN (?, ?)'
+                ' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?',
+                (account, STATUS_PENDING, STATUS_SENDING, now, limit))]
+            if not ids:
+                conn.execute('COMMIT')
+                return []
+            marks = ','.join('?' * len(ids))
+            conn.execute(
+                'UPDATE outbox SET status = ?, attempts = attempts + 1,'
+                ' next_attempt_at = ?, updated_at = ? WHERE id IN (%s)' % marks,
+                [STATUS_SENDING, now + lease_time, now] + ids)
+            rows = conn.execute('SELECT * FROM outbox WHERE id IN (%s)' % marks,
+                                ids).fetchall()
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [self._to_dict(row) for row in rows]
+
+    def acquire_slot(self, account, slots, lease_time):
+        """
+        Reserve a delivery slot of an account.
+        :param account:
+        :param slots: number of slots of the account
+        :param lease_time: seconds the slot is reserved
+        :return: owner id to release the slot, None if all slots are taken
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            taken = {row['slot'] for row in conn.execute(
+                'SELECT slot FROM outbox_slot WHERE account = ? AND expires_at > ?',
+                (account, now))}
+            slot = next((i for i in range(slots) if i not in taken), None)
+            owner = None
+            if slot is not None:
+                owner = uuid.uuid4().hex
+                conn.execute(
+                    'INSERT OR REPLACE INTO outbox_slot (account, slot, owner, expires_at)'
+                    ' VALUES (?, ?, ?, ?)', (account, slot, owner, now + lease_time))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return owner
+
+    def release_slot(self, owner):
+        """
+        Release a delivery slot, unless its lease is expired and the slot
+        taken by another dispatcher meanwhile.
+        :param owner: id returned by acquire_slot()
+        :return:
+        """
+        self._connect().execute('DELETE FROM outbox_slot WHERE owner = ?', (owner,))
+
+    def mark_sent(self, message_id):
+        self._update(message_id, STATUS_SENT)
+
+    def mark_failed(self, message_id, error):
+        self._update(message_id, STATUS_FAILED, error=error)
+
+    def mark_retry(self, message_id, error, retry_at):
+        self._update(message_id, STATUS_PENDING, error=error, next_attempt_at=retry_at)
+
+    def _update(self, message_id, status, error=None, next_attempt_at=None):
+        now = time.time()
+        self._connect().execute(
+            'UPDATE outbox SET status = ?, last_error = ?, next_attempt_at = ?,'
+            ' updated_at = ? WHERE id = ?',
+            (status, error, next_attempt_at or now, now, message_id))
+
+    def get(self, message_id):
+        """
+        Get a message.
+        :param message_id:
+        :return: message dict or None
+        """
+        row = self._connect().execute('SELECT * FROM outbox WHERE id = ?',
+                                      (message_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def purge(self, before):
+        """
+        Delete sent and failed messages last updated before a time.
+        :param before: epoch seconds
+        :return: number of messages deleted
+        """
+        cursor = self._connect().execute(
+            'DELETE FROM outbox WHERE status IN (?, ?) AND updated_at < ?',
+            (STATUS_SENT, STATUS_FAILED, before))
+        return cursor.rowcount
+
+    @staticmethod
+    def _to_dict(row):
+        item = dict(row)
+        item['recipients'] = json.loads(item['recipients'])
+        return item
+
+
+def _is_permanent(error):
+    """
+    Check if a SMTP error will not be fixed by retrying.
+    :param error:
+    :return:
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class MailDispatcher(object):
+    """
+    Threads draining the outbox.
+
+    Each mail account has its own threads, so a slow account does not
+    delay the others. A thread sends a batch only while it holds a slot
+    of the account, so the number of concurrent deliveries of an account
+    is limited to workers across all the processes sharing the outbox.
+    Failed deliveries are retried with exponential backoff.
+    """
+
+    def __init__(self, outbox, accounts, workers=2, batch_size=20, poll_interval=5,
+                 max_attempts=8, backoff=30, max_backoff=3600, lease_time=600,
+                 retention=None):
+        self.outbox = outbox
+        self.accounts = list(accounts)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease_time = lease_time
+        self.retention = retention
+        self._events = {account: threading.Event() for account in self.accounts}
+        self._stopped = threading.Event()
+        self._threads = []
+        self._last_purge = 0
+        self._purge_lock = threading.Lock()
+
+    def start(self):
+        for account in self.accounts:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, args=(account,),
+                                          name='mail-dispatcher-%s-%d' % (account, i))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        for event in self._events.values():
+            event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self, account):
+        """
+        Wake up the threads of an account.
+        :param account:
+        :return:
+        """
+        event = self._events.get(account)
+        if event is not None:
+            event.set()
+
+    def _run(self, account):
+        event = self._events[account]
+        while not self._stopped.is_set():
+            event.clear()
+            try:
+                claimed = self.dispatch(account)
+                self._purge()
+            except Exception:
+                LOG.exception('Failed to dispatch mails of account %s', account)
+                claimed = 0
+            if claimed < self.batch_size:
+                event.wait(self.poll_interval)
+
+    def dispatch(self, account):
+        """
+        Send a batch of due messages of an account.
+        :param account:
+        :return: number of messages claimed
+        """
+        owner = self.outbox.acquire_slot(account, self.workers, self.lease_time)
+        if owner is None:
+            return 0
+        try:
+            return self._dispatch(account)
+        finally:
+            self.outbox.release_slot(owner)
+
+    def _dispatch(self, account):
+        rows = self.outbox.claim(account, self.batch_size, self.lease_time)
+        if not rows:
+            return 0
+
+        config = mail_util.MAILING[account]
+        messages = [mail_util.create_message(subject=row['subject'],
+                                             recipients=row['recipients'],
+                                             html_body=row['html_body'],
+                                             config=config)
+                    for row in rows]
+        try:
+            errors = smtp_pool.get_pool(config).send_each(messages)
+        except Exception as e:
+            errors = [e] * len(rows)
+
+        for row, error in zip(rows, errors):
+            if error is None:
+                self.outbox.mark_sent(row['id'])
+            else:
+                self._retry(row, error)
+        return len(rows)
+
+    def _retry(self, row, error):
+        attempts = row['attempts']
+        if attempts >= self.max_attempts or _is_permanent(error):
+            LOG.error('Failed to send mail %s after %d attempts: %s',
+                      row['id'], attempts, error)
+            self.outbox.mark_failed(row['id'], str(error))
+            return
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        LOG.warning('Failed to send mail %s, retrying in %ds: %s',
+                    row['id'], delay, error)
+        self.outbox.mark_retry(row['id'], str(error), time.time() + delay)
+
+    def _purge(self):
+        if not self.retention:
+            return
+        now = time.time()
+        with self._purge_lock:
+            if now - self._last_purge < 3600:
+                return
+            self._last_purge = now
+        count = self.outbox.purge(now - self.retention)
+        if count:
+            LOG.info('Purged %d mails from outbox', count)
+
+
+def get_outbox():
+    """
+    Get the outbox configured by [mailer] outbox_path.
+    :return:
+    """
+    global _OUTBOX
+    if _OUTBOX is None:
+        with _LOCK:
+            if _OUTBOX is None:
+                _OUTBOX = Outbox(CONF.mailer.outbox_path)
+    return _OUTBOX
+
+
+def enqueue(account, subject, recipients, html_body):
+    """
+    Queue an e-mail to send by an account.
+    :param account: mail account name, a key of MAILING
+    :param subject:
+    :param recipients:
+    :param html_body:
+    :return: id of the message
+    """
+    if account not in mail_util.MAILING:
+        raise ValueError('Unknown mail account %s' % account)
+    message_id = get_outbox().enqueue(account, subject, recipients, html_body)
+    if _DISPATCHER is not None:
+        _DISPATCHER.notify(account)
+    return message_id
+
+
+def enqueue_many(account, messages):
+    """
+    Queue many e-mails to send by an account.
+    :param account: mail account name, a key of MAILING
+    :param messages: list of (subject, recipients, html_body)
+    :return: ids of the messages
+    """
+    if account not in mail_util.MAILING:
+        raise ValueError('Unknown mail account %s' % account)
+    message_ids = get_outbox().enqueue_many(account, messages)
+    if message_ids and _DISPATCHER is not None:
+        _DISPATCHER.notify(account)
+    return message_ids
+
+
+def get_status(message_id):
+    """
+    Get delivery state of a message.
+    :param message_id:
+    :return: message dict or None
+    """
+    return get_outbox().get(message_id)
+
+
+def start_dispatcher():
+    """
+    Start draining the outbox in this process.
+    :return:
+    """
+    global _DISPATCHER
+    outbox = get_outbox()
+    opts = CONF.mailer
+    with _LOCK:
+        if _DISPATCHER is None:
+            _DISPATCHER = MailDispatcher(outbox, mail_util.MAILING.keys(),
+                                         workers=opts.outbox_workers_per_account,
+                                         batch_size=opts.outbox_batch_size,
+                                         poll_interval=opts.outbox_poll_interval,
+                                         max_attempts=opts.outbox_max_attempts,
+                                         backoff=opts.outbox_retry_backoff,
+                                         max_backoff=opts.outbox_max_retry_backoff,
+                                         lease_time=opts.outbox_lease_time,
+                                         retention=opts.outbox_retention)
+            _DISPATCHER.start()
+        return _DISPATCHER
+
+
+def stop_dispatcher(timeout=None):
+    global _DISPATCHER
+    with _LOCK:
+        dispatcher, _DISPATCHER = _DISPATCHER, None
+    if dispatcher is not None:
+        dispatcher.stop(timeout)
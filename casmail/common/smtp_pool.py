@@ -0,0 +1,254 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import contextlib
+import smtplib
+import threading
+import time
+
+from oslo_log import log as logging
+
+from casmail.common import cfg
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+# Reply code of a server closing the transmission channel
+SMTP_SERVICE_NOT_AVAILABLE = 421
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _as_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+class SMTPConnection(object):
+    """
+    An authenticated SMTP session of a mail account.
+    """
+
+    def __init__(self, config, timeout=None):
+        self.config = config
+        self.timeout = timeout
+        self.server = None
+        self.sent = 0
+        self.last_used = 0
+
+    @property
+    def connected(self):
+        return self.server is not None
+
+    def open(self):
+        config = self.config
+        if config.get('use_ssl'):
+            server = smtplib.SMTP_SSL(config['host'], config['port'], timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(config['host'], config['port'], timeout=self.timeout)
+
+        usr, pwd = config.get('usr'), config.get('pwd')
+        if usr and pwd:
+            if config.get('use_tls'):
+                server.ehlo()
+                server.starttls()
+                server.ehlo()
+            server.login(usr, pwd)
+
+        self.server = server
+        self.sent = 0
+        self.last_used = time.time()
+
+    def close(self):
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def is_alive(self):
+        """
+        Check the session with a NOOP command.
+        :return:
+        """
+        if self.server is None:
+            return False
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, message):
+        """
+        Send a mailer.Message over the session.
+        :param message:
+        :return:
+        """
+        recipients = _as_list(message.To) + _as_list(message.CC) + _as_list(message.BCC)
+        self.server.sendmail(message.From, recipients, message.as_string())
+        self.sent += 1
+        self.last_used = time.time()
+
+
+class SMTPConnectionPool(object):
+    """
+    Pool of SMTP sessions of one mail account.
+
+    Idle sessions are checked with NOOP before reuse, sessions are
+    recycled after sending max_messages and re-opened when the server
+    replies 421 or drops the connection.
+    """
+
+    def __init__(self, config, max_size=4, max_messages=100, keepalive=30,
+                 idle_timeout=300, timeout=30):
+        self.config = config
+        self.max_size = max_size
+        self.max_messages = max_messages
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                self._cond.wait()
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = SMTPConnection(self.config, timeout=self.timeout)
+                self._size += 1
+
+        try:
+            idle_time = time.time() - conn.last_used
+            if conn.connected and idle_time > self.idle_timeout:
+                conn.close()
+            elif conn.connected and idle_time > self.keepalive and not conn.is_alive():
+                conn.close()
+            if not conn.connected:
+                conn.open()
+        except BaseException:
+            self._discard(conn)
+            raise
+        return conn
+
+    def _release(self, conn):
+        if self.max_messages and conn.sent >= self.max_messages:
+            conn.close()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        conn.close()
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            self._discard(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def send(self, messages):
+        """
+        Send one or many messages over a single session.
+        :param messages: a mailer.Message or a list of them
+        :return:
+        """
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        with self.connection() as conn:
+            for message in messages:
+                self._send_one(conn, message)
+
+    def send_each(self, messages):
+        """
+        Send messages over a single session, a failed message does not
+        stop the others.
+        :param messages: list of mailer.Message objects
+        :return: list of the SMTP errors, None for each message sent
+        """
+        errors = []
+        with self.connection() as conn:
+            for message in messages:
+                try:
+                    if not conn.connected:
+                        conn.open()
+                    self._send_one(conn, message)
+                    errors.append(None)
+                except (smtplib.SMTPException, OSError) as e:
+                    if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                        conn.close()
+                    errors.append(e)
+        return errors
+
+    def _send_one(self, conn, message):
+        try:
+            conn.send(message)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException) as e:
+            if isinstance(e, smtplib.SMTPResponseException) and \
+                    e.smtp_code != SMTP_SERVICE_NOT_AVAILABLE:
+                raise
+            LOG.info('SMTP session to %s closed by server, reconnecting: %s',
+                     self.config['host'], e)
+            conn.close()
+            conn.open()
+            conn.send(message)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+def get_pool(config):
+    """
+    Get the connection pool of a mail account.
+    :param config: account config, e.g. MAILING['info']
+    :return:
+    """
+    key = (config['host'], config['port'], config.get('usr'))
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                opts = CONF.mailer
+                pool = _POOLS[key] = SMTPConnectionPool(
+                    config,
+                    max_size=opts.smtp_pool_size,
+                    max_messages=opts.smtp_max_messages_per_connection,
+                    keepalive=opts.smtp_keepalive_interval,
+                    idle_timeout=opts.smtp_idle_timeout,
+                    timeout=opts.smtp_timeout)
+    return pool
+
+
+def close_pools():
+    """
+    Close all idle SMTP sessions.
+    :return:
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,150 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+
+import bisect
+import os
+import threading
+import time
+
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader, select_autoescape
+from oslo_log import log as logging
+
+from casmail.common import cfg
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+# Upper bounds (in milliseconds) of the render time histogram buckets
+RENDER_TIME_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_REGISTRY = None
+_LOCK = threading.Lock()
+
+
+class RenderHistogram(object):
+    """
+    Render time histogram of a template.
+    """
+
+    def __init__(self, buckets=RENDER_TIME_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def to_dict(self):
+        buckets = {'le_%s' % b: c for b, c in zip(self.buckets, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max, 3),
+            'buckets': buckets,
+        }
+
+
+class TemplateRegistry(object):
+    """
+    Compiled mail templates.
+
+    Every template is compiled once by warm() and kept for the process
+    lifetime. Compiled bytecode is stored in cache_dir so that other
+    workers and restarts skip the compilation. With auto_reload off the
+    template files are not checked on each render.
+    """
+
+    def __init__(self, package='casmail', path='templates', cache_dir=None,
+                 auto_reload=False):
+        bytecode_cache = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        self.env = Environment(
+            loader=PackageLoader(package, path),
+            autoescape=select_autoescape(['html', 'xml']),
+            bytecode_cache=bytecode_cache,
+            auto_reload=auto_reload,
+            cache_size=-1,
+        )
+        self.auto_reload = auto_reload
+        self._templates = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """
+        Compile all templates, a broken template raises TemplateError.
+        :return: names of the templates
+        """
+        names = self.env.list_templates(extensions=['html', 'txt'])
+        for name in names:
+            self._templates[name] = self.env.get_template(name)
+        LOG.info('Loaded %d mail templates', len(names))
+        return names
+
+    def get_template(self, name):
+        if self.auto_reload:
+            return self.env.get_template(name)
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.env.get_template(name)
+        return template
+
+    def render(self, name, **context):
+        """
+        Render a template and record the render time.
+        :param name:
+        :param context:
+        :return:
+        """
+        template = self.get_template(name)
+        start = time.time()
+        result = template.render(**context)
+        ms = (time.time() - start) * 1000
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RenderHistogram()
+            histogram.observe(ms)
+        return result
+
+    def stats(self):
+        """
+        Get render time histograms by template name.
+        :return:
+        """
+        with self._lock:
+            return {name: h.to_dict() for name, h in self._histograms.items()}
+
+
+def get_registry():
+    """
+    Get the mail template registry.
+    :return:
+    """
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = TemplateRegistry(
+                    cache_dir=CONF.mailer.template_cache_dir,
+                    auto_reload=CONF.mailer.template_auto_reload)
+    return _REGISTRY
+
+
+def render(name, **context):
+    """
+    Render a mail template.
+    :param name:
+    :param context:
+    :return:
+    """
+    return get_registry().render(name, **context)
@@ -17,13 +17,26 @@ from casmail.common.grpc import credentials
 CONF = cfg.CONF
 
 
+# Accept the keepalive pings of idle pooled client channels (see
+# casauth.grpc.CHANNEL_OPTIONS), the default policy answers pings of idle channels or
+# more often than every 5 minutes with GOAWAY too_many_pings
+SERVER_OPTIONS = (
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_ping_interval_without_data_ms', 20000),
+    ('grpc.http2.max_ping_strikes', 0),
+)
+
+
 def get_server(interceptors=None, options=None, workers=4):
     """
     Create a gRPC server
+    :param options: channel args, overriding SERVER_OPTIONS
     :return:
     """
+    server_options = dict(SERVER_OPTIONS)
+    server_options.update(options or ())
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers),
-                         interceptors=interceptors, options=options)
+                         interceptors=interceptors, options=list(server_options.items()))
 
     return server
 
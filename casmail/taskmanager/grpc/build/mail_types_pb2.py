@@ -19,7 +19,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   syntax='proto3',
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
-  serialized_pb=b'\n\x10mail_types.proto\x12\x05mails\"\x1b\n\tMailReply\x12\x0e\n\x06status\x18\x01 \x01(\x08\"=\n\x11\x41\x63tiveUserRequest\x12\x19\n\x04user\x18\x01 \x01(\x0b\x32\x0b.mails.User\x12\r\n\x05token\x18\x02 \x01(\t\";\n\x04User\x12\x11\n\tuser_name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x11\n\tfull_name\x18\x03 \x01(\t\"\x19\n\x06SSHKey\x12\x0f\n\x07\x63ontent\x18\x01 \x01(\x0c\"\x8a\x01\n\x07\x43ompute\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x11\n\tuser_name\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\x12\x11\n\tpublic_ip\x18\x04 \x01(\t\x12\x10\n\x08ssh_port\x18\x05 \x01(\x05\x12\x0b\n\x03\x63pu\x18\x06 \x01(\x05\x12\x0b\n\x03ram\x18\x07 \x01(\x05\x12\x0c\n\x04\x64isk\x18\x08 \x01(\x05\"\x80\x01\n\x07Keypair\x12\x11\n\tuser_name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12!\n\npublic_key\x18\x04 \x01(\x0b\x32\r.mails.SSHKey\x12\"\n\x0bprivate_key\x18\x05 \x01(\x0b\x32\r.mails.SSHKey\"o\n\x06Users3\x12\x0c\n\x04user\x18\x01 \x01(\t\x12\x0b\n\x03uid\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\x12\x14\n\x0c\x64isplay_name\x18\x04 \x01(\t\x12\r\n\x05\x65mail\x18\x05 \x01(\t\x12\x13\n\x0bmax_size_kb\x18\x06 \x01(\tb\x06proto3'
+  serialized_pb=b'\n\x10mail_types.proto\x12\x05mails\"/\n\tMailReply\x12\x0e\n\x06status\x18\x01 \x01(\x08\x12\x12\n\nmessage_id\x18\x02 \x01(\t\"0\n\x0bMailReplies\x12!\n\x07replies\x18\x01 \x03(\x0b\x32\x10.mails.MailReply\"\'\n\x11MailStatusRequest\x12\x12\n\nmessage_id\x18\x01 \x01(\t\"~\n\nMailStatus\x12\x12\n\nmessage_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x10\n\x08\x61ttempts\x18\x03 \x01(\x05\x12\x12\n\nlast_error\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\x01\x12\x12\n\nupdated_at\x18\x06 \x01(\x01\"=\n\x11\x41\x63tiveUserRequest\x12\x19\n\x04user\x18\x01 \x01(\x0b\x32\x0b.mails.User\x12\r\n\x05token\x18\x02 \x01(\t\";\n\x04User\x12\x11\n\tuser_name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x11\n\tfull_name\x18\x03 \x01(\t\"\x19\n\x06SSHKey\x12\x0f\n\x07\x63ontent\x18\x01 \x01(\x0c\"\x8a\x01\n\x07\x43ompute\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x11\n\tuser_name\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\x12\x11\n\tpublic_ip\x18\x04 \x01(\t\x12\x10\n\x08ssh_port\x18\x05 \x01(\x05\x12\x0b\n\x03\x63pu\x18\x06 \x01(\x05\x12\x0b\n\x03ram\x18\x07 \x01(\x05\x12\x0c\n\x04\x64isk\x18\x08 \x01(\x05\"\x80\x01\n\x07Keypair\x12\x11\n\tuser_name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12!\n\npublic_key\x18\x04 \x01(\x0b\x32\r.mails.SSHKey\x12\"\n\x0bprivate_key\x18\x05 \x01(\x0b\x32\r.mails.SSHKey\"o\n\x06Users3\x12\x0c\n\x04user\x18\x01 \x01(\t\x12\x0b\n\x03uid\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\x12\x14\n\x0c\x64isplay_name\x18\x04 \x01(\t\x12\r\n\x05\x65mail\x18\x05 \x01(\t\x12\x13\n\x0bmax_size_kb\x18\x06 \x01(\tb\x06proto3'
 )
 
 
@@ -40,6 +40,13 @@ _MAILREPLY = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='message_id', full_name='mails.MailReply.message_id', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
   ],
   extensions=[
   ],
@@ -53,7 +60,138 @@ _MAILREPLY = _descriptor.Descriptor(
   oneofs=[
   ],
   serialized_start=27,
-  serialized_end=54,
+  serialized_end=74,
+)
+
+
+_MAILREPLIES = _descriptor.Descriptor(
+  name='MailReplies',
+  full_name='mails.MailReplies',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='replies', full_name='mails.MailReplies.replies', index=0,
+      number=1, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=76,
+  serialized_end=124,
+)
+
+
+_MAILSTATUSREQUEST = _descriptor.Descriptor(
+  name='MailStatusRequest',
+  full_name='mails.MailStatusRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='message_id', full_name='mails.MailStatusRequest.message_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=126,
+  serialized_end=165,
+)
+
+
+_MAILSTATUS = _descriptor.Descriptor(
+  name='MailStatus',
+  full_name='mails.MailStatus',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='message_id', full_name='mails.MailStatus.message_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='status', full_name='mails.MailStatus.status', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='attempts', full_name='mails.MailStatus.attempts', index=2,
+      number=3, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='last_error', full_name='mails.MailStatus.last_error', index=3,
+      number=4, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='created_at', full_name='mails.MailStatus.created_at', index=4,
+      number=5, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='updated_at', full_name='mails.MailStatus.updated_at', index=5,
+      number=6, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=167,
+  serialized_end=293,
 )
 
 
@@ -91,8 +229,8 @@ _ACTIVEUSERREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=56,
-  serialized_end=117,
+  serialized_start=295,
+  serialized_end=356,
 )
 
 
@@ -137,8 +275,8 @@ _USER = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=119,
-  serialized_end=178,
+  serialized_start=358,
+  serialized_end=417,
 )
 
 
@@ -169,8 +307,8 @@ _SSHKEY = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=180,
-  serialized_end=205,
+  serialized_start=419,
+  serialized_end=444,
 )
 
 
@@ -250,8 +388,8 @@ _COMPUTE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=208,
-  serialized_end=346,
+  serialized_start=447,
+  serialized_end=585,
 )
 
 
@@ -310,8 +448,8 @@ _KEYPAIR = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=349,
-  serialized_end=477,
+  serialized_start=588,
+  serialized_end=716,
 )
 
 
@@ -377,14 +515,18 @@ _USERS3 = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=479,
-  serialized_end=590,
+  serialized_start=718,
+  serialized_end=829,
 )
 
+_MAILREPLIES.fields_by_name['replies'].message_type = _MAILREPLY
 _ACTIVEUSERREQUEST.fields_by_name['user'].message_type = _USER
 _KEYPAIR.fields_by_name['public_key'].message_type = _SSHKEY
 _KEYPAIR.fields_by_name['private_key'].message_type = _SSHKEY
 DESCRIPTOR.message_types_by_name['MailReply'] = _MAILREPLY
+DESCRIPTOR.message_types_by_name['MailReplies'] = _MAILREPLIES
+DESCRIPTOR.message_types_by_name['MailStatusRequest'] = _MAILSTATUSREQUEST
+DESCRIPTOR.message_types_by_name['MailStatus'] = _MAILSTATUS
 DESCRIPTOR.message_types_by_name['ActiveUserRequest'] = _ACTIVEUSERREQUEST
 DESCRIPTOR.message_types_by_name['User'] = _USER
 DESCRIPTOR.message_types_by_name['SSHKey'] = _SSHKEY
@@ -400,6 +542,27 @@ MailReply = _reflection.GeneratedProtocolMessageType('MailReply', (_message.Mess
   })
 _sym_db.RegisterMessage(MailReply)
 
+MailReplies = _reflection.GeneratedProtocolMessageType('MailReplies', (_message.Message,), {
+  'DESCRIPTOR' : _MAILREPLIES,
+  '__module__' : 'mail_types_pb2'
+  # @@protoc_insertion_point(class_scope:mails.MailReplies)
+  })
+_sym_db.RegisterMessage(MailReplies)
+
+MailStatusRequest = _reflection.GeneratedProtocolMessageType('MailStatusRequest', (_message.Message,), {
+  'DESCRIPTOR' : _MAILSTATUSREQUEST,
+  '__module__' : 'mail_types_pb2'
+  # @@protoc_insertion_point(class_scope:mails.MailStatusRequest)
+  })
+_sym_db.RegisterMessage(MailStatusRequest)
+
+MailStatus = _reflection.GeneratedProtocolMessageType('MailStatus', (_message.Message,), {
+  'DESCRIPTOR' : _MAILSTATUS,
+  '__module__' : 'mail_types_pb2'
+  # @@protoc_insertion_point(class_scope:mails.MailStatus)
+  })
+_sym_db.RegisterMessage(MailStatus)
+
 ActiveUserRequest = _reflection.GeneratedProtocolMessageType('ActiveUserRequest', (_message.Message,), {
   'DESCRIPTOR' : _ACTIVEUSERREQUEST,
   '__module__' : 'mail_types_pb2'
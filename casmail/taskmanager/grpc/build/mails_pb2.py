@@ -20,7 +20,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   syntax='proto3',
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
-  serialized_pb=b'\n\x0bmails.proto\x12\x05mails\x1a\x10mail_types.proto2\x95\x02\n\x0bMailService\x12\x39\n\x0b\x61\x63tive_user\x12\x18.mails.ActiveUserRequest\x1a\x10.mails.MailReply\x12/\n\x0ereset_password\x12\x0b.mails.User\x1a\x10.mails.MailReply\x12\x32\n\x0csend_keypair\x12\x0e.mails.Keypair\x1a\x10.mails.MailReply(\x01\x12\x35\n\x11send_compute_info\x12\x0e.mails.Compute\x1a\x10.mails.MailReply\x12/\n\x0csend_user_s3\x12\r.mails.Users3\x1a\x10.mails.MailReplyb\x06proto3'
+  serialized_pb=b'\n\x0bmails.proto\x12\x05mails\x1a\x10mail_types.proto2\x95\x03\n\x0bMailService\x12\x39\n\x0b\x61\x63tive_user\x12\x18.mails.ActiveUserRequest\x1a\x10.mails.MailReply\x12/\n\x0ereset_password\x12\x0b.mails.User\x1a\x10.mails.MailReply\x12\x32\n\x0csend_keypair\x12\x0e.mails.Keypair\x1a\x10.mails.MailReply(\x01\x12\x35\n\x11send_compute_info\x12\x0e.mails.Compute\x1a\x10.mails.MailReply\x12/\n\x0csend_user_s3\x12\r.mails.Users3\x1a\x10.mails.MailReply\x12>\n\x0fget_mail_status\x12\x18.mails.MailStatusRequest\x1a\x11.mails.MailStatus\x12>\n\x0c\x61\x63tive_users\x12\x18.mails.ActiveUserRequest\x1a\x12.mails.MailReplies(\x01\x62\x06proto3'
   ,
   dependencies=[mail__types__pb2.DESCRIPTOR,])
 
@@ -38,7 +38,7 @@ _MAILSERVICE = _descriptor.ServiceDescriptor(
   serialized_options=None,
   create_key=_descriptor._internal_create_key,
   serialized_start=41,
-  serialized_end=318,
+  serialized_end=446,
   methods=[
   _descriptor.MethodDescriptor(
     name='active_user',
@@ -90,6 +90,26 @@ _MAILSERVICE = _descriptor.ServiceDescriptor(
     serialized_options=None,
     create_key=_descriptor._internal_create_key,
   ),
+  _descriptor.MethodDescriptor(
+    name='get_mail_status',
+    full_name='mails.MailService.get_mail_status',
+    index=5,
+    containing_service=None,
+    input_type=mail__types__pb2._MAILSTATUSREQUEST,
+    output_type=mail__types__pb2._MAILSTATUS,
+    serialized_options=None,
+    create_key=_descriptor._internal_create_key,
+  ),
+  _descriptor.MethodDescriptor(
+    name='active_users',
+    full_name='mails.MailService.active_users',
+    index=6,
+    containing_service=None,
+    input_type=mail__types__pb2._ACTIVEUSERREQUEST,
+    output_type=mail__types__pb2._MAILREPLIES,
+    serialized_options=None,
+    create_key=_descriptor._internal_create_key,
+  ),
 ])
 _sym_db.RegisterServiceDescriptor(_MAILSERVICE)
 
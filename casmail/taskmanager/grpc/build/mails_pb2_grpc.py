@@ -39,6 +39,16 @@ class MailServiceStub(object):
                 request_serializer=mail__types__pb2.Users3.SerializeToString,
                 response_deserializer=mail__types__pb2.MailReply.FromString,
                 )
+        self.get_mail_status = channel.unary_unary(
+                '/mails.MailService/get_mail_status',
+                request_serializer=mail__types__pb2.MailStatusRequest.SerializeToString,
+                response_deserializer=mail__types__pb2.MailStatus.FromString,
+                )
+        self.active_users = channel.stream_unary(
+                '/mails.MailService/active_users',
+                request_serializer=mail__types__pb2.ActiveUserRequest.SerializeToString,
+                response_deserializer=mail__types__pb2.MailReplies.FromString,
+                )
 
 
 class MailServiceServicer(object):
@@ -74,6 +84,18 @@ class MailServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def get_mail_status(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def active_users(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MailServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -102,6 +124,16 @@ def add_MailServiceServicer_to_server(servicer, server):
                     request_deserializer=mail__types__pb2.Users3.FromString,
                     response_serializer=mail__types__pb2.MailReply.SerializeToString,
             ),
+            'get_mail_status': grpc.unary_unary_rpc_method_handler(
+                    servicer.get_mail_status,
+                    request_deserializer=mail__types__pb2.MailStatusRequest.FromString,
+                    response_serializer=mail__types__pb2.MailStatus.SerializeToString,
+            ),
+            'active_users': grpc.stream_unary_rpc_method_handler(
+                    servicer.active_users,
+                    request_deserializer=mail__types__pb2.ActiveUserRequest.FromString,
+                    response_serializer=mail__types__pb2.MailReplies.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'mails.MailService', rpc_method_handlers)
@@ -196,3 +228,37 @@ class MailService(object):
             mail__types__pb2.MailReply.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def get_mail_status(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/mails.MailService/get_mail_status',
+            mail__types__pb2.MailStatusRequest.SerializeToString,
+            mail__types__pb2.MailStatus.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def active_users(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/mails.MailService/active_users',
+            mail__types__pb2.ActiveUserRequest.SerializeToString,
+            mail__types__pb2.MailReplies.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -3,8 +3,9 @@ import grpc
 from jinja2 import TemplateError
 from grpc_health.v1 import health_pb2
 
-from casmail.common import mail_util
+from casmail.common import outbox
 from casmail.common import str_util
+from casmail.common import template_util
 from casmail.common.cfg import CONF
 from casmail.common.i18n import _
 from casmail.taskmanager.grpc.build import mail_types_pb2 as mail_message
@@ -16,41 +17,41 @@ class MailServicer(mail_service.MailServiceServicer):
     def active_user(self, request, context):
         user = request.user
         token = request.token
-        template = mail_util.MAIL_ENV.get_template('user_activation.html')
         try:
             active_url = '{}/activate?token={}'.format(CONF.api_path.auth, token)
-            body = template.render(user=user, token=token, active_url=active_url)
+            body = template_util.render('user_activation.html', user=user, token=token, active_url=active_url)
         except TemplateError as err:
             context.set_details("An error occurred when preparing the activation mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             return
         try:
-            mail_util.send_mail_service(subject=_('Account Activation'), recipients=user.email, html_body=body)
-            reply = mail_message.MailReply(status=True)
+            message_id = outbox.enqueue('service', subject=_('Account Activation'),
+                                        recipients=user.email, html_body=body)
+            reply = mail_message.MailReply(status=True, message_id=message_id)
             return reply
         except:
-            context.set_details("An error occurred when sending the activation mail.")
+            context.set_details("An error occurred when queuing the activation mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             reply = mail_message.MailReply(status=False)
             return reply
 
     def reset_password(self, request, context):
         expiration = 0
-        user = request.user
+        user = request
         token = str_util.jwt_encode_token(data=user.user_name, expires_in=expiration)
-        template = mail_util.MAIL_ENV.get('user_reset_password.html')
         try:
-            body = template.render(user=user, token=token)
+            body = template_util.render('user_reset_password.html', user=user, token=token)
         except TemplateError as err:
             context.set_details("An error occurred when preparing the reset mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             return
         try:
-            mail_util.send_mail_support(subject=_('Account Password Reset'), recipients=user.email, html_body=body)
-            reply = mail_message.MailReply(status=True)
+            message_id = outbox.enqueue('support', subject=_('Account Password Reset'),
+                                        recipients=user.email, html_body=body)
+            reply = mail_message.MailReply(status=True, message_id=message_id)
             return reply
         except:
-            context.set_details("An error occurred when sending the reset mail.")
+            context.set_details("An error occurred when queuing the reset mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             reply = mail_message.MailReply(status=False)
             return reply
@@ -66,20 +67,20 @@ class MailServicer(mail_service.MailServiceServicer):
             'ram': request.ram,
             'disk': request.disk,
         }
-        template = mail_util.MAIL_ENV.get_template('compute_info.html')
 
         try:
-            body = template.render(compute=compute)
+            body = template_util.render('compute_info.html', compute=compute)
         except TemplateError as err:
             context.set_details("An error occurred when preparing the confirmation mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             return
         try:
-            mail_util.send_mail_service(subject=_('Compute Information'), recipients=CONF.admin_mail_address, html_body=body)
-            reply = mail_message.MailReply(status=True)
+            message_id = outbox.enqueue('service', subject=_('Compute Information'),
+                                        recipients=CONF.admin_mail_address, html_body=body)
+            reply = mail_message.MailReply(status=True, message_id=message_id)
             return reply
         except:
-            context.set_details("An error occurred when sending the confirmation mail.")
+            context.set_details("An error occurred when queuing the confirmation mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             reply = mail_message.MailReply(status=False)
             return reply
@@ -91,19 +92,55 @@ class MailServicer(mail_service.MailServiceServicer):
         display_name = request.display_name
         email = request.email
         max_size_kb = request.max_size_kb
-        template = mail_util.MAIL_ENV.get_template('user_s3.html')
         try:
-            body = template.render(user = user, uid = uid, password = password, display_name=display_name, email = email, max_size_kb = max_size_kb )
+            body = template_util.render('user_s3.html', user = user, uid = uid, password = password, display_name=display_name, email = email, max_size_kb = max_size_kb )
         except TemplateError as err:
             context.set_details("An error occurred when preparing the full storage issue mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             return
         try:
-            mail_util.send_mail_service(subject=_('Khởi tạo tài khoản s3 storage thành công'), recipients=email, html_body=body)
-            reply = mail_message.MailReply(status=True)
+            message_id = outbox.enqueue('service', subject=_('Khởi tạo tài khoản s3 storage thành công'),
+                                        recipients=email, html_body=body)
+            reply = mail_message.MailReply(status=True, message_id=message_id)
             return reply
         except:
-            context.set_details("An error occurred when sending the full storage issue mail.")
+            context.set_details("An error occurred when queuing the full storage issue mail.")
             context.set_code(grpc.StatusCode.INTERNAL)
             reply = mail_message.MailReply(status=False)
             return reply
+
+    def active_users(self, request_iterator, context):
+        messages = []
+        try:
+            for request in request_iterator:
+                user = request.user
+                active_url = '{}/activate?token={}'.format(CONF.api_path.auth, request.token)
+                body = template_util.render('user_activation.html', user=user, token=request.token,
+                                            active_url=active_url)
+                messages.append((_('Account Activation'), user.email, body))
+        except TemplateError as err:
+            context.set_details("An error occurred when preparing the activation mails.")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return mail_message.MailReplies()
+        try:
+            message_ids = outbox.enqueue_many('service', messages)
+            replies = [mail_message.MailReply(status=True, message_id=message_id)
+                       for message_id in message_ids]
+            return mail_message.MailReplies(replies=replies)
+        except:
+            context.set_details("An error occurred when queuing the activation mails.")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return mail_message.MailReplies()
+
+    def get_mail_status(self, request, context):
+        message = outbox.get_status(request.message_id)
+        if message is None:
+            context.set_details("Mail {} not found.".format(request.message_id))
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return mail_message.MailStatus()
+        return mail_message.MailStatus(message_id=message['id'],
+                                       status=message['status'],
+                                       attempts=message['attempts'],
+                                       last_error=message['last_error'] or '',
+                                       created_at=message['created_at'],
+                                       updated_at=message['updated_at'])
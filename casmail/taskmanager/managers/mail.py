@@ -6,6 +6,7 @@ from jinja2 import TemplateError
 
 from casmail.common import mail_util
 from casmail.common import cfg
+from casmail.common import template_util
 from casmail.common.i18n import _
 from casmail.taskmanager.managers import base
 
@@ -26,10 +27,9 @@ class MailManager(base.BaseManager):
         LOG.error("dsdsadsdsdasad")
 
     def active_user(self, ctx, user, token):
-        template = mail_util.MAIL_ENV.get_template('user_activation.html')
         try:
             active_url = '{}/activate?token={}'.format(CONF.api_path.auth, token)
-            body = template.render(user=user['email'], active_url=active_url)
+            body = template_util.render('user_activation.html', user=user['email'], active_url=active_url)
         except TemplateError as err:
             LOG.error("Error [active_user(%s, %s): %s", user, token, err)
             return self.fail("An error occurred when sending the activation mail.")
@@ -42,9 +42,8 @@ class MailManager(base.BaseManager):
             return self.fail("An error occurred when sending the activation mail.")
 
     def reset_password(self, ctx, user, token):
-        template = mail_util.MAIL_ENV.get('user_reset_password.html')
         try:
-            body = template.render(user=user['email'], token=token)
+            body = template_util.render('user_reset_password.html', user=user['email'], token=token)
         except TemplateError as err:
             LOG.error("Error [reset_password(%s, %s): %s", user, token, err)
             return self.fail("An error occurred when preparing the reset mail.")
@@ -57,10 +56,9 @@ class MailManager(base.BaseManager):
             return self.fail("An error occurred when preparing the reset mail.")
 
     def send_compute_info(self, ctx, user, compute):
-        template = mail_util.MAIL_ENV.get_template('compute_info.html')
 
         try:
-            body = template.render(user=user['email'], compute=compute)
+            body = template_util.render('compute_info.html', user=user['email'], compute=compute)
         except TemplateError as err:
             LOG.error("Error [send_compute_info(%s, %s): %s", user, compute, err)
             return self.fail("An error occurred when preparing the confirmation mail.")
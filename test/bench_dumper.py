@@ -0,0 +1,89 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+# Compare the compiled model dumper with the former recursive dump_value()
+# on a page of transient User objects, no database is needed.
+#
+#   python test/bench_dumper.py [rows] [rounds]
+#
+import datetime
+import enum
+import sys
+import timeit
+
+from casauth.common import data_utils
+from casauth.db import models as md
+from casauth.db import types as md_type
+
+
+def legacy_dump(value, fields=None, extra_fields=None, is_admin=False):
+    """
+    The recursive walk used by dump_value() before dumpers were compiled.
+    """
+    if not value:
+        return value
+
+    if isinstance(value, (md.DatabaseModel, dict, list, tuple)):
+        if isinstance(value, md.DatabaseModel):
+            dump_data = {}
+            if fields is None:
+                fields = value.__class__.__admin_fields__ if is_admin else value.__class__.__user_fields__
+            if extra_fields is None:
+                extra_fields = []
+            for attr in fields:
+                dump_data[attr] = legacy_dump(value.get_attr(attr, None),
+                                              extra_fields=extra_fields, is_admin=is_admin)
+            for attr in extra_fields:
+                if hasattr(value, attr):
+                    ex_fields = [f for f in extra_fields if f != attr]
+                    dump_data[attr] = legacy_dump(value.get_attr(attr),
+                                                  extra_fields=ex_fields, is_admin=is_admin)
+        elif isinstance(value, dict):
+            dump_data = {}
+            for key, item in value.items():
+                if fields is None or key in fields:
+                    dump_data[key] = legacy_dump(item, extra_fields=extra_fields, is_admin=is_admin)
+        else:
+            dump_data = [legacy_dump(item, extra_fields=extra_fields, is_admin=is_admin)
+                         for item in value]
+    elif isinstance(value, enum.Enum):
+        dump_data = value.value
+    else:
+        dump_data = value
+    return dump_data
+
+
+def make_users(count):
+    now = datetime.datetime.utcnow()
+    users = []
+    for i in range(count):
+        profile = md.UserProfile(id=i, full_name='User %d' % i, phone_num='0900000%03d' % (i % 1000),
+                                 gender=md_type.UserGender.OTHER, created_at=now, updated_at=now)
+        user = md.User(id=i, user_name='user%d' % i, email='user%d@example.com' % i,
+                       role=md_type.UserRole.USER, status=md_type.UserStatus.ACTIVE,
+                       user_type=md_type.UserType.PERSONAL, account_type=md_type.AccountType.EU,
+                       level=0, is_active=True, data={'tags': ['a', 'b'], 'n': i},
+                       last_login=now, deleted=False, created_at=now, updated_at=now)
+        user.profile = profile
+        users.append(user)
+    return users
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    users = make_users(rows)
+
+    for is_admin in (False, True):
+        dump = data_utils.get_dumper(md.User, is_admin=is_admin)
+        assert [dump(u) for u in users] == [legacy_dump(u, is_admin=is_admin) for u in users]
+
+        legacy = timeit.timeit(lambda: [legacy_dump(u, is_admin=is_admin) for u in users],
+                               number=rounds) / rounds
+        compiled = timeit.timeit(lambda: [dump(u) for u in users], number=rounds) / rounds
+        print('is_admin={}: {} rows, legacy {:.2f} ms, compiled {:.2f} ms, {:.1f}x'.format(
+            is_admin, rows, legacy * 1000, compiled * 1000, legacy / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+# Compare the per-message cost of the RPC secure serializer: the former
+# version 1 code re-deriving the key on each message, version 1 with the
+# derived key kept, and version 2 (AES-GCM).
+#
+#   python test/bench_serializer.py [messages] [rounds]
+#
+import sys
+import timeit
+
+from oslo_serialization import jsonutils
+
+from casauth.common import crypto_utils as cu
+from casauth.common.rpc import secure_serializer as ssr
+
+KEY = 'bzH6y0SGmjuoY0FNSTptrhgieGXNDX6PIhvz'
+
+
+def legacy_serialize(entity, key):
+    """
+    SecureSerializer._serialize_entity() before keys were kept.
+    """
+    return cu.encode_data(cu.encrypt_data(jsonutils.dumps(entity), key))
+
+
+def legacy_deserialize(entity, key):
+    return jsonutils.loads(cu.decrypt_data(cu.decode_data(entity), key))
+
+
+def make_messages(count):
+    return [{
+        'project_name': 'project-%d' % i,
+        'user_name': 'user%d@example.com' % i,
+        'data': {'quota': {'cores': 20, 'ram': 51200, 'instances': 10}, 'tags': ['a', 'b']},
+    } for i in range(count)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    messages = make_messages(count)
+
+    cases = [('legacy v1', lambda m: legacy_serialize(m, KEY),
+              lambda e: legacy_deserialize(e, KEY))]
+    for version in (1, 2):
+        serializer = ssr.SecureSerializer(None, KEY, version=version)
+        cases.append(('v%d' % version,
+                      lambda m, s=serializer: s._serialize_entity(None, m),
+                      lambda e, s=serializer: s._deserialize_entity(None, e)))
+
+    reader = ssr.SecureSerializer(None, KEY, version=2)
+    for name, serialize, deserialize in cases:
+        encrypted = [serialize(m) for m in messages]
+        assert [reader._deserialize_entity(None, e) for e in encrypted] == messages
+
+        enc = timeit.timeit(lambda: [serialize(m) for m in messages], number=rounds) / rounds
+        dec = timeit.timeit(lambda: [deserialize(e) for e in encrypted], number=rounds) / rounds
+        print('{:<10} {} messages, serialize {:.1f} us/msg, deserialize {:.1f} us/msg, '
+              '{} bytes/msg'.format(name, count, enc / count * 1e6, dec / count * 1e6,
+                                    sum(len(e) for e in encrypted) // count))
+
+
+if __name__ == '__main__':
+    main()
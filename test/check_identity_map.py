@@ -0,0 +1,64 @@
+#
+# Copyright (c) 2020 FTI-CAS
+#
+# Check that a self-request (GET /user) selects its user once only: the
+# token user is reused as request and target user, and when dumping it.
+# A second request served from the token cache selects none.
+#
+#   python test/check_identity_map.py --config-file <cas.conf> --user_name <name>
+#
+import re
+import sys
+
+from oslo_config import cfg
+from sqlalchemy import event
+
+from casauth.cmd.common import initialize
+
+USER_SELECT = re.compile(r'\bFROM [`"]?user\b', re.IGNORECASE)
+
+
+def main():
+    conf = initialize(extra_opts=[cfg.StrOpt('user_name', required=True)])
+
+    from casauth.db import models as md
+    from casauth.db.sqlalchemy import api as md_api
+    from casauth.db.sqlalchemy import session
+    from casauth.wsgi import app
+    from casauth.wsgi import api  # noqa: registers the routes
+    from casauth.wsgi.base import context
+
+    user = md_api.load_user(conf.user_name)
+    if user is None:
+        print('User {} not found'.format(conf.user_name))
+        return 1
+    expires_in = app.config['API_ACCESS_TOKEN_EXPIRATION'].total_seconds()
+    token = user.gen_token(expires_in=expires_in)
+    md.get_token_cache().clear()
+
+    selects = []
+    loads = []
+
+    def _before_cursor_execute(conn, cursor, statement, *args):
+        if USER_SELECT.search(statement):
+            selects.append(statement)
+
+    @app.teardown_request
+    def _count_loads(exc):
+        loads.append(context.get_identity_map().loads)
+
+    event.listen(session.get_engine(), 'before_cursor_execute', _before_cursor_execute)
+    client = app.test_client()
+    failed = False
+    for name, expected in (('cache miss', 1), ('cache hit', 0)):
+        del selects[:]
+        resp = client.get('/api/v1/auth/user', headers={'Authorization': 'Bearer ' + token})
+        ok = resp.status_code == 200 and loads[-1] == expected and len(selects) == expected
+        failed = failed or not ok
+        print('{:<12} status={} loads={} user selects={} {}'.format(
+            name, resp.status_code, loads[-1], len(selects), 'OK' if ok else 'FAILED'))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())